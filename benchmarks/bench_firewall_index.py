@@ -0,0 +1,98 @@
+"""Benchmark firewall rule indexing and analysis on synthetic rule sets.
+
+    python benchmarks/bench_firewall_index.py --rules 5000 --naive
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.firewall_check import FirewallRule
+from modules.firewall_index import RuleIndex, parse_ports, rule_profiles
+
+PROFILE_SETS = [("Domain",), ("Private",), ("Public",), ("Domain", "Private"), ("Domain", "Private", "Public")]
+PROGRAMS = ["Any"] * 5 + [f"C:\\Program Files\\App{i}\\app.exe" for i in range(50)]
+
+def synthetic_rules(count, seed=1):
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        start = rng.randrange(1, 65000)
+        kind = rng.random()
+        if kind < 0.05:
+            port = "Any"
+        elif kind < 0.25:
+            port = f"{start}-{min(65535, start + rng.randrange(1, 500))}"
+        elif kind < 0.3:
+            port = "RPC"
+        else:
+            port = str(start)
+        rules.append(FirewallRule(
+            name=f"Rule {i}",
+            enabled=rng.random() < 0.8,
+            direction=rng.choice(("In", "Out")),
+            profiles=rng.choice(PROFILE_SETS),
+            protocol=rng.choice(("TCP", "UDP", "TCP", "Any")),
+            local_port=port,
+            remote_port="Any",
+            local_ip="Any",
+            remote_ip=rng.choice(("Any", "Any", "LocalSubnet", "10.0.0.0/8")),
+            action="Block" if rng.random() < 0.2 else "Allow",
+            grouping="",
+            program=rng.choice(PROGRAMS),
+        ))
+    return rules
+
+def naive_shadowed(rules):
+    """Pairwise O(n^2) reference for the shadowing check"""
+    def covers(block, allow):
+        for field in ("protocol", "program", "local_ip", "remote_ip", "remote_port"):
+            value = getattr(block, field).lower()
+            if value != "any" and value != getattr(allow, field).lower():
+                return False
+        if block.direction != allow.direction or not set(rule_profiles(allow)) <= set(rule_profiles(block)):
+            return False
+        block_ranges, _ = parse_ports(block.local_port)
+        ranges, keywords = parse_ports(allow.local_port)
+        needed = list(ranges) + ([(0, 65535)] if keywords else [])
+        return all(any(lo <= a and b <= hi for lo, hi in block_ranges) for a, b in needed)
+
+    blocks = [r for r in rules if r.enabled and r.action == "Block"]
+    return {allow.name for allow in rules if allow.enabled and allow.action == "Allow"
+            and any(covers(block, allow) for block in blocks)}
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {label:<28} {time.perf_counter() - start:8.3f}s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Firewall rule index benchmark")
+    parser.add_argument("--rules", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--naive", action="store_true", help="Also run the O(n^2) pairwise shadowing check")
+    args = parser.parse_args()
+
+    rules = synthetic_rules(args.rules)
+    print(f"{len(rules)} synthetic rules")
+    index = timed("build index", lambda: RuleIndex(rules))
+    rng = random.Random(2)
+    ports = [rng.randrange(1, 65536) for _ in range(args.queries)]
+    timed(f"{args.queries} exposure queries", lambda: [index.exposing(p, "TCP", "Public") for p in ports])
+    shadowed = timed("shadowed", index.shadowed)
+    timed("duplicates", index.duplicates)
+    timed("overly broad", index.overly_broad)
+    print(f"  shadowed rules found: {len(shadowed)}")
+    if args.naive:
+        # The naive check accepts covering by a block rule whose profiles are a
+        # superset; the index also accepts different block rules per profile.
+        reference = timed("naive pairwise shadowed", lambda: naive_shadowed(rules))
+        missing = reference - {f.rule for f in shadowed}
+        print(f"  naive found {len(reference)}; missed by index: {len(missing)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Fleet runner wall time against the number of hosts audited at once.
+
+Uses a simulated transport where every host takes --host-seconds and
+returns --records NDJSON lines (a fraction fail their first attempt), so
+it runs anywhere:
+
+    python benchmarks/bench_fleet.py --hosts 200 --host-seconds 0.05 --parallel 1 8 32
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import fleet
+
+class SimulatedTransport:
+    def __init__(self, seconds, records, flaky_every):
+        self.seconds = seconds
+        self.records = records
+        self.flaky_every = flaky_every
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def run(self, host, audit_args, timeout):
+        with self.lock:
+            self.attempts[host.name] = attempt = self.attempts.get(host.name, 0) + 1
+        time.sleep(self.seconds)
+        index = int(host.name[4:])
+        if self.flaky_every and index % self.flaky_every == 0 and attempt == 1:
+            raise fleet.TransportError("connection reset")
+        return [json.dumps({"host": host.name, "module": "services", "type": "ServiceRecord",
+                            "name": f"svc{i}", "state": "Running"}) for i in range(self.records)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet runner benchmark")
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--host-seconds", type=float, default=0.05)
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--flaky-every", type=int, default=20, help="Every Nth host fails its first attempt")
+    parser.add_argument("--parallel", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    logging.getLogger(fleet.__name__).setLevel(logging.ERROR)   # no retry warnings
+    hosts = [fleet.Host(f"host{i}", f"host{i}", "simulated", {}) for i in range(args.hosts)]
+    for parallel in args.parallel:
+        transport = SimulatedTransport(args.host_seconds, args.records, args.flaky_every)
+        fleet.register_transport("simulated", lambda options: transport)
+        runner = fleet.FleetRunner(["--all"], parallel=parallel, retries=1, backoff=args.host_seconds)
+        out = io.StringIO()
+        start = time.perf_counter()
+        results = runner.run(hosts, out)
+        elapsed = time.perf_counter() - start
+        failed = sum(result.status != "ok" for result in results)
+        ideal = args.hosts * args.host_seconds / parallel
+        print(f"parallel {parallel:3}: {elapsed:6.2f}s (hosts x time / parallel = {ideal:.2f}s), "
+              f"{out.getvalue().count(chr(10))} report lines, {failed} failed")
+
+if __name__ == "__main__":
+    main()
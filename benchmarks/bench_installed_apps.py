@@ -0,0 +1,79 @@
+"""Compare the registry and wmic inventory backends of installed_applications.
+
+Generates a regedit export and a recorded `wmic product` listing for the
+same synthetic applications, then times both backends over them:
+
+    python benchmarks/bench_installed_apps.py --apps 2000
+
+Both run offline here, so this measures collection and parsing only; on a
+real host the wmic backend additionally pays for Win32_Product's MSI
+consistency check, which usually dominates.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import command_runner
+from modules.installed_applications import RegistryExportSource, WmicProductSource, collect_installed_apps
+
+UNINSTALL = r"HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
+
+def synthetic_apps(count):
+    return [(f"Application {i} Suite", f"{i % 7}.{i % 13}.{i}", f"Vendor {i % 40} Inc.", f"2024{i % 12 + 1:02d}{i % 28 + 1:02d}")
+            for i in range(count)]
+
+def write_reg_export(path, apps):
+    with open(path, "w", encoding="utf-16") as f:
+        f.write("Windows Registry Editor Version 5.00\n\n")
+        f.write(f"[{UNINSTALL}]\n\n")
+        for i, (name, version, publisher, date) in enumerate(apps):
+            f.write(f"[{UNINSTALL}\\{{{i:08X}-0000-0000-0000-000000000000}}]\n")
+            f.write(f'"DisplayName"="{name}"\n"DisplayVersion"="{version}"\n')
+            f.write(f'"Publisher"="{publisher}"\n"InstallDate"="{date}"\n')
+            f.write('"EstimatedSize"=dword:00001000\n"UninstallString"="MsiExec.exe /X{...}"\n\n')
+
+def write_wmic_fixture(fixture_dir, apps):
+    widths = [max(len(a[i]) for a in apps) + 2 for i in range(4)]
+    header = ["InstallDate", "Name", "Vendor", "Version"]
+    widths = [max(w, len(h) + 2) for w, h in zip(widths, header)]
+    rows = ["".join(h.ljust(w) for h, w in zip(header, widths))]
+    for name, version, publisher, date in apps:
+        rows.append("".join(v.ljust(w) for v, w in zip((date, name, publisher, version), widths)))
+    command_runner.configure(command_runner.MODE_RECORD, fixture_dir)
+    args = ["wmic", "product", "get", "Name,Version,Vendor,InstallDate"]
+    with open(command_runner._fixture_path(args), "w", encoding="utf-8") as f:
+        json.dump({"args": args, "returncode": 0, "stdout": "\n".join(rows) + "\n", "stderr": ""}, f)
+
+def timed(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<30} {best * 1000:8.1f} ms  ({len(result)} apps)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Installed application inventory benchmark")
+    parser.add_argument("--apps", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    apps = synthetic_apps(args.apps)
+    with tempfile.TemporaryDirectory() as tmp:
+        reg_path = os.path.join(tmp, "uninstall.reg")
+        write_reg_export(reg_path, apps)
+        write_wmic_fixture(tmp, apps)
+        command_runner.configure(command_runner.MODE_REPLAY, tmp, cache=False)
+
+        print(f"{args.apps} synthetic applications")
+        timed("registry export backend", lambda: collect_installed_apps(RegistryExportSource(reg_path)), args.repeat)
+        timed("wmic product backend (replay)", lambda: collect_installed_apps(WmicProductSource()), args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Time the login history parser and aggregation on synthetic Security events.
+
+Writes --events 4624/4625/4634 events as wevtutil XML and as NDJSON and
+times reading each back through login_history:
+
+    python benchmarks/bench_login_history.py --events 200000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.login_history import aggregate, read_events_file
+
+NS = "http://schemas.microsoft.com/win/2004/08/events/event"
+
+def synthetic_events(count):
+    for i in range(count):
+        event_id = (4624, 4624, 4634, 4625)[i % 4]
+        yield {
+            "EventID": event_id,
+            "TimeCreated": f"2025-01-{i % 28 + 1:02d}T{i % 24:02d}:{i % 60:02d}:{i % 59:02d}.{i % 10000000:07d}Z",
+            "TargetUserName": f"user{i % 50}",
+            "TargetDomainName": "CONTOSO",
+            "LogonType": str((2, 3, 3, 5, 10)[i % 5]),
+            "IpAddress": f"10.0.{i % 7}.{i % 31}" if event_id != 4634 else None,
+            "WorkstationName": f"WS{i % 90}",
+            "TargetLogonId": hex(0x10000 + (i - 1 if event_id == 4634 else i)),
+            "Status": "0xc000006d" if event_id == 4625 else None,
+        }
+
+def write_xml(path, events):
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            data = "".join(f"<Data Name='{name}'>{value}</Data>" for name, value in event.items()
+                           if name not in ("EventID", "TimeCreated") and value is not None)
+            f.write(f"<Event xmlns='{NS}'><System><Provider Name='Microsoft-Windows-Security-Auditing'/>"
+                    f"<EventID>{event['EventID']}</EventID><Version>2</Version><Level>0</Level>"
+                    f"<TimeCreated SystemTime='{event['TimeCreated']}'/><Channel>Security</Channel>"
+                    f"<Computer>host.contoso.com</Computer></System><EventData>{data}</EventData></Event>\n")
+
+def write_ndjson(path, events):
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+def timed(label, path):
+    start = time.perf_counter()
+    summaries = aggregate(read_events_file(path))
+    elapsed = time.perf_counter() - start
+    # Second pass under tracemalloc (which slows it down) for the peak memory
+    tracemalloc.start()
+    aggregate(read_events_file(path))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:<8} {elapsed:8.2f} s  peak {peak / 1e6:6.1f} MB  ({len(summaries)} summaries)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Login history benchmark")
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, "security.xml")
+        json_path = os.path.join(tmp, "security.ndjson")
+        write_xml(xml_path, synthetic_events(args.events))
+        write_ndjson(json_path, synthetic_events(args.events))
+        print(f"{args.events} synthetic events, XML {os.path.getsize(xml_path) / 1e6:.0f} MB, "
+              f"NDJSON {os.path.getsize(json_path) / 1e6:.0f} MB")
+        timed("xml", xml_path)
+        timed("ndjson", json_path)
+
+if __name__ == "__main__":
+    main()
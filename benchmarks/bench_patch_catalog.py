@@ -0,0 +1,70 @@
+"""Time the missing/superseded KB check against a large synthetic catalog.
+
+Writes a text catalog of --entries KBs spread over --builds OS builds
+(every third one superseded by the next), compiles it, and times loading
+each form and checking a host's hotfixes against it:
+
+    python benchmarks/bench_patch_catalog.py --entries 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.patch_management import Hotfix, check_catalog, compile_catalog, load_catalog
+
+FIRST_BUILD = 19041
+FIRST_KB = 4000000
+
+def write_catalog(path, entries, builds):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("build,kb,superseded_by\n")
+        for i in range(entries):
+            kb = FIRST_KB + i
+            successor = f"KB{kb + 1}" if i % 3 == 0 else ""
+            f.write(f"{FIRST_BUILD + i % builds},KB{kb},{successor}\n")
+
+def timed(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<34} {best * 1000:8.1f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="KB catalog benchmark")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--builds", type=int, default=8)
+    parser.add_argument("--hotfixes", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # The hotfixes installed on a host of the first build, older ones superseded
+    hotfixes = [Hotfix(f"KB{FIRST_KB + i * args.builds}") for i in range(args.hotfixes)]
+    with tempfile.TemporaryDirectory() as tmp:
+        text = os.path.join(tmp, "catalog.csv")
+        compiled = os.path.join(tmp, "catalog.kbc")
+        write_catalog(text, args.entries, args.builds)
+        timed("compile", lambda: compile_catalog(text, compiled), 1)
+        print(f"{args.entries} entries, {args.builds} builds: text {os.path.getsize(text) / 1e6:.1f} MB, "
+              f"compiled {os.path.getsize(compiled) / 1e6:.1f} MB")
+
+        def check(path):
+            with load_catalog(path) as catalog:
+                return check_catalog(hotfixes, catalog, FIRST_BUILD)
+
+        findings = timed("load text + check", lambda: check(text), args.repeat)
+        timed("map compiled + check", lambda: check(compiled), args.repeat)
+        with load_catalog(compiled) as catalog:
+            timed("check only (mapped)", lambda: check_catalog(hotfixes, catalog, FIRST_BUILD), args.repeat)
+        missing = sum(1 for finding in findings if finding.status == "missing")
+        print(f"  {missing} missing, {len(findings) - missing} superseded")
+
+if __name__ == "__main__":
+    main()
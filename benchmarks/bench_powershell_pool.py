@@ -0,0 +1,49 @@
+"""Compare one PowerShell process per query with the persistent worker pool.
+
+Uses fake_powershell_worker.py with a simulated interpreter start-up delay,
+so it runs anywhere:
+
+    python benchmarks/bench_powershell_pool.py --queries 20 --startup-delay 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.powershell_host import PowerShellPool, PowerShellWorker
+
+FAKE_WORKER = os.path.join(ROOT, "benchmarks", "fake_powershell_worker.py")
+
+def main():
+    parser = argparse.ArgumentParser(description="PowerShell worker pool benchmark")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--startup-delay", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    command = [sys.executable, FAKE_WORKER, "--startup-delay", str(args.startup_delay)]
+    scripts = [f"Get-Item query{i}" for i in range(args.queries)]
+
+    start = time.perf_counter()
+    for script in scripts:
+        worker = PowerShellWorker(command)
+        worker.execute(script)
+        worker.close()
+    per_process = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pool = PowerShellPool(args.workers, command)
+    for script in scripts:
+        pool.run(script)
+    pool.close()
+    pooled = time.perf_counter() - start
+
+    print(f"{args.queries} queries, simulated start-up {args.startup_delay}s")
+    print(f"  new process per query: {per_process:8.2f}s")
+    print(f"  pool of {args.workers} worker(s):    {pooled:8.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Time decoding and aggregating productState over a fleet's saved reports.
+
+Writes an NDJSON fleet report of --records SecurityProduct records (a
+handful of products and states, as a fleet has) among --other records of
+other types per product, and times decoding the raw values and the full
+read + aggregate pass:
+
+    python benchmarks/bench_product_states.py --records 300000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import report
+from modules.antivirus_check import PRODUCT_RECORD_TYPES, aggregate_product_states, decode_product_states
+
+PRODUCTS = [
+    ("antivirus", "Windows Defender", [397568, 393472, 397584]),
+    ("antispyware", "Windows Defender", [397568, 393488]),
+    ("antivirus", "Vendor Endpoint", [266240, 266256, 262144]),
+    ("firewall", "Vendor Firewall", [266256, 262160]),
+]
+
+def write_report(path, count, other):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            category, name, states = PRODUCTS[i % len(PRODUCTS)]
+            for j in range(other):
+                f.write(json.dumps({"target": f"host{i // len(PRODUCTS)}", "module": "services",
+                                    "type": "ServiceRecord", "name": f"svc{j}", "state": "Running"}) + "\n")
+            f.write(json.dumps({"target": f"host{i // len(PRODUCTS)}", "module": "antivirus_check",
+                                "type": "SecurityProduct", "category": category, "display_name": name,
+                                "product_state": states[i % len(states)], "providers": [], "realtime": "",
+                                "signatures": "", "path": "", "timestamp": ""}) + "\n")
+
+def timed(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<28} {best * 1000:8.1f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="productState aggregation benchmark")
+    parser.add_argument("--records", type=int, default=300000)
+    parser.add_argument("--other", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    values = [states[i % len(states)] for i in range(args.records)
+              for _, _, states in [PRODUCTS[i % len(PRODUCTS)]]]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fleet.ndjson")
+        write_report(path, args.records, args.other)
+        print(f"{args.records} product records among {args.records * (args.other + 1)}, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB NDJSON")
+        timed("decode states", lambda: decode_product_states(values), args.repeat)
+        records = lambda: report.iter_saved_records(path, PRODUCT_RECORD_TYPES)
+        counts = timed("read + aggregate", lambda: aggregate_product_states(records()), args.repeat)
+        print(f"  {len(counts)} groups")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Time the verbose schtasks CSV inventory on a synthetic listing.
+
+Writes a recorded `schtasks /query /fo CSV /v` fixture for --tasks tasks
+(header repeated per folder, several rows for multi-trigger tasks, a few
+suspicious actions) and times parsing, de-duplication and risk scoring:
+
+    python benchmarks/bench_scheduled_tasks.py --tasks 10000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import command_runner
+from modules.scheduled_task import RISK_THRESHOLD, SCHTASKS_CSV_ARGS, collect_tasks, parse_schtasks_csv
+
+HEADER = ["HostName", "TaskName", "Next Run Time", "Status", "Logon Mode", "Last Run Time", "Last Result",
+          "Author", "Task To Run", "Start In", "Comment", "Scheduled Task State", "Idle Time",
+          "Power Management", "Run As User", "Delete Task If Not Rescheduled",
+          "Stop Task If Runs X Hours and X Mins", "Schedule", "Schedule Type", "Start Time", "Start Date",
+          "End Date", "Days", "Months", "Repeat: Every", "Repeat: Until: Time",
+          "Repeat: Until: Duration", "Repeat: Stop If Still Running"]
+
+ACTIONS = [
+    r"%windir%\system32\rundll32.exe /d acproxy.dll,PerformAutochkOperations",
+    r"C:\Program Files\Vendor\updater.exe /silent",
+    r"powershell.exe -NoP -W Hidden -enc SQBFAFgAIAAoAE4AZQB3AC0ATwBiAGoAZQBjAHQA",
+    r"C:\Users\alice\AppData\Local\Temp\svc.exe",
+    r"%SystemRoot%\System32\sc.exe start w32time task_started",
+]
+
+def synthetic_csv(count, tasks_per_folder=50):
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    for i in range(count):
+        if i % tasks_per_folder == 0:
+            writer.writerow(HEADER)
+        path = f"\\Vendor{i // tasks_per_folder}\\Task {i}"
+        for trigger in range(1 + i % 3):
+            row = [""] * len(HEADER)
+            row[:4] = ["HOST", path, "1/1/2025 3:00:00 AM", "Ready"]
+            row[6], row[7], row[8] = "0", f"Author {i % 17}", ACTIONS[i % len(ACTIONS)]
+            row[11], row[14], row[18] = "Enabled", "SYSTEM" if i % 4 == 0 else "Users", f"Trigger {trigger}"
+            writer.writerow(row)
+    return out.getvalue()
+
+def timed(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    risky = sum(1 for task in result if task.risk >= RISK_THRESHOLD)
+    print(f"  {label:<32} {best * 1000:8.1f} ms  ({len(result)} tasks, {risky} risky)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduled task inventory benchmark")
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    output = synthetic_csv(args.tasks)
+    lines = output.splitlines()
+    with tempfile.TemporaryDirectory() as tmp:
+        command_runner.configure(command_runner.MODE_RECORD, tmp)
+        with open(command_runner._fixture_path(SCHTASKS_CSV_ARGS), "w", encoding="utf-8") as f:
+            json.dump({"args": SCHTASKS_CSV_ARGS, "returncode": 0, "stdout": output, "stderr": ""}, f)
+        command_runner.configure(command_runner.MODE_REPLAY, tmp, cache=False)
+
+        print(f"{args.tasks} synthetic tasks, {len(lines)} CSV lines, {len(output) / 1e6:.1f} MB")
+        timed("parse + dedupe + score", lambda: list(parse_schtasks_csv(lines)), args.repeat)
+        timed("collect_tasks (replayed command)", collect_tasks, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Time the structured service inventory on a synthetic listing.
+
+Writes a recorded Get-CimInstance Win32_Service | ConvertTo-Csv fixture for
+--services services (a mix of quoted, unquoted and ProgramData paths, some
+automatic services stopped) and times parsing and analysis:
+
+    python benchmarks/bench_services.py --services 5000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import command_runner
+from modules.services import SERVICE_FIELDS, SERVICE_SCRIPT, collect_services, parse_service_csv
+
+PATHS = [
+    r"C:\Windows\system32\svchost.exe -k netsvcs -p",
+    r'"C:\Program Files\Vendor\agent.exe" --service',
+    r"C:\Program Files\Vendor Tools\updater.exe /service",
+    r"C:\ProgramData\Helper\helper.exe",
+    r"%SystemRoot%\System32\spoolsv.exe",
+]
+
+ACCOUNTS = ["LocalSystem", "NT AUTHORITY\\LocalService", "NT AUTHORITY\\NetworkService", ".\\svc_backup"]
+
+def synthetic_csv(count):
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    writer.writerow(SERVICE_FIELDS)
+    for i in range(count):
+        start_mode = ("Auto", "Manual", "Disabled")[i % 3]
+        state = "Stopped" if i % 7 == 0 or start_mode == "Disabled" else "Running"
+        writer.writerow([f"svc{i}", f"Service {i}", state, start_mode, ACCOUNTS[i % len(ACCOUNTS)],
+                         PATHS[i % len(PATHS)], "True" if i % 11 == 0 else "False", "0"])
+    return out.getvalue()
+
+def timed(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    flagged = sum(1 for service in result if service.findings)
+    print(f"  {label:<34} {best * 1000:8.1f} ms  ({len(result)} services, {flagged} with findings)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Service inventory benchmark")
+    parser.add_argument("--services", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    output = synthetic_csv(args.services)
+    lines = output.splitlines()
+    script_args = command_runner.powershell_args(SERVICE_SCRIPT)
+    with tempfile.TemporaryDirectory() as tmp:
+        command_runner.configure(command_runner.MODE_RECORD, tmp)
+        with open(command_runner._fixture_path(script_args), "w", encoding="utf-8") as f:
+            json.dump({"args": script_args, "returncode": 0, "stdout": output, "stderr": ""}, f)
+        command_runner.configure(command_runner.MODE_REPLAY, tmp, cache=False)
+
+        print(f"{args.services} synthetic services, {len(lines)} CSV lines, {len(output) / 1e6:.1f} MB")
+        timed("parse + analyze", lambda: list(parse_service_csv(lines)), args.repeat)
+        timed("collect_services (replayed command)", collect_services, args.repeat)
+
+if __name__ == "__main__":
+    main()
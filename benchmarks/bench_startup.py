@@ -0,0 +1,69 @@
+"""Start-up cost of main.py for single-audit and full runs.
+
+Runs main.py in replay mode against an empty fixture directory, so every
+command fails at once and the time measured is interpreter start-up,
+imports and argument parsing. Also lists which audit modules each command
+line imported:
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+COMMAND_LINES = [
+    ["--help"],
+    ["--remote"],
+    ["--patch"],
+    ["--accounts"],
+    ["--all"],
+]
+
+# Runs main.py and prints the repository modules loaded by the time it exits
+DRIVER = """
+import atexit, runpy, sys
+atexit.register(lambda: print("MODULES", *sorted(m for m in sys.modules if m.startswith("modules.")),
+                              file=sys.stderr))
+sys.argv = sys.argv[1:]
+sys.path.insert(0, {root!r})
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+def imported_modules(args, workdir):
+    result = subprocess.run([sys.executable, "-c", DRIVER.format(root=ROOT), MAIN, *args], cwd=workdir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    lines = [line for line in result.stderr.splitlines() if line.startswith("MODULES")]
+    return lines[-1].split()[1:] if lines else []
+
+def main():
+    parser = argparse.ArgumentParser(description="main.py start-up benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fixtures = os.path.join(workdir, "fixtures")
+        os.makedirs(fixtures)
+        for command_line in COMMAND_LINES:
+            full = command_line if command_line == ["--help"] else [*command_line, "--replay", fixtures]
+            times = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, MAIN, *full], cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                times.append(time.perf_counter() - start)
+            modules = imported_modules(full, workdir)
+            audits = [name for name in modules if name.split(".")[1] not in
+                      ("audit_logging", "audit_registry", "command_runner", "fleet", "powershell_host",
+                       "profiler", "report")]
+            print(f"{' '.join(command_line):<12} median {statistics.median(times) * 1000:6.1f} ms, "
+                  f"{len(modules):2} modules imported; audit code: {', '.join(audits) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Stand-in for the PowerShell worker used by modules.powershell_host.
+
+Speaks the same stdin/stdout protocol as HOST_SCRIPT, so it can replace
+powershell.exe on machines without it:
+
+    python main.py --all --ps-workers 2 \
+        --ps-worker-command "python benchmarks/fake_powershell_worker.py --fixtures recorded/"
+
+Scripts are answered from a directory written by `main.py --record`; scripts
+without a recording get empty output and status 1.
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import command_runner
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake PowerShell worker")
+    parser.add_argument("--fixtures", help="Directory of recorded command output")
+    parser.add_argument("--startup-delay", type=float, default=0.0,
+                        help="Seconds to sleep before serving requests (simulates interpreter start-up)")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to sleep per request")
+    parser.add_argument("--line-delay", type=float, default=0.0,
+                        help="Seconds to sleep before each output line (simulates a slow script)")
+    parser.add_argument("--bom", action="store_true",
+                        help="Write a UTF-8 byte order mark before the first reply, as Windows PowerShell 5.1 "
+                             "does with [Console]::OutputEncoding = [Text.Encoding]::UTF8")
+    args = parser.parse_args()
+
+    sentinel = os.environ["WINSECMON_SENTINEL"]
+    if args.fixtures:
+        command_runner.configure(command_runner.MODE_REPLAY, args.fixtures, cache=False)
+    time.sleep(args.startup_delay)
+    if args.bom:
+        sys.stdout.buffer.write(b"\xef\xbb\xbf")
+
+    for line in sys.stdin:
+        script = base64.b64decode(line.strip()).decode("utf-8")
+        time.sleep(args.delay)
+        stdout, stderr, status = "", "", 1
+        if args.fixtures:
+            try:
+                result = command_runner.run_powershell(script)
+                stdout, stderr, status = result.stdout, result.stderr, result.returncode
+            except FileNotFoundError as e:
+                stderr = f"{e}\n"
+        if stdout and not stdout.endswith("\n"):
+            stdout += "\n"
+        for output_line in stdout.splitlines(keepends=True):
+            if args.line_delay:
+                time.sleep(args.line_delay)
+                sys.stdout.flush()
+            sys.stdout.write(output_line)
+        sys.stdout.write(f"{sentinel}:ERR\n")
+        sys.stdout.write(stderr)
+        sys.stdout.write(f"{sentinel}:END {status}\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,278 @@
 import argparse
-import modules.system_info as sys_info
-import modules.firewall_check as firewall
-import modules.antivirus_check as antivirus
-import modules.patch_management as patch
-import modules.startup_review as startup
-import modules.services as service
-import modules.installed_applications as applications
-import modules.scheduled_task as schedule
-import modules.user_accounts as accounts
-import modules.remote_access as remote
-from modules.logging import setup_logging, clear_logs
-
-def perform_all_audits():
+import logging
+import shlex
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from modules import audit_registry, command_runner, fleet, profiler
+from modules.report import AuditReport, REPORT_FORMATS
+from modules.audit_logging import (LOG_FILE, LOG_FORMATS, setup_logging, shutdown_logging, clear_logs,
+                                   section_buffering, buffered_section)
+
+logger = logging.getLogger(__name__)
+
+def _run_audit(name, audit):
+    """Run one audit, returning (records, seconds, error)"""
+    start = time.perf_counter()
+    try:
+        with profiler.module_span(name):
+            return audit() or [], time.perf_counter() - start, None
+    except Exception as e:
+        logger.error("Audit %s failed: %s", name, e, exc_info=True)
+        return [], time.perf_counter() - start, str(e)
+
+def _run_buffered(name, audit):
+    """Run one audit in a worker thread, collecting its log records"""
+    with buffered_section() as log_records:
+        outcome = _run_audit(name, audit)
+    return outcome, log_records
+
+def _apply_baseline(baseline, report, name, outcome, log_records):
+    """Reduce a finished section to its changes since the baseline.
+
+    Returns the (records, seconds, error) to report and the log records to
+    keep: an unchanged or changed section keeps only its warnings and errors
+    from the module's own output, and the changes are logged instead. A
+    section that failed or logged an error is reported as it is and leaves
+    the baseline untouched.
+    """
+    records, seconds, error = outcome
+    if error:
+        return outcome, log_records
+    if any(record.levelno >= logging.ERROR for record in log_records):
+        # Audits catch their own failures, log an error and return what they
+        # have (often nothing); comparing that would report every record as
+        # removed and overwrite the baseline with it
+        logger.warning("%s: audit logged errors, not compared with or stored in the baseline", name)
+        return outcome, log_records
+    from modules.baseline import log_changes
+    changes = baseline.compare(report.host, name, records)
+    if changes is None:
+        logger.info("%s: no baseline yet, stored %s records", name, len(records))
+        return outcome, log_records
+    kept = [record for record in log_records if record.levelno >= logging.WARNING]
+    if not changes:
+        logger.info("%s: unchanged since baseline", name)
+    else:
+        log_changes(name, changes)
+    return (changes, seconds, error), kept
+
+def run_audits(audits, jobs=1, report=None, baseline=None):
+    """Run the given (name, function) audits, up to `jobs` at a time.
+
+    With more than one job each audit logs into its own buffer, and the
+    buffers are written to the log in the order given, so sections never
+    interleave regardless of which audit finishes first. The records each
+    audit returns are collected into an AuditReport, which is returned.
+
+    With a BaselineStore, each section is compared with the previous run and
+    only the changes are reported and logged.
+    """
+    report = report or AuditReport()
+    if jobs <= 1 and baseline is None:
+        for name, audit in audits:
+            report.add(name, *_run_audit(name, audit))
+        return report
+
+    with section_buffering() as sections:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = [pool.submit(_run_buffered, name, audit) for name, audit in audits]
+            for (name, _), future in zip(audits, futures):
+                outcome, log_records = future.result()
+                if baseline is not None:
+                    with buffered_section() as summary:
+                        outcome, log_records = _apply_baseline(baseline, report, name, outcome, log_records)
+                    log_records = log_records + summary
+                sections.flush_section(name, log_records)
+                report.add(name, *outcome)
+    return report
+
+# Options about this process rather than the audit, not passed on to fleet hosts
+HOST_LOCAL_OPTIONS = {"help", "clear_logs", "jobs", "baseline", "report", "report_format", "record",
+                      "log_file", "log_format", "log_compress", "log_max_mb", "log_backups",
+                      "profile", "profile_trace"}
+
+def _host_audit_args(parser, args):
+    """The options of this command line that every fleet host runs with"""
+    forwarded = []
+    for action in parser._actions:
+        if not action.option_strings or action.dest in HOST_LOCAL_OPTIONS or action.dest.startswith("fleet"):
+            continue
+        value = getattr(args, action.dest)
+        if value == action.default:
+            continue
+        forwarded += [action.option_strings[-1]] if action.nargs == 0 else [action.option_strings[-1], str(value)]
+    return forwarded
+
+def run_fleet(parser, args):
+    """Audit the hosts of the --fleet inventory instead of this machine"""
+    try:
+        hosts = fleet.load_inventory(args.fleet, args.fleet_transport)
+    except (OSError, ValueError) as e:
+        parser.error(f"--fleet: {e}")
+    runner = fleet.FleetRunner(_host_audit_args(parser, args), args.fleet_parallel, args.jobs,
+                               args.fleet_retries, timeout=args.fleet_timeout,
+                               transport_options={"log_dir": args.fleet_log_dir,
+                                                  "remote_command": args.fleet_remote_command})
+    start = time.perf_counter()
+    path = args.report or '-'
+    out = sys.stdout if path == '-' else open(path, "w", encoding="utf-8")
+    try:
+        results = runner.run(hosts, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    fleet.log_fleet_summary(results, time.perf_counter() - start)
+    return results
+
+def load_audits(specs):
+    """(section name, audit function) pairs, importing each audit's module"""
+    return [(spec.name, spec.load()) for spec in specs]
+
+def perform_all_audits(jobs=1, baseline=None):
     """Perform all available audits"""
-    sys_info.get_system_info()
-    firewall.check_firewall_status()
-    antivirus.check_antivirus()
-    patch.check_patch_status()
-    startup.check_startup_apps()
-    service.audit_services()
-    applications.list_installed_apps()
-    schedule.check_scheduled_tasks()
-    accounts.audit_user_accounts()
-    remote.audit_remote_access()
+    return run_audits(load_audits(audit_registry.audits()), jobs, baseline=baseline)
+
+def parse_arguments(parser, argv=None):
+    """Parse the command line, importing only the audits it selects.
+
+    A first pass finds the selected audits; only their modules are then
+    imported to add their own options. All of them are loaded for --help,
+    and when the command line uses an option of an audit it did not select.
+    Plugin audits are only looked up for --all, --help or unknown options.
+    --fleet with an option that only applies to a local audit is an error.
+    Returns (args, the selected AuditSpecs).
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    first_pass = [arg for arg in argv if arg not in ('-h', '--help')]
+    known, extra = parser.parse_known_args(first_pass)
+    if extra or known.all or len(first_pass) != len(argv):
+        audit_registry.add_audit_flags(parser, audit_registry.discover())
+        known, _ = parser.parse_known_args(first_pass)
+    specs = audit_registry.audits()
+    selected = [spec for spec in specs if known.all or getattr(known, spec.dest)]
+    wants_help = any(arg in ('-h', '--help') for arg in argv)
+    added = audit_registry.add_audit_options(parser, specs if wants_help else selected)
+    args, extra = parser.parse_known_args(argv)
+    if extra:
+        audit_registry.add_audit_options(parser, specs, added)
+        args = parser.parse_args(argv)
+    # Fleet hosts write no baseline or recordings; these would be dropped
+    fleet_local = [option for option, value in (("--baseline", args.baseline), ("--record", args.record)) if value]
+    if args.fleet and fleet_local:
+        parser.error(f"--fleet cannot be combined with {' or '.join(fleet_local)}")
+    return args, selected
 
 def main():
-    setup_logging()
-    
     parser = argparse.ArgumentParser(description='Windows Security Audit Tool')
-    parser.add_argument('--clear-logs', action='store_true', help='Clear the audit log file')
+    parser.add_argument('--clear-logs', action='store_true',
+                        help='Remove the --log-file audit log and its rotated copies, then run any selected audits')
     parser.add_argument('--all', action='store_true', help='Perform all available audits')
-    parser.add_argument('--system', action='store_true', help='Perform system information audit')
-    parser.add_argument('--firewall', action='store_true', help='Perform firewall audit')
-    parser.add_argument('--antivirus', action='store_true', help='Perform antivirus audit')
-    parser.add_argument('--patch', action='store_true', help='Perform patch management audit')
-    parser.add_argument('--startup', action='store_true', help='Perform Startup Review audit')
-    parser.add_argument('--service', action='store_true', help='Perform service audit')
-    parser.add_argument('--applications', action='store_true', help='Perform Applications audit')
-    parser.add_argument('--schedule', action='store_true', help='Perform Schedule Task audit')
-    parser.add_argument('--accounts', action='store_true', help='Perform User Accounts audit')
-    parser.add_argument('--remote', action='store_true', help='Perform Remote Access audit')
+    audit_registry.add_audit_flags(parser)
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='Run up to N audits concurrently (default: 1, sequential)')
+    parser.add_argument('--timeout', type=float, default=command_runner.DEFAULT_TIMEOUT, metavar='SECONDS',
+                        help='Default timeout for each external command')
+    parser.add_argument('--max-output-mb', type=float, metavar='MB',
+                        help='Stop streamed commands (rule lists, netstat, ...) that print more than MB megabytes')
+    parser.add_argument('--ps-workers', type=int, default=0, metavar='N',
+                        help='Reuse up to N persistent PowerShell processes for PowerShell queries '
+                             '(default: 0, one powershell.exe per query)')
+    parser.add_argument('--ps-worker-command', metavar='CMD',
+                        help='Command that starts a PowerShell worker (e.g. a fake worker for testing)')
+    parser.add_argument('--baseline', metavar='DB',
+                        help='Compare with the snapshot in DB (SQLite) and report only what changed; '
+                             'the snapshot is updated after each run')
+    parser.add_argument('--report', metavar='PATH',
+                        help="Write the structured audit results to PATH ('-' for stdout)")
+    parser.add_argument('--report-format', choices=REPORT_FORMATS, default='json',
+                        help='Format of the --report file (default: json)')
+    parser.add_argument('--log-file', metavar='PATH', default=LOG_FILE,
+                        help='Audit log file, overwritten each run (default: %(default)s)')
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='text',
+                        help='Audit log format: text lines or one JSON object per line')
+    parser.add_argument('--log-compress', action='store_true', help='Gzip the audit log (adds .gz)')
+    parser.add_argument('--log-max-mb', type=float, metavar='MB',
+                        help='Rotate the audit log after MB megabytes')
+    parser.add_argument('--log-backups', type=int, default=3, metavar='N',
+                        help='Rotated audit logs to keep (default: %(default)s)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print where the time went (audits and commands, ranked) and write a trace')
+    parser.add_argument('--profile-trace', metavar='PATH', default='audit-trace.json',
+                        help='Chrome trace-event file written by --profile, for chrome://tracing or '
+                             'Perfetto (default: %(default)s)')
+    parser.add_argument('--fleet', metavar='INVENTORY',
+                        help='Audit the hosts listed in INVENTORY instead of this machine; the NDJSON results '
+                             'of all hosts go to --report (default: stdout)')
+    parser.add_argument('--fleet-parallel', type=int, default=fleet.DEFAULT_PARALLEL, metavar='N',
+                        help='Hosts audited at the same time (default: %(default)s); '
+                             '--jobs applies within each host')
+    parser.add_argument('--fleet-retries', type=int, default=fleet.DEFAULT_RETRIES, metavar='N',
+                        help='Retries per host after a failed attempt, with backoff (default: %(default)s)')
+    parser.add_argument('--fleet-timeout', type=float, default=fleet.DEFAULT_HOST_TIMEOUT, metavar='SECONDS',
+                        help='Time limit for one attempt on one host (default: %(default)s)')
+    parser.add_argument('--fleet-transport', choices=sorted(fleet.TRANSPORTS), default='local',
+                        help='Transport for hosts that do not set transport= in the inventory (default: local)')
+    parser.add_argument('--fleet-remote-command', metavar='CMD', default='python main.py',
+                        help='Command that runs the audit on ssh hosts (default: %(default)s)')
+    parser.add_argument('--fleet-log-dir', metavar='DIR', default='fleet-logs',
+                        help='Where local transport runs write their per-host audit logs (default: %(default)s)')
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--record', metavar='DIR', help='Save the raw output of every command to DIR')
+    fixtures.add_argument('--replay', metavar='DIR', help='Serve command output from DIR instead of running commands')
     
     
-    args = parser.parse_args()
+    args, selected = parse_arguments(parser)
+    if args.clear_logs:
+        removed = clear_logs(args.log_file, args.log_compress, args.log_backups)
+        print("Removed " + ", ".join(removed) if removed else "No audit log found.")
+        if not (selected or args.fleet):
+            return
+    setup_logging(args.log_file, args.log_format, args.log_compress,
+                  int(args.log_max_mb * 1024 * 1024) if args.log_max_mb else None, args.log_backups)
     
-    print("Starting Windows Audit...")
-    
-    if args.all:
-        perform_all_audits()
+    if args.record:
+        mode, fixture_dir = command_runner.MODE_RECORD, args.record
+    elif args.replay:
+        mode, fixture_dir = command_runner.MODE_REPLAY, args.replay
     else:
-        if args.system:
-            sys_info.get_system_info()
-        if args.firewall:
-            firewall.check_firewall_status()
-        if args.antivirus:
-            antivirus.check_antivirus()
-        if args.patch:
-            patch.check_patch_status()
-        if args.startup:
-            startup.check_startup_apps()
-        if args.service:
-            service.audit_services()
-        if args.applications:
-            applications.list_installed_apps()
-        if args.schedule:
-            schedule.check_scheduled_tasks()
-        if args.accounts:
-            accounts.audit_user_accounts()
-        if args.remote:
-            remote.audit_remote_access()
+        mode, fixture_dir = command_runner.MODE_LIVE, None
+    audit_registry.configure_audits(selected, args)
+    worker_command = shlex.split(args.ps_worker_command) if args.ps_worker_command else None
+    command_runner.configure(mode, fixture_dir, args.timeout,
+                             powershell_workers=args.ps_workers,
+                             powershell_worker_command=worker_command,
+                             max_output_bytes=int(args.max_output_mb * 1024 * 1024) if args.max_output_mb else None)
+    
+    if args.fleet:
+        results = run_fleet(parser, args)
+        shutdown_logging()
+        sys.exit(1 if any(result.status != "ok" for result in results) else 0)
+
+    # Keep stdout clean for the report when it is written there
+    console = sys.stderr if args.report == '-' else sys.stdout
+    print("Starting Windows Audit...", file=console)
+    
+    baseline = None
+    if args.baseline:
+        from modules.baseline import BaselineStore   # sqlite3 is only needed here
+        baseline = BaselineStore(args.baseline)
+    report = run_audits(load_audits(selected), args.jobs, baseline=baseline)
+    if baseline is not None:
+        baseline.close()
+    
+    if args.report:
+        report.write(args.report, args.report_format)
     
-    print("Windows Audit Completed.")
+    command_runner.log_summary()
+    if args.profile:
+        modules, commands = profiler.get_module_timings(), command_runner.get_timings()
+        print(profiler.format_summary(modules, commands), file=console)
+        profiler.write_trace(args.profile_trace, modules, commands)
+        print(f"Trace written to {args.profile_trace}", file=console)
+    command_runner.shutdown()
+    shutdown_logging()
+    print("Windows Audit Completed.", file=console)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,200 +1,380 @@
+import argparse
+import json
 import subprocess
 import logging
-from datetime import datetime
+import re
+from collections import Counter
 import os
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from modules import command_runner, report, wmic
+from modules.audit_logging import setup_logging
 
-def setup_logging():
-    """Configure logging to file (audit.log) and console"""
-    log_filename = 'audit.log'
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_filename, mode='a'),  # 'a' mode = append
-            logging.StreamHandler()
-        ]
-    )
-    logging.info(f"Logging to {os.path.abspath(log_filename)}")
-
+logger = logging.getLogger(__name__)
 
 def run_command(command, success_message="Command executed successfully"):
     """Helper function to run commands with better error handling"""
     try:
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            shell=True
-        )
-        logging.info(success_message)
+        result = command_runner.run(command, check=True)
+        logger.info("%s", success_message)
         return result.stdout
     except subprocess.CalledProcessError as e:
-        logging.error(f"Command failed: {e}")
-        logging.debug(f"Command: {e.cmd}")
-        logging.debug(f"Return code: {e.returncode}")
-        logging.debug(f"Error output: {e.stderr}")
+        logger.error("Command failed: %s", e)
+        logger.debug("Command: %s", e.cmd)
+        logger.debug("Return code: %s", e.returncode)
+        logger.debug("Error output: %s", e.stderr)
+        return None
+    except subprocess.TimeoutExpired as e:
+        logger.error("Command timed out after %ss: %s", e.timeout, e.cmd)
         return None
     except Exception as e:
-        logging.error(f"Unexpected error executing command: {e}")
+        logger.error("Unexpected error executing command: %s", e)
         return None
 
-def get_product_type(byte):
-    """Map product type byte to human-readable description"""
-    types = {
-        0x00: "Invalid",
-        0x01: "Antivirus",
-        0x02: "Firewall",
-        0x04: "Antispyware",
-        0x08: "Internet settings",
-        0x10: "User Account Control (UAC)",
-        0x20: "Service"
-    }
-    return types.get(byte, f"Unknown (0x{byte:02X})")
-
-def get_product_status(byte):
-    """Map product status byte to human-readable description"""
-    statuses = {
-        0x00: "Non-functional",
-        0x10: "Not running",
-        0x20: "Running but out of date",
-        0x30: "Running",
-        0x40: "Running and up to date"
-    }
-    return statuses.get(byte & 0xF0, f"Unknown (0x{byte:02X})")
-
-def get_signature_status(byte):
-    """Map signature status byte to human-readable description"""
-    statuses = {
-        0x00: "Up to date",
-        0x10: "Out of date",
-        0x20: "Partially out of date"
-    }
-    return statuses.get(byte & 0xF0, f"Unknown (0x{byte:02X})")
-
-def get_antivirus_details():
-    """Retrieve detailed antivirus information using alternative methods"""
+def stream_command(command, parser, success_message="Command executed successfully"):
+    """Like run_command, but feeds the output to parser line by line as the
+    command runs instead of capturing it; returns what parser returns"""
     try:
-        logging.info("\n=== Antivirus Product Audit ===")
-        
-        # Try PowerShell alternative if WMIC fails
-        ps_command = (
-            "Get-CimInstance -Namespace root/SecurityCenter2 -ClassName AntivirusProduct | "
-            "Select-Object displayName, instanceGuid, pathToSignedProductExe, "
-            "pathToSignedReportingExe, productState, timestamp | Format-List"
-        )
-        
-        result = run_command(
-            ["powershell", "-Command", ps_command],
-            "Successfully retrieved antivirus information via PowerShell"
-        )
-        
-        if result:
-            parse_antivirus_output(result)
-        else:
-            logging.warning("Attempting legacy WMIC command as fallback...")
-            legacy_result = run_command(
-                'wmic /namespace:\\\\root\\SecurityCenter2 path AntivirusProduct get * /format:list',
-                "Successfully retrieved antivirus information via legacy WMIC"
-            )
-            if legacy_result:
-                parse_antivirus_output(legacy_result)
-            
+        result = parser(command_runner.iter_lines(command, check=True))
+        logger.info("%s", success_message)
+        return result
+    except subprocess.CalledProcessError as e:
+        logger.error("Command failed: %s", e)
+        logger.debug("Command: %s", e.cmd)
+        logger.debug("Return code: %s", e.returncode)
+        logger.debug("Error output: %s", e.stderr)
+        return None
+    except subprocess.TimeoutExpired as e:
+        logger.error("Command timed out after %ss: %s", e.timeout, e.cmd)
+        return None
     except Exception as e:
-        logging.error(f"Unexpected error in get_antivirus_details: {e}")
-
-def parse_antivirus_output(output):
-    """Parse and log the antivirus information"""
-    if not output:
-        logging.warning("No antivirus products found or output is empty")
-        return
-    
-    # Normalize line endings and split into products
-    products = [p.strip() for p in output.replace('\r', '').split('\n\n') if p.strip()]
-    
-    for i, product in enumerate(products, 1):
-        logging.info(f"\nAntivirus Product #{i}:")
-        lines = [line.strip() for line in product.split('\n') if line.strip()]
-        for line in lines:
-            logging.info(line)
-            
-        # Extract and interpret product state if available
-        product_state = next((line.split('=')[1] for line in lines if 'productState' in line.lower()), None)
-        if product_state:
-            interpret_product_state(product_state)
+        logger.error("Unexpected error executing command: %s", e)
+        return None
+
+# SecurityCenter2 classes queried, and the category their products get
+PRODUCT_CLASSES = {
+    "AntiVirusProduct": "antivirus",
+    "AntiSpywareProduct": "antispyware",
+    "FirewallProduct": "firewall",
+}
+
+PRODUCT_PROPERTIES = ["displayName", "productState", "pathToSignedProductExe", "timestamp"]
+
+# Every product of the three classes in one PowerShell run, each tagged with its class
+PRODUCTS_SCRIPT = (
+    "foreach ($class in " + ",".join(f"'{name}'" for name in PRODUCT_CLASSES) + ") { "
+    "Get-CimInstance -Namespace root/SecurityCenter2 -ClassName $class -ErrorAction SilentlyContinue | "
+    "Select-Object @{Name='class';Expression={$class}}, " + ", ".join(PRODUCT_PROPERTIES) + " | Format-List }"
+)
+
+class ProductState(NamedTuple):
+    value: int
+    providers: Tuple[str, ...]
+    realtime: str
+    signatures: str
+
+class SecurityProduct(NamedTuple):
+    category: str           # 'antivirus', 'antispyware' or 'firewall'
+    display_name: str
+    product_state: Optional[int]    # None when missing or invalid; the rest is then left empty
+    providers: Tuple[str, ...]
+    realtime: str
+    signatures: str         # empty for firewalls, which have none
+    path: str = ""
+    timestamp: str = ""
+
+# productState is 0xPPRRSS: PP the WSC_SECURITY_PROVIDER flags of the
+# product, the high nibble of RR its real-time protection state and the high
+# nibble of SS its signature state. Each part is decoded by table lookup.
+PROVIDER_FLAGS = [
+    (0x01, "firewall"),
+    (0x02, "autoupdate_settings"),
+    (0x04, "antivirus"),
+    (0x08, "antispyware"),
+    (0x10, "internet_settings"),
+    (0x20, "user_account_control"),
+    (0x40, "service"),
+]
+PROVIDER_TABLE = [tuple(name for flag, name in PROVIDER_FLAGS if byte & flag) for byte in range(256)]
+REALTIME_TABLE = ["off", "on", "snoozed", "expired"] + [f"unknown ({n:#x})" for n in range(4, 16)]
+SIGNATURE_TABLE = ["up_to_date", "out_of_date"] + [f"unknown ({n:#x})" for n in range(2, 16)]
+
+def decode_product_state(value: int) -> ProductState:
+    return ProductState(value, PROVIDER_TABLE[(value >> 16) & 0xFF], REALTIME_TABLE[(value >> 12) & 0xF],
+                        SIGNATURE_TABLE[(value >> 4) & 0xF])
 
-def interpret_product_state(state_hex):
-    """Interpret the hexadecimal product state value"""
+def decode_product_states(values: Iterable[Optional[int]]) -> List[Optional[ProductState]]:
+    """decode_product_state over many values (None stays None). A fleet has
+    only a handful of distinct states, so each is decoded once and the rest
+    are lookups."""
+    decoded: Dict[Optional[int], Optional[ProductState]] = {None: None}
+    states = []
+    for value in values:
+        if value in decoded:
+            state = decoded[value]
+        else:
+            state = decoded[value] = decode_product_state(value)
+        states.append(state)
+    return states
+
+def _parse_state(value) -> Optional[int]:
     try:
-        state = int(state_hex)
-        byte1 = state & 0xFF
-        byte2 = (state >> 8) & 0xFF
-        byte3 = (state >> 16) & 0xFF
-        
-        logging.info("\nProduct State Interpretation:")
-        logging.info(f"Raw state value: 0x{state:06X}")
-        logging.info(f"Byte 1 (0x{byte1:02X}): Product type - {get_product_type(byte1)}")
-        logging.info(f"Byte 2 (0x{byte2:02X}): Product status - {get_product_status(byte2)}")
-        logging.info(f"Byte 3 (0x{byte3:02X}): Signature status - {get_signature_status(byte3)}")
-        
-    except ValueError:
-        logging.warning(f"Could not interpret product state value: {state_hex}")
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# Format-List prints "name : value" (just "name :" when empty), wmic
+# /format:list prints "name=value"
+_LIST_FIELD = re.compile(r"^(\w+)(?:\s+:(?:\s+(.*))?|=(.*))$")
+
+def parse_antivirus_output(output, category=None) -> List[SecurityProduct]:
+    """Parse Format-List or `wmic ... /format:list` output into one record
+    per product. Accepts the captured output or an iterable of lines (e.g.
+    iter_lines). Products without a `class` property get `category`."""
+    if isinstance(output, str):
+        output = output.splitlines()
 
-def get_security_center_info():
-    """Get additional information from Windows Security Center using PowerShell"""
+    blocks = []
+    for lines in wmic.iter_list(output):
+        fields: Dict[str, str] = {}
+        key = None
+        for line in lines:
+            match = _LIST_FIELD.match(line)
+            if match:
+                key = match.group(1)
+                fields[key] = (match.group(2) if match.group(2) is not None else match.group(3) or "").strip()
+            elif key:
+                # Format-List wraps long values onto the following lines
+                fields[key] += line
+        blocks.append(fields)
+
+    states = decode_product_states(_parse_state(fields.get('productState')) for fields in blocks)
+    records = []
+    for fields, state in zip(blocks, states):
+        kind = PRODUCT_CLASSES.get(fields.get('class', ''), category or "antivirus")
+        name = fields.get('displayName', '')
+        path, timestamp = fields.get('pathToSignedProductExe', ''), fields.get('timestamp', '')
+        if state is None:
+            logger.warning("%s product %s has no valid productState: %r", kind, name, fields.get('productState'))
+            records.append(SecurityProduct(kind, name, None, (), "", "", path, timestamp))
+            continue
+        records.append(SecurityProduct(kind, name, state.value, state.providers, state.realtime,
+                                       "" if kind == "firewall" else state.signatures, path, timestamp))
+    return records
+
+def log_products(records: List[SecurityProduct]):
+    for product in records:
+        if product.product_state is None:
+            # Already warned about while parsing; nothing to check
+            continue
+        logger.info("%s: %s - real-time protection %s%s (productState 0x%06X: %s)", product.category,
+                    product.display_name, product.realtime,
+                    f", signatures {product.signatures}" if product.signatures else "",
+                    product.product_state, ", ".join(product.providers) or "no provider flags")
+        if product.realtime != "on":
+            logger.warning("%s %s is not protecting in real time (%s)", product.category, product.display_name,
+                           product.realtime)
+        if product.signatures == "out_of_date":
+            logger.warning("%s %s signatures are out of date", product.category, product.display_name)
+    for category in PRODUCT_CLASSES.values():
+        if not any(product.category == category for product in records):
+            logger.warning("No %s product registered with Security Center", category)
+
+def get_antivirus_details() -> List[SecurityProduct]:
+    """Antivirus, antispyware and firewall products registered with
+    Security Center, from one PowerShell run or, failing that, wmic"""
     try:
-        logging.info("\n=== Windows Security Center Information ===")
-        
-        # Check Security Center service
-        service_status = run_command(
-            "sc query wscsvc",
-            "Retrieved Security Center service status"
-        )
-        
-        # Get security provider information via PowerShell
-        ps_command = (
-            "Get-CimInstance -Namespace root/SecurityCenter2 -ClassName AntiVirusProduct | "
-            "Select-Object displayName, productState | Format-List; "
-            "Get-CimInstance -Namespace root/SecurityCenter2 -ClassName FirewallProduct | "
-            "Select-Object displayName, productState | Format-List; "
-            "Get-CimInstance -Namespace root/SecurityCenter2 -ClassName AntiSpywareProduct | "
-            "Select-Object displayName, productState | Format-List"
-        )
-        
-        providers = run_command(
-            ["powershell", "-Command", ps_command],
-            "Retrieved security providers information"
+        logger.info("\n=== Security Center Products ===")
+        records = stream_command(
+            command_runner.powershell_args(PRODUCTS_SCRIPT),
+            parse_antivirus_output,
+            "Retrieved Security Center products via PowerShell"
         )
-        
+        if not records:
+            logger.warning("Attempting legacy WMIC command as fallback...")
+            records = []
+            for class_name, category in PRODUCT_CLASSES.items():
+                records += stream_command(
+                    ["wmic", "/namespace:\\\\root\\SecurityCenter2", "path", class_name,
+                     "get", ",".join(PRODUCT_PROPERTIES), "/format:list"],
+                    lambda lines: parse_antivirus_output(lines, category),
+                    f"Retrieved {class_name} via legacy WMIC"
+                ) or []
+        log_products(records)
+        return records
     except Exception as e:
-        logging.error(f"Error in get_security_center_info: {e}")
+        logger.error("Unexpected error in get_antivirus_details: %s", e)
+    return []
+
+# Saved record types aggregate_product_states reads
+PRODUCT_RECORD_TYPES = ("SecurityProduct", "AntivirusProduct")
+
+def aggregate_product_states(records: Iterable[Dict[str, Any]]) -> Counter:
+    """Count saved product records (e.g. from report.iter_saved_records over
+    a fleet's reports) by category, product, real-time and signature state.
+    States are re-decoded from productState, so reports written before the
+    decoder was fixed (AntivirusProduct records) are counted correctly."""
+    keys = []
+    values = []
+    for record in records:
+        kind = record.get("type")
+        if kind == "SecurityProduct":
+            keys.append((record["category"], record["display_name"]))
+            values.append(record["product_state"])
+        elif kind == "AntivirusProduct":
+            keys.append(("antivirus", record["display_name"]))
+            values.append(_parse_state(record["fields"].get("productState")))
+    counts = Counter()
+    for (category, name), state in zip(keys, decode_product_states(values)):
+        if state is None:
+            counts[category, name, "undecoded", ""] += 1
+        else:
+            counts[category, name, state.realtime, "" if category == "firewall" else state.signatures] += 1
+    return counts
+
+DEFENDER_STATUS_FIELDS = [
+    "AMRunningMode", "AMServiceEnabled", "AntivirusEnabled", "RealTimeProtectionEnabled",
+    "BehaviorMonitorEnabled", "IoavProtectionEnabled", "IsTamperProtected", "AntivirusSignatureAge",
+    "AntivirusSignatureVersion", "AMEngineVersion", "AMProductVersion", "FullScanAge",
+]
+DEFENDER_PREFERENCE_FIELDS = [
+    "ExclusionPath", "ExclusionExtension", "ExclusionProcess", "MAPSReporting", "PUAProtection",
+]
+
+# Defender status, the preferences that matter and the Security Center
+# service state, as one JSON document from one PowerShell run. Only the
+# fields above are selected, not the hundreds Get-Mp* return.
+DEFENDER_SCRIPT = (
+    "[pscustomobject]@{ "
+    "Status = Get-MpComputerStatus -ErrorAction SilentlyContinue | Select-Object "
+    + ", ".join(DEFENDER_STATUS_FIELDS) + "; "
+    "Preference = Get-MpPreference -ErrorAction SilentlyContinue | Select-Object "
+    + ", ".join(DEFENDER_PREFERENCE_FIELDS) + "; "
+    "SecurityCenter = [string](Get-Service wscsvc -ErrorAction SilentlyContinue).Status "
+    "} | ConvertTo-Json -Compress"
+)
+
+# Signatures older than this many days are reported as stale
+SIGNATURE_MAX_AGE_DAYS = 7
 
-def check_windows_defender():
-    """Specifically check Windows Defender status using PowerShell"""
+# Exclusions that take whole drives, user-writable trees or every script out of scanning
+BROAD_EXCLUSION = re.compile(
+    r"^[a-z]:\\?$|^[a-z]:\\users\\?$|\\(appdata|temp|downloads)(\\|$)|^%(temp|appdata|userprofile)%"
+    r"|^\.?(exe|dll|ps1|bat|cmd|vbs|js)$|^(powershell|cmd|wscript|cscript|mshta)(\.exe)?$",
+    re.I)
+
+class DefenderHealth(NamedTuple):
+    running_mode: str               # 'Normal', 'Passive mode', 'EDR Block Mode', ...
+    realtime_protection: Optional[bool]
+    behavior_monitoring: Optional[bool]
+    tamper_protected: Optional[bool]
+    signature_age_days: Optional[int]
+    signature_version: str
+    engine_version: str
+    product_version: str
+    exclusions: Optional[int]       # None when not readable (needs administrator)
+    security_center: str            # wscsvc service state
+    findings: Tuple[str, ...] = ()
+
+DEFENDER_FINDINGS = {
+    "defender_disabled": "Defender antivirus is disabled or not the active engine",
+    "realtime_disabled": "real-time protection is off",
+    "behavior_monitoring_disabled": "behavior monitoring is off",
+    "tamper_protection_off": "tamper protection is off",
+    "signatures_stale": f"signatures are older than {SIGNATURE_MAX_AGE_DAYS} days",
+    "broad_exclusion": "an exclusion covers a drive, user-writable folder or script type",
+    "cloud_protection_off": "cloud-delivered protection (MAPS) is off",
+    "security_center_stopped": "the Security Center service is not running",
+}
+
+def _exclusions(preference: Dict[str, Any]) -> Optional[List[str]]:
+    """All exclusions, or None when Get-MpPreference withheld them"""
+    values = []
+    for field in ("ExclusionPath", "ExclusionExtension", "ExclusionProcess"):
+        value = preference.get(field) or []
+        values += [value] if isinstance(value, str) else value
+    if any(value.startswith("N/A") for value in values):
+        # "N/A: Must be an administrator to view exclusions"
+        return None
+    return values
+
+def parse_defender_health(output: str) -> Optional[DefenderHealth]:
+    """DefenderHealth from the DEFENDER_SCRIPT JSON; None when Defender is
+    not installed (Get-MpComputerStatus returned nothing)"""
+    document = json.loads(output)
+    status = document.get("Status") or {}
+    if not status:
+        return None
+    preference = document.get("Preference") or {}
+    exclusions = _exclusions(preference)
+    age = status.get("AntivirusSignatureAge")
+    # 4294967295 (-1 as a UInt32) means the signatures were never updated
+    signature_age = None if age is None or age >= 0xFFFFFFFF else int(age)
+    health = DefenderHealth(
+        str(status.get("AMRunningMode") or ""),
+        status.get("RealTimeProtectionEnabled"),
+        status.get("BehaviorMonitorEnabled"),
+        status.get("IsTamperProtected"),
+        signature_age,
+        str(status.get("AntivirusSignatureVersion") or ""),
+        str(status.get("AMEngineVersion") or ""),
+        str(status.get("AMProductVersion") or ""),
+        None if exclusions is None else len(exclusions),
+        str(document.get("SecurityCenter") or ""),
+    )
+    findings = []
+    if status.get("AntivirusEnabled") is False or status.get("AMServiceEnabled") is False \
+            or health.running_mode not in ("", "Normal"):
+        findings.append("defender_disabled")
+    if health.realtime_protection is False:
+        findings.append("realtime_disabled")
+    if health.behavior_monitoring is False:
+        findings.append("behavior_monitoring_disabled")
+    if health.tamper_protected is False:
+        findings.append("tamper_protection_off")
+    if age is not None and (signature_age is None or signature_age > SIGNATURE_MAX_AGE_DAYS):
+        findings.append("signatures_stale")
+    if exclusions and any(BROAD_EXCLUSION.search(value.strip()) for value in exclusions):
+        findings.append("broad_exclusion")
+    if preference.get("MAPSReporting") == 0:
+        findings.append("cloud_protection_off")
+    if health.security_center and health.security_center != "Running":
+        findings.append("security_center_stopped")
+    return health._replace(findings=tuple(findings))
+
+def _on_off(value: Optional[bool]) -> str:
+    return "unknown" if value is None else ("on" if value else "off")
+
+def check_windows_defender() -> Optional[DefenderHealth]:
+    """Defender status, preferences and the Security Center service in one
+    PowerShell run, reduced to a DefenderHealth record"""
     try:
-        logging.info("\n=== Windows Defender Specific Check ===")
-        
-        # Check Defender status
-        defender_status = run_command(
-            ["powershell", "-Command", 
-             "Get-MpComputerStatus | Select-Object * | Format-List"],
-            "Retrieved Windows Defender status"
-        )
-        
-        # Check Defender preferences
-        defender_prefs = run_command(
-            ["powershell", "-Command", "Get-MpPreference | Select-Object * | Format-List"],
-            "Retrieved Windows Defender preferences"
-        )
-        
+        logger.info("\n=== Windows Defender Specific Check ===")
+        output = run_command(command_runner.powershell_args(DEFENDER_SCRIPT), "Retrieved Windows Defender status")
+        if not output or not output.strip():
+            return None
+        health = parse_defender_health(output)
+        if health is None:
+            logger.info("Windows Defender is not installed or not reporting status")
+            return None
+        logger.info("Defender %s (engine %s, signatures %s, %s days old), real-time protection %s, "
+                    "tamper protection %s, %s exclusions, Security Center service %s",
+                    health.running_mode or "unknown mode", health.engine_version or "?",
+                    health.signature_version or "?",
+                    "?" if health.signature_age_days is None else health.signature_age_days,
+                    _on_off(health.realtime_protection), _on_off(health.tamper_protected),
+                    "unknown (not administrator)" if health.exclusions is None else health.exclusions,
+                    health.security_center or "unknown")
+        for finding in health.findings:
+            logger.warning("Defender: %s", DEFENDER_FINDINGS[finding])
+        return health
     except Exception as e:
-        logging.error(f"Error in check_windows_defender: {e}")
+        logger.error("Error in check_windows_defender: %s", e)
+        return None
 
 def check_antivirus():
     """Main function to check antivirus status and related security information"""
     try:
-        setup_logging()
-        logging.info("Starting comprehensive antivirus audit...")
+        logger.info("Starting comprehensive antivirus audit...")
         
         # Check if we're running as administrator
         try:
@@ -204,18 +384,31 @@ def check_antivirus():
             is_admin = ctypes.windll.shell32.IsUserAnAdmin() != 0
             
         if not is_admin:
-            logging.warning("Warning: Not running as administrator. Some information may not be available.")
+            logger.warning("Warning: Not running as administrator. Some information may not be available.")
         
         # Get security information
-        get_antivirus_details()
-        get_security_center_info()
-        check_windows_defender()
+        records = get_antivirus_details()
+        health = check_windows_defender()
+        if health:
+            records.append(health)
         
-        logging.info("\n=== Antivirus Audit Completed ===")
-        return True
+        logger.info("\n=== Antivirus Audit Completed ===")
+        return records
     except Exception as e:
-        logging.error(f"Antivirus audit failed: {e}")
-        return False
+        logger.error("Antivirus audit failed: %s", e)
+        return []
 
 if __name__ == "__main__":
-    check_antivirus()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Antivirus audit, or a product state summary of saved reports")
+    parser.add_argument("--aggregate", nargs="+", metavar="REPORT",
+                        help="Count security products by state across saved JSON/NDJSON reports and exit")
+    args = parser.parse_args()
+    setup_logging(console=True)
+    if args.aggregate:
+        counts = aggregate_product_states(record for path in args.aggregate
+                                          for record in report.iter_saved_records(path, PRODUCT_RECORD_TYPES))
+        for (category, name, realtime, signatures), count in counts.most_common():
+            logger.info("%8d  %-11s %s: real-time %s%s", count, category, name, realtime,
+                        f", signatures {signatures}" if signatures else "")
+    else:
+        check_antivirus()
\ No newline at end of file
@@ -0,0 +1,298 @@
+import atexit
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LOG_FILE = "audit.log"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_FORMATS = ("text", "jsonl")
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, for log collectors"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+def rotated_path(path, index):
+    """Name of the index-th rotated copy of the log at path"""
+    root, gz = (path[:-3], ".gz") if path.endswith(".gz") else (path, "")
+    return f"{root}.{index}{gz}"
+
+class BatchingFileHandler(logging.Handler):
+    """File handler that only formats on emit and writes on flush.
+
+    The LogPipeline flushes after each batch it drains from the queue, so
+    the file sees one write per batch instead of one per record. Optional
+    gzip compression, and size-based rotation to `path.1` ... `path.N`
+    (before the .gz suffix) once the file on disk reaches max_bytes; for a
+    gzipped log that is its compressed size.
+    """
+
+    def __init__(self, path, mode="w", compress=False, max_bytes=None, backup_count=3):
+        super().__init__()
+        if compress and not path.endswith(".gz"):
+            path += ".gz"
+        self.path = path
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._pending = []
+        self._stream = self._open(mode)
+
+    def _open(self, mode):
+        if self.compress:
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _rotated(self, index):
+        return rotated_path(self.path, index)
+
+    def _rotate(self):
+        self._stream.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self._rotated(index)):
+                os.replace(self._rotated(index), self._rotated(index + 1))
+        if self.backup_count > 0:
+            os.replace(self.path, self._rotated(1))
+        self._stream = self._open("w")
+
+    def emit(self, record):
+        try:
+            self._pending.append(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        if not self._pending or self._stream is None:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self._stream.write(text)
+        # A gzip stream's flush also flushes the compressor, so the size on
+        # disk is up to date
+        self._stream.flush()
+        if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        self.flush()
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        super().close()
+
+class LogPipeline:
+    """Queue between the threads that log and the handlers that write.
+
+    Producers only put records on a queue (QueueHandler); one background
+    thread drains it in batches of up to batch_size records, hands them to
+    the handlers and flushes them once per batch. Auditing threads never
+    wait on disk or console I/O, or on each other's handler locks.
+    """
+
+    def __init__(self, handlers, batch_size=512):
+        self.queue = queue.SimpleQueue()
+        self.handlers = list(handlers)
+        self.batch_size = batch_size
+        self._thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = False
+            for record in batch:
+                if record is None:
+                    done = True
+                    continue
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+            if done:
+                return
+
+    def stop(self):
+        """Write everything still queued and close the handlers"""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+        for handler in self.handlers:
+            handler.close()
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps a record's traceback apart from its message.
+
+    The stock prepare() formats the traceback into the message, so the
+    JSON lines formatter could no longer report it as its own field.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_pipeline = None
+
+def setup_logging(path=LOG_FILE, fmt="text", compress=False, max_bytes=None, backup_count=3,
+                  level=logging.INFO, console=False):
+    """Log to `path` (overwritten each run) through a LogPipeline.
+
+    fmt is "text" or "jsonl"; compress gzips the file; max_bytes rotates
+    it, keeping backup_count older files; console also echoes to stderr.
+    This is the only place the root logger is configured: modules log
+    through `logging.getLogger(__name__)` and never add handlers.
+    """
+    global _pipeline
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format: {fmt}")
+    shutdown_logging()
+    handler = BatchingFileHandler(path, "w", compress, max_bytes, backup_count)
+    handler.setFormatter(JsonLinesFormatter() if fmt == "jsonl" else logging.Formatter(LOG_FORMAT))
+    handlers = [handler]
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(stream)
+    _pipeline = LogPipeline(handlers)
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(_QueueHandler(_pipeline.queue))
+    root.setLevel(level)
+    return _pipeline
+
+def shutdown_logging():
+    """Drain the pipeline started by setup_logging; safe to call twice"""
+    global _pipeline
+    if _pipeline is not None:
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            if getattr(handler, "queue", None) is _pipeline.queue:
+                root.removeHandler(handler)
+        _pipeline.stop()
+        _pipeline = None
+
+atexit.register(shutdown_logging)
+
+def clear_logs(path=LOG_FILE, compress=False, backup_count=3):
+    """Remove the log at `path` (with the .gz suffix setup_logging adds when
+    compress is set) and up to backup_count rotated copies of it.
+
+    Returns the paths removed.
+    """
+    if compress and not path.endswith(".gz"):
+        path += ".gz"
+    removed = []
+    for candidate in [path] + [rotated_path(path, index) for index in range(1, backup_count + 1)]:
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            continue
+        removed.append(candidate)
+    return removed
+
+_section = threading.local()
+
+class SectionBufferHandler(logging.Handler):
+    """Root handler that holds records emitted inside a buffered section.
+
+    Records logged outside a section are passed straight to the wrapped
+    handlers. Records logged inside one are kept until the section is flushed,
+    so output from audits running in parallel does not interleave.
+    """
+
+    def __init__(self, targets):
+        super().__init__()
+        self.targets = list(targets)
+
+    def emit(self, record):
+        buffer = getattr(_section, "buffer", None)
+        if buffer is not None:
+            buffer.append(record)
+        else:
+            self.dispatch(record)
+
+    def dispatch(self, record):
+        for handler in self.targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush_section(self, name, records):
+        """Write one finished section to the wrapped handlers."""
+        self.dispatch(logging.makeLogRecord({
+            "name": "root",
+            "levelno": logging.INFO,
+            "levelname": "INFO",
+            "msg": f"----- Audit section: {name} -----",
+        }))
+        for record in records:
+            self.dispatch(record)
+
+
+@contextmanager
+def section_buffering():
+    """Route root logging through a SectionBufferHandler for the duration."""
+    root = logging.getLogger()
+    original = root.handlers[:]
+    handler = SectionBufferHandler(original)
+    root.handlers = [handler]
+    try:
+        yield handler
+    finally:
+        root.handlers = original
+
+
+@contextmanager
+def buffered_section():
+    """Collect records logged by the current thread into a list."""
+    previous = getattr(_section, "buffer", None)
+    _section.buffer = []
+    try:
+        yield _section.buffer
+    finally:
+        _section.buffer = previous
+
+
+def bind_section(func):
+    """Wrap func so that records it logs from another thread (e.g. a pool
+    worker started by an audit) land in the calling thread's section."""
+    buffer = getattr(_section, "buffer", None)
+
+    def run(*args, **kwargs):
+        previous = getattr(_section, "buffer", None)
+        _section.buffer = buffer
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _section.buffer = previous
+    return run
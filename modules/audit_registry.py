@@ -0,0 +1,142 @@
+import importlib
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Distributions can add audits under this entry point group, e.g.
+#   [project.entry-points."winsecmon.audits"]
+#   bitlocker = "winsecmon_bitlocker:audit_bitlocker"
+# The entry point name is the command line flag (--bitlocker) and section name.
+ENTRY_POINT_GROUP = "winsecmon.audits"
+
+class AuditSpec(NamedTuple):
+    dest: str               # command line flag without the dashes
+    name: str               # section name in audit.log and the report
+    target: str             # "package.module:function", imported on first use
+    help: str
+
+    @property
+    def module_name(self) -> str:
+        return self.target.partition(":")[0]
+
+    def load_module(self):
+        return importlib.import_module(self.module_name)
+
+    def load(self) -> Callable:
+        """Import the audit's module and return its entry point"""
+        module = self.load_module()
+        func = module
+        for attr in self.target.partition(":")[2].split("."):
+            func = getattr(func, attr)
+        return func
+
+# Built-in audits, in the order sections appear in audit.log. Their modules
+# are only imported when the audit runs (or its options are needed).
+BUILTIN_AUDITS = [
+    AuditSpec("system", "system_info", "modules.system_info:get_system_info",
+              "Perform system information audit"),
+    AuditSpec("firewall", "firewall_check", "modules.firewall_check:check_firewall_status",
+              "Perform firewall audit"),
+    AuditSpec("antivirus", "antivirus_check", "modules.antivirus_check:check_antivirus",
+              "Perform antivirus audit"),
+    AuditSpec("patch", "patch_management", "modules.patch_management:check_patch_status",
+              "Perform patch management audit"),
+    AuditSpec("startup", "startup_review", "modules.startup_review:check_startup_apps",
+              "Perform Startup Review audit"),
+    AuditSpec("service", "services", "modules.services:audit_services",
+              "Perform service audit"),
+    AuditSpec("applications", "installed_applications", "modules.installed_applications:list_installed_apps",
+              "Perform Applications audit"),
+    AuditSpec("schedule", "scheduled_task", "modules.scheduled_task:check_scheduled_tasks",
+              "Perform Schedule Task audit"),
+    AuditSpec("accounts", "user_accounts", "modules.user_accounts:audit_user_accounts",
+              "Perform User Accounts audit"),
+    AuditSpec("remote", "remote_access", "modules.remote_access:audit_remote_access",
+              "Perform Remote Access audit"),
+]
+
+_registry: Dict[str, AuditSpec] = {spec.dest: spec for spec in BUILTIN_AUDITS}
+_discovered = False
+
+def register(spec: AuditSpec):
+    """Add an audit; a spec with the dest of an existing one replaces it"""
+    if spec.dest in _registry and _registry[spec.dest].target != spec.target:
+        logger.warning("Audit --%s (%s) replaced by %s", spec.dest, _registry[spec.dest].target, spec.target)
+    _registry[spec.dest] = spec
+
+def audit(dest: str, name: Optional[str] = None, help: Optional[str] = None):
+    """Decorator registering a function as an audit, for code that is
+    imported anyway (e.g. a plugin module named by an entry point)"""
+    def decorate(func):
+        register(AuditSpec(dest, name or dest, f"{func.__module__}:{func.__qualname__}",
+                           help or (func.__doc__ or f"Perform {dest} audit").strip().splitlines()[0]))
+        return func
+    return decorate
+
+def _entry_points():
+    from importlib.metadata import entry_points
+    try:
+        return entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10 returns a dict of groups
+        return entry_points().get(ENTRY_POINT_GROUP, [])
+
+def discover() -> List[AuditSpec]:
+    """Register the audits of installed plugins, once, and return the new
+    ones. Entry points naming a function stay lazy; one naming a module is
+    imported so that its @audit decorators run. Reading the installed
+    distributions' metadata costs more than the rest of start-up, so this
+    only happens when a command line needs it."""
+    global _discovered
+    if _discovered:
+        return []
+    _discovered = True
+    before = set(_registry)
+    try:
+        points = list(_entry_points())
+    except Exception as e:
+        logger.warning("Could not read %s entry points: %s", ENTRY_POINT_GROUP, e)
+        return []
+    for point in points:
+        if ":" in point.value:
+            dist = getattr(getattr(point, "dist", None), "name", None)
+            register(AuditSpec(point.name, point.name, point.value.replace(" ", ""),
+                               f"Perform {point.name} audit" + (f" (from {dist})" if dist else "")))
+        else:
+            try:
+                importlib.import_module(point.value)
+            except Exception as e:
+                logger.warning("Could not load audit plugin %s: %s", point.value, e)
+    return [spec for dest, spec in _registry.items() if dest not in before]
+
+def audits() -> List[AuditSpec]:
+    """The registered audits: the built-in ones first, then plugins"""
+    return list(_registry.values())
+
+def add_audit_flags(parser, specs: Optional[List[AuditSpec]] = None):
+    """One --<dest> flag per audit (default: all registered so far); no
+    audit module is imported"""
+    for spec in audits() if specs is None else specs:
+        parser.add_argument(f"--{spec.dest}", action="store_true", help=spec.help)
+
+def add_audit_options(parser, specs: List[AuditSpec], added: Optional[set] = None):
+    """Let each audit's module add its own options (an add_arguments(parser)
+    function), in a group named after the audit. Imports those modules.
+    Modules already in `added` are skipped; the set is updated."""
+    added = set() if added is None else added
+    for spec in specs:
+        if spec.module_name in added:
+            continue
+        added.add(spec.module_name)
+        module = spec.load_module()
+        if hasattr(module, "add_arguments"):
+            module.add_arguments(parser.add_argument_group(f"{spec.name} options"))
+    return added
+
+def configure_audits(specs: List[AuditSpec], args):
+    """Pass the parsed options to each audit's configure_from_args(args)"""
+    for module_name in dict.fromkeys(spec.module_name for spec in specs):
+        module = importlib.import_module(module_name)
+        if hasattr(module, "configure_from_args"):
+            module.configure_from_args(args)
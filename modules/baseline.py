@@ -0,0 +1,159 @@
+import hashlib
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from modules.report import to_jsonable
+
+logger = logging.getLogger(__name__)
+
+# Fields that identify a record across runs; records of other types are
+# identified by their full contents, so a change shows as removed + added.
+RECORD_KEYS = {
+    "ServiceRecord": ("name",),
+    "ScheduledTask": ("folder", "name"),
+    "UserAccount": ("name",),
+    "AdminMember": ("name",),
+    "Hotfix": ("hotfix_id",),
+    "PatchFinding": ("kb", "status"),
+    "InstalledApp": ("name", "version"),
+    "StartupEntry": ("caption", "command"),
+    "AutorunEntry": ("location", "entry", "launch_string"),
+    "FirewallRule": ("name", "direction", "profiles", "action", "protocol", "local_port", "remote_ip", "program"),
+    "FirewallProfile": ("name",),
+    "SecurityProduct": ("category", "display_name"),
+    "DefenderHealth": (),
+    "SystemInfoEntry": ("key",),
+}
+
+class BaselineChange(NamedTuple):
+    change: str          # 'added', 'removed' or 'changed'
+    record_type: str
+    key: List[Any]
+    record: Optional[Dict[str, Any]]
+    previous: Optional[Dict[str, Any]]
+
+def key_values(record: Dict[str, Any]) -> List[Any]:
+    """The identifying field values of a record (all of them for unkeyed types)"""
+    fields = RECORD_KEYS.get(record["type"])
+    if fields is None:
+        return [value for field, value in sorted(record.items()) if field != "type"]
+    return [record.get(field) for field in fields]
+
+def record_key(record: Dict[str, Any]) -> str:
+    return json.dumps([record["type"]] + key_values(record), sort_keys=True)
+
+def section_digest(records: List[Dict[str, Any]]) -> str:
+    canonical = json.dumps(records, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _group(records: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(record_key(record), []).append(record)
+    return groups
+
+def diff_records(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> List[BaselineChange]:
+    """Added, removed and changed records between two runs of one module.
+
+    Several records may share a key (built-in firewall rules reuse names,
+    for one); those are compared as a multiset: identical records cancel
+    out and the rest are paired up in order as changes.
+    """
+    before = _group(previous)
+    after = _group(current)
+    changes = []
+    for key, records in after.items():
+        old = list(before.get(key, ()))
+        new = []
+        for record in records:
+            if record in old:
+                old.remove(record)
+            else:
+                new.append(record)
+        for record, previous_record in itertools.zip_longest(new, old):
+            if previous_record is None:
+                changes.append(BaselineChange("added", record["type"], key_values(record), record, None))
+            elif record is None:
+                changes.append(BaselineChange("removed", previous_record["type"], key_values(previous_record),
+                                              None, previous_record))
+            else:
+                changes.append(BaselineChange("changed", record["type"], key_values(record), record,
+                                              previous_record))
+    for key, records in before.items():
+        if key not in after:
+            changes.extend(BaselineChange("removed", record["type"], key_values(record), None, record)
+                           for record in records)
+    return changes
+
+class BaselineStore:
+    """On-disk snapshot of the last records seen per host and module.
+
+    Each module's records are stored as compressed JSON together with a
+    SHA-256 digest of their canonical form, so a section that has not
+    changed since the last run is recognised by comparing one hash.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sections ("
+            " host TEXT NOT NULL, module TEXT NOT NULL, digest TEXT NOT NULL,"
+            " records BLOB NOT NULL, updated TEXT NOT NULL,"
+            " PRIMARY KEY (host, module))"
+        )
+        self._db.commit()
+
+    def load(self, host: str, module: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT digest, records FROM sections WHERE host = ? AND module = ?", (host, module)
+            ).fetchone()
+
+    def save(self, host: str, module: str, digest: str, records: List[Dict[str, Any]]):
+        blob = zlib.compress(json.dumps(records, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sections (host, module, digest, records, updated) VALUES (?, ?, ?, ?, ?)",
+                (host, module, digest, blob, datetime.now(timezone.utc).isoformat()),
+            )
+            self._db.commit()
+
+    def compare(self, host: str, module: str, records) -> Optional[List[BaselineChange]]:
+        """Compare a module's records with the baseline and store them as the new baseline.
+
+        Returns None when there was no baseline yet, [] when the section is
+        unchanged, and the list of changes otherwise.
+        """
+        current = [to_jsonable(record) for record in records]
+        digest = section_digest(current)
+        stored = self.load(host, module)
+        if stored is not None and stored[0] == digest:
+            return []
+        self.save(host, module, digest, current)
+        if stored is None:
+            return None
+        previous = json.loads(zlib.decompress(stored[1]).decode("utf-8"))
+        return diff_records(previous, current)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def log_changes(module: str, changes: List[BaselineChange], examples=50):
+    """Log a one-line summary of a module's changes and the first few of them"""
+    counts = {}
+    for change in changes:
+        counts[change.change] = counts.get(change.change, 0) + 1
+    logger.info("%s: %s", module, ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())))
+    for change in changes[:examples]:
+        logger.info("  %s %s %s", change.change.upper(), change.record_type, change.key)
+    if len(changes) > examples:
+        logger.info("  ... %s more changes in the report", len(changes) - examples)
@@ -0,0 +1,459 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, NamedTuple, Optional, Sequence
+from modules import profiler
+from modules.powershell_host import PowerShellPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 120  # seconds
+
+# Streamed output kept in memory before a recording moves to a temp file
+SPOOL_MEMORY_BYTES = 1 << 20
+
+MODE_LIVE = "live"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+POWERSHELL_PREFIX = ("powershell", "-NoProfile", "-NonInteractive", "-Command")
+
+class OutputLimitExceeded(subprocess.SubprocessError):
+    """A streamed command wrote more than the configured byte cap"""
+
+    def __init__(self, cmd, limit):
+        self.cmd = cmd
+        self.limit = limit
+
+    def __str__(self):
+        return f"Command '{' '.join(self.cmd)}' wrote more than {self.limit} bytes"
+
+class CommandTiming(NamedTuple):
+    args: Sequence[str]
+    seconds: float                  # waiting for the command, without parse_seconds
+    returncode: Optional[int]
+    cached: bool
+    start: float = 0.0              # time.perf_counter() at start
+    cpu_seconds: Optional[float] = None     # user + system time of the child process
+    output_bytes: int = 0
+    parse_seconds: Optional[float] = None   # spent by the consumer of streamed output
+    module: Optional[str] = None    # audit that ran the command
+    thread: str = ""
+
+_config = {
+    "mode": MODE_LIVE,
+    "fixture_dir": None,
+    "timeout": DEFAULT_TIMEOUT,
+    "cache": True,
+    "max_output_bytes": None,
+}
+
+_powershell_pool: Optional[PowerShellPool] = None
+
+_cache = {}
+_cache_lock = threading.Lock()
+_key_locks = {}
+_timings: List[CommandTiming] = []
+
+def configure(mode=MODE_LIVE, fixture_dir=None, timeout=DEFAULT_TIMEOUT, cache=True,
+              powershell_workers=0, powershell_worker_command=None, max_output_bytes=None):
+    """Select the execution backend for this run.
+
+    live   - run commands on this machine
+    record - run commands and save every result under fixture_dir
+    replay - never run anything, serve results saved by a previous record run
+
+    With powershell_workers > 0, PowerShell scripts run through powershell_args()
+    are sent to a pool of long-lived PowerShell processes instead of starting
+    a new interpreter each time. powershell_worker_command replaces the
+    worker process, e.g. with a fake worker for benchmarks.
+
+    max_output_bytes caps the output of streamed commands (iter_lines);
+    a command that writes more is killed and OutputLimitExceeded raised.
+    """
+    global _powershell_pool
+    if mode not in (MODE_LIVE, MODE_RECORD, MODE_REPLAY):
+        raise ValueError(f"Unknown command runner mode: {mode}")
+    if mode != MODE_LIVE and not fixture_dir:
+        raise ValueError(f"Mode '{mode}' needs a fixture directory")
+    if mode == MODE_RECORD:
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    _config.update(mode=mode, fixture_dir=fixture_dir, timeout=timeout, cache=cache,
+                   max_output_bytes=max_output_bytes)
+    shutdown()
+    if powershell_workers > 0 and mode != MODE_REPLAY:
+        _powershell_pool = PowerShellPool(powershell_workers, powershell_worker_command)
+    reset()
+
+def shutdown():
+    """Stop the PowerShell workers started for this run"""
+    global _powershell_pool
+    if _powershell_pool is not None:
+        _powershell_pool.close()
+        _powershell_pool = None
+
+def reset():
+    """Forget cached results and timings from a previous run"""
+    with _cache_lock:
+        _cache.clear()
+        _key_locks.clear()
+        del _timings[:]
+
+def _fixture_path(args):
+    program = os.path.basename(args[0]).lower()
+    program = re.sub(r"[^a-z0-9_.]+", "_", program)
+    digest = hashlib.sha1(json.dumps(list(args)).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(_config["fixture_dir"], f"{program}-{digest}.json")
+
+def which(program):
+    """shutil.which that also knows about programs available in the replay fixtures"""
+    if _config["mode"] == MODE_REPLAY:
+        prefix = re.sub(r"[^a-z0-9_.]+", "_", program.lower()) + "-"
+        try:
+            names = os.listdir(_config["fixture_dir"])
+        except OSError:
+            return None
+        return program if any(name.startswith(prefix) for name in names) else None
+    return shutil.which(program)
+
+def _reap(proc) -> Optional[float]:
+    """Wait for a command to exit and return the user + system seconds it
+    used, None if unknown. On POSIX the child is reaped with os.wait4,
+    which reports its resource usage, and proc.returncode set from the
+    status; Windows reads the times of the exited process handle."""
+    if os.name == "nt":
+        proc.wait()
+        import ctypes
+        from ctypes import wintypes
+        times = [wintypes.FILETIME() for _ in range(4)]  # creation, exit, kernel, user
+        if ctypes.windll.kernel32.GetProcessTimes(wintypes.HANDLE(int(proc._handle)),
+                                                  *map(ctypes.byref, times)):
+            return sum((t.dwHighDateTime << 32 | t.dwLowDateTime) for t in times[2:]) / 1e7
+        return None
+    if proc.returncode is not None:
+        return None
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        # Reaped elsewhere (e.g. SIGCHLD ignored)
+        proc.wait()
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_utime + usage.ru_stime
+
+def _spawn(args, **kwargs):
+    """Popen in a process group of its own, so the command can be killed
+    together with anything it starts"""
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    return subprocess.Popen(args, **kwargs)
+
+def _kill_tree(proc):
+    """Kill a command and the processes it started. Killing only the command
+    is not enough: a child that inherited its stdout (`sh -c "...; sleep 5"`)
+    keeps the pipe open, and reading it would block until that child exits."""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass
+    proc.kill()
+
+def _watchdog(proc, timeout):
+    """Start a timer that kills the command's process tree after timeout
+    seconds; returns (timer, event set if it fired)"""
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        _kill_tree(proc)
+
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+    return timer, timed_out
+
+def _run_process(args, timeout):
+    """subprocess.run(capture_output=True, text=True) that also records the
+    child's CPU time on the result as cpu_seconds"""
+    with tempfile.TemporaryFile() as err_file:
+        proc = _spawn(args, stdout=subprocess.PIPE, stderr=err_file, text=True)
+        timer, timed_out = _watchdog(proc, timeout)
+        try:
+            stdout = proc.stdout.read()
+            cpu_seconds = _reap(proc)
+        finally:
+            timer.cancel()
+            if proc.returncode is None:
+                _kill_tree(proc)
+                proc.wait()
+            proc.stdout.close()
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(args, timeout)
+        err_file.seek(0)
+        stderr = io.TextIOWrapper(err_file, errors="replace")
+        try:
+            stderr_text = stderr.read()
+        finally:
+            stderr.detach()
+    result = subprocess.CompletedProcess(args, proc.returncode, stdout, stderr_text)
+    result.cpu_seconds = cpu_seconds
+    return result
+
+def _execute(args, timeout):
+    if _config["mode"] == MODE_REPLAY:
+        path = _fixture_path(args)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(2, "No recorded output for command", " ".join(args))
+        return subprocess.CompletedProcess(args, data["returncode"], data["stdout"], data["stderr"])
+
+    if _powershell_pool is not None and tuple(args[:-1]) == POWERSHELL_PREFIX:
+        result = _powershell_pool.run(args[-1], timeout)
+        result.args = args
+    else:
+        result = _run_process(args, timeout)
+
+    if _config["mode"] == MODE_RECORD:
+        with open(_fixture_path(args), "w", encoding="utf-8") as f:
+            json.dump({
+                "args": list(args),
+                "returncode": result.returncode,
+                "stdout": result.stdout,
+                "stderr": result.stderr,
+            }, f)
+    return result
+
+def run(args, timeout=None, check=False, use_cache=True):
+    """Run a command through the configured backend.
+
+    Returns a subprocess.CompletedProcess with text stdout/stderr. Identical
+    commands are only executed once per run unless use_cache is False.
+    Raises subprocess.TimeoutExpired when the command outlives its timeout,
+    and subprocess.CalledProcessError for a non-zero exit when check is set.
+    """
+    args = tuple(args)
+    if timeout is None:
+        timeout = _config["timeout"]
+    use_cache = use_cache and _config["cache"]
+
+    with _cache_lock:
+        key_lock = _key_locks.setdefault(args, threading.Lock())
+
+    # Holding the per-command lock makes concurrent duplicates wait for the
+    # first invocation instead of starting their own process.
+    with key_lock:
+        cached = _cache.get(args) if use_cache else None
+        start = time.perf_counter()
+        result = None
+        try:
+            if cached is not None:
+                result = cached
+            else:
+                result = _execute(list(args), timeout)
+                if use_cache:
+                    _cache[args] = result
+        finally:
+            if cached is not None or result is None:
+                _record_timing(args, start, None if result is None else result.returncode, cached is not None)
+            else:
+                _record_timing(args, start, result.returncode, cpu_seconds=getattr(result, "cpu_seconds", None),
+                               output_bytes=_text_bytes(result.stdout))
+
+    if check and result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, list(args), result.stdout, result.stderr)
+    return result
+
+def _text_bytes(text):
+    return len(text.encode("utf-8", "surrogateescape")) if text else 0
+
+def _record_timing(args, start, returncode, cached=False, cpu_seconds=None, output_bytes=0, parse_seconds=None):
+    elapsed = time.perf_counter() - start - (parse_seconds or 0)
+    _timings.append(CommandTiming(tuple(args), elapsed, returncode, cached, start, cpu_seconds, output_bytes,
+                                  parse_seconds, profiler.current_module(), threading.current_thread().name))
+    logger.debug("Command %s finished in %.2fs (returncode=%s, cached=%s)",
+                 ' '.join(args), elapsed, returncode, cached)
+
+class _LimitedReader(io.RawIOBase):
+    """Raw reader over a command's stdout pipe that counts the bytes read
+    and raises OutputLimitExceeded once they pass the limit"""
+
+    def __init__(self, raw, args, limit):
+        self._raw = raw
+        self._args = args
+        self._limit = limit
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._raw.readinto(buffer)
+        self.count += n or 0
+        if self._limit is not None and self.count > self._limit:
+            raise OutputLimitExceeded(self._args, self._limit)
+        return n
+
+def _sniff_encoding(stream):
+    """UTF-16 or UTF-8 from a byte order mark, or UTF-16 LE from a NUL
+    second byte (Sysinternals tools often omit the BOM); None (the locale
+    encoding) otherwise. Does not consume anything from the stream."""
+    if hasattr(stream, "peek"):
+        head = stream.peek(4)[:4]
+    else:
+        head = stream.read(4)
+        stream.seek(0)
+    if head[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        return "utf-16"
+    if head[:3] == b"\xef\xbb\xbf":
+        return "utf-8-sig"
+    if len(head) >= 2 and head[0] != 0 and head[1] == 0:
+        return "utf-16-le"
+    return None
+
+def _write_fixture(args, returncode, stdout_file, stderr):
+    """Save a recorded fixture, copying stdout from its spool in chunks so
+    the full output never has to be held in memory as one string"""
+    stdout_file.seek(0)
+    with open(_fixture_path(args), "w", encoding="utf-8") as f:
+        f.write(f'{{"args": {json.dumps(args)}, "returncode": {json.dumps(returncode)}, '
+                f'"stderr": {json.dumps(stderr)}, "stdout": "')
+        for chunk in iter(lambda: stdout_file.read(1 << 16), ""):
+            f.write(json.dumps(chunk)[1:-1])
+        f.write('"}')
+
+def iter_lines(args, timeout=None, check=False, max_bytes=None, encoding=None):
+    """Yield a command's stdout line by line, without line endings, as it runs.
+
+    Output is decoded incrementally, so memory use stays flat however much
+    a command prints. Without an explicit encoding, UTF-16 and UTF-8 are
+    recognized by their byte order mark (UTF-16 LE also without one) and
+    anything else uses the locale's encoding. At most max_bytes (default:
+    the configured max_output_bytes) are read; beyond that the command is
+    killed and OutputLimitExceeded raised.
+
+    Record mode also copies the lines into a temporary file that stays in
+    memory up to SPOOL_MEMORY_BYTES, to write its fixture.
+
+    Streamed commands bypass the result cache. The timeout covers the whole
+    command; when it expires, or the generator is closed early, the command
+    and everything it started are killed (see _kill_tree).
+    """
+    args = list(args)
+    if timeout is None:
+        timeout = _config["timeout"]
+    if max_bytes is None:
+        max_bytes = _config["max_output_bytes"]
+    start = time.perf_counter()
+    returncode = None
+    # Time spent by the consumer between lines, i.e. parsing the output
+    parse_seconds = 0.0
+
+    # Replayed output and scripts for the PowerShell workers arrive in one piece
+    captured = (_config["mode"] == MODE_REPLAY
+                or (_powershell_pool is not None and tuple(args[:-1]) == POWERSHELL_PREFIX))
+    if captured:
+        result = None
+        try:
+            result = _execute(args, timeout)
+            returncode = result.returncode
+            count = 0
+            for line in result.stdout.splitlines():
+                count += len(line) + 1
+                if max_bytes is not None and count > max_bytes:
+                    raise OutputLimitExceeded(args, max_bytes)
+                paused = time.perf_counter()
+                yield line
+                parse_seconds += time.perf_counter() - paused
+        finally:
+            _record_timing(args, start, returncode, cpu_seconds=getattr(result, "cpu_seconds", None),
+                           output_bytes=_text_bytes(result.stdout) if result is not None else 0,
+                           parse_seconds=parse_seconds)
+        stderr = result.stderr
+    else:
+        recorded = None
+        if _config["mode"] == MODE_RECORD:
+            recorded = tempfile.SpooledTemporaryFile(SPOOL_MEMORY_BYTES, "w+", encoding="utf-8")
+        cpu_seconds = None
+        with tempfile.TemporaryFile() as err_file:
+            proc = _spawn(args, stdout=subprocess.PIPE, stderr=err_file, bufsize=0)
+            timer, timed_out = _watchdog(proc, timeout)
+            reader = _LimitedReader(proc.stdout, args, max_bytes)
+            try:
+                source = io.BufferedReader(reader, 1 << 16)
+                for line in io.TextIOWrapper(source, encoding=encoding or _sniff_encoding(source),
+                                             errors="replace"):
+                    line = line.rstrip("\r\n")
+                    if recorded is not None:
+                        recorded.write(line + "\n")
+                    paused = time.perf_counter()
+                    yield line
+                    parse_seconds += time.perf_counter() - paused
+                if proc.returncode is None:
+                    cpu_seconds = _reap(proc)
+                returncode = proc.returncode
+            finally:
+                timer.cancel()
+                if proc.returncode is None:
+                    _kill_tree(proc)
+                    proc.wait()
+                proc.stdout.close()
+                _record_timing(args, start, returncode, cpu_seconds=cpu_seconds, output_bytes=reader.count,
+                               parse_seconds=parse_seconds)
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(args, timeout)
+            err_file.seek(0)
+            stderr = err_file.read().decode(errors="replace")
+
+        if recorded is not None:
+            with recorded:
+                _write_fixture(args, returncode, recorded, stderr)
+
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, args, None, stderr)
+
+def powershell_args(script):
+    """Command line for running a PowerShell script.
+
+    Scripts run this way can be served by the PowerShell worker pool, and
+    their fixtures replay the same whether or not the pool was used.
+    """
+    return [*POWERSHELL_PREFIX, script]
+
+def run_powershell(script, timeout=None, check=False, use_cache=True):
+    """Run a PowerShell script through the configured backend"""
+    return run(powershell_args(script), timeout=timeout, check=check, use_cache=use_cache)
+
+def get_timings():
+    """Return the timing of every command run so far"""
+    return list(_timings)
+
+def log_summary():
+    """Log how many commands ran and where the time went"""
+    timings = get_timings()
+    if not timings:
+        return
+    executed = [t for t in timings if not t.cached]
+    logger.info("Commands run: %s (%s served from cache), total %.2fs",
+                len(executed), len(timings) - len(executed), sum(t.seconds for t in executed))
+    for timing in sorted(executed, key=lambda t: t.seconds, reverse=True)[:5]:
+        command = ' '.join(' '.join(timing.args).split())
+        logger.info("  %8.2fs  %s", timing.seconds, command[:120])
@@ -1,66 +1,138 @@
 import subprocess
 import logging
 import re
-from typing import Dict, Any
+from collections import Counter
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Tuple
+from modules import command_runner, netstat
+from modules.audit_logging import setup_logging
+from modules.firewall_index import RuleIndex
+
+logger = logging.getLogger(__name__)
+
+class FirewallProfile(NamedTuple):
+    name: str
+    settings: Dict[str, str]
+
+class FirewallLogSettings(NamedTuple):
+    log_paths: List[str]
+
+class FirewallRule(NamedTuple):
+    name: str
+    enabled: bool
+    direction: str
+    profiles: Tuple[str, ...]
+    protocol: str
+    local_port: str
+    remote_port: str
+    local_ip: str
+    remote_ip: str
+    action: str
+    grouping: str
+    program: str
+
+class FirewallRuleSummary(NamedTuple):
+    total: int
+    enabled: int
+    by_direction: Dict[str, int]
+    by_action: Dict[str, int]
+    by_profile: Dict[str, int]
+
+class ProfileComparison(NamedTuple):
+    setting: str
+    domain: str
+    private: str
+    public: str
 
 def check_firewall_status():
     """
     Perform a comprehensive audit of Windows Firewall status and configuration.
     Checks all profiles, rules, logging settings, and current connections.
+    Returns the collected records.
     """
-    logging.info("\n" + "="*50)
-    logging.info("STARTING WINDOWS FIREWALL COMPREHENSIVE AUDIT")
-    logging.info("="*50 + "\n")
+    records = []
+    snapshot = FirewallSnapshot()
+    logger.info("\n%s", "=" * 50)
+    logger.info("STARTING WINDOWS FIREWALL COMPREHENSIVE AUDIT")
+    logger.info("%s\n", "=" * 50)
     
     try:
         # Check basic firewall status for all profiles
-        check_firewall_profiles()
+        profile_data = check_firewall_profiles(snapshot) or {}
+        records.extend(FirewallProfile(name, settings) for name, settings in profile_data.items())
         
         # Check global firewall settings
-        check_global_firewall_settings()
+        check_global_firewall_settings(snapshot)
         
         # Check firewall logging configuration
-        check_firewall_logging()
+        log_paths = check_firewall_logging(snapshot)
+        if log_paths is not None:
+            records.append(FirewallLogSettings(log_paths))
         
         # List all firewall rules
-        list_firewall_rules()
+        records.extend(list_firewall_rules() or [])
         
         # Check current firewall state and connections
         check_current_firewall_state()
         
         # Check domain/private/public profile differences
-        compare_profiles()
+        records.extend(compare_profiles(snapshot) or [])
         
-        logging.info("\n" + "="*50)
-        logging.info("FIREWALL AUDIT COMPLETED SUCCESSFULLY")
-        logging.info("="*50)
+        logger.info("\n%s", "=" * 50)
+        logger.info("FIREWALL AUDIT COMPLETED SUCCESSFULLY")
+        logger.info("%s", "=" * 50)
         
     except Exception as e:
-        logging.error(f"Firewall audit failed: {e}", exc_info=True)
+        logger.error("Firewall audit failed: %s", e, exc_info=True)
+
+    return records
+
+PROFILE_NAMES = ['domain', 'private', 'public']
+
+class FirewallSnapshot:
+    """Firewall profile data fetched once per audit and shared by every section.
+
+    `netsh advfirewall show allprofiles` already contains the state, policy
+    and logging settings of all three profiles; the only thing it lacks is
+    which profile is active, so `show currentprofile` is run only when a
+    section asks for that.
+    """
 
-def check_firewall_profiles():
+    def __init__(self):
+        self._profiles = None
+        self._current = None
+
+    @property
+    def profiles(self) -> Dict[str, Dict[str, str]]:
+        if self._profiles is None:
+            result = command_runner.run(["netsh", "advfirewall", "show", "allprofiles"], check=True)
+            self._profiles = parse_profile_output(result.stdout)
+        return self._profiles
+
+    @property
+    def current_profiles(self) -> List[str]:
+        """Names of the active profiles (more than one with several networks)"""
+        if self._current is None:
+            result = command_runner.run(["netsh", "advfirewall", "show", "currentprofile"], check=True)
+            self._current = list(parse_profile_output(result.stdout))
+        return self._current
+
+def check_firewall_profiles(snapshot=None):
     """Check status of all firewall profiles (Domain, Private, Public)"""
-    logging.info("\n=== FIREWALL PROFILE STATUS ===")
+    logger.info("\n=== FIREWALL PROFILE STATUS ===")
     try:
-        result = subprocess.run(
-            ["netsh", "advfirewall", "show", "allprofiles"], 
-            capture_output=True, 
-            text=True,
-            check=True
-        )
-        profile_data = parse_profile_output(result.stdout)
+        profile_data = (snapshot or FirewallSnapshot()).profiles
         
         for profile, status in profile_data.items():
-            logging.info(f"\n{profile.upper()} PROFILE:")
+            logger.info("\n%s PROFILE:", profile.upper())
             for key, value in status.items():
-                logging.info(f"{key.replace('_', ' ').title()}: {value}")
+                logger.info("%s: %s", key.replace('_', ' ').title(), value)
                 
         return profile_data
         
     except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to get firewall profiles: {e.stderr}")
+        logger.error("Failed to get firewall profiles: %s", e.stderr)
     except Exception as e:
-        logging.error(f"Unexpected error checking profiles: {e}")
+        logger.error("Unexpected error checking profiles: %s", e)
 
 def parse_profile_output(output: str) -> Dict[str, Dict[str, str]]:
     """Parse the netsh advfirewall show allprofiles output"""
@@ -81,159 +153,294 @@ def parse_profile_output(output: str) -> Dict[str, Dict[str, str]]:
         elif line.startswith('Public Profile'):
             current_profile = 'public'
             profiles[current_profile] = {}
-        elif current_profile and ':' in line:
-            key, value = [part.strip() for part in line.split(':', 1)]
-            profiles[current_profile][key] = value
+        elif current_profile:
+            setting = split_setting(line)
+            if setting:
+                profiles[current_profile][setting[0]] = setting[1]
             
     return profiles
 
-def check_global_firewall_settings():
+def split_setting(line: str):
+    """Split a netsh settings line into (key, value).
+
+    netsh separates keys from values with a run of spaces
+    ("State                                 ON"); "Key: value" lines are
+    accepted as well. Returns None for underlines, status lines and
+    section headings such as "Logging:".
+    """
+    match = re.match(r'^(\S.*?)(?::\s*|\s{2,})(.*)$', line.strip())
+    if not match or not match.group(2).strip():
+        return None
+    return match.group(1).strip(), match.group(2).strip()
+
+def get_setting(settings: Dict[str, str], *names: str) -> str:
+    """Look up a setting by any of its spellings, ignoring case and spaces"""
+    normalized = {key.replace(' ', '').lower(): value for key, value in settings.items()}
+    for name in names:
+        value = normalized.get(name.replace(' ', '').lower())
+        if value is not None:
+            return value
+    return 'N/A'
+
+def check_global_firewall_settings(snapshot=None):
     """Check firewall settings for current profile"""
-    logging.info("\n=== GLOBAL FIREWALL SETTINGS ===")
+    logger.info("\n=== GLOBAL FIREWALL SETTINGS ===")
     try:
-        result = subprocess.run(
-            ["netsh", "advfirewall", "show", "currentprofile"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        logging.info("\nCurrent Profile Settings:\n" + result.stdout)
+        snapshot = snapshot or FirewallSnapshot()
+        for profile in snapshot.current_profiles:
+            logger.info("\nCurrent Profile Settings (%s):", profile.title())
+            for key, value in snapshot.profiles.get(profile, {}).items():
+                logger.info("%s: %s", key, value)
 
     except subprocess.CalledProcessError as e:
         error_message = e.stderr.strip() if e.stderr else "Unknown error (empty stderr)"
-        logging.error(f"Failed to get global settings: {error_message}")
+        logger.error("Failed to get global settings: %s", error_message)
     except Exception as e:
-        logging.error(f"Unexpected error checking global settings: {e}")
+        logger.error("Unexpected error checking global settings: %s", e)
 
-def check_firewall_logging():
+def check_firewall_logging(snapshot=None):
     """Check firewall logging settings"""
-    logging.info("\n=== FIREWALL LOGGING CONFIGURATION ===")
+    logger.info("\n=== FIREWALL LOGGING CONFIGURATION ===")
     try:
-        result = subprocess.run(
-            ["netsh", "advfirewall", "show", "currentprofile", "logging"], 
-            capture_output=True, 
-            text=True,
-            check=True
-        )
-        
-        logging.info("Firewall Logging Settings:\n" + result.stdout)
+        snapshot = snapshot or FirewallSnapshot()
+        log_paths = []
+        for profile in snapshot.current_profiles:
+            settings = snapshot.profiles.get(profile, {})
+            logger.info("Firewall Logging Settings (%s):", profile.title())
+            for key in ('LogAllowedConnections', 'LogDroppedConnections', 'FileName', 'MaxFileSize'):
+                logger.info("%s: %s", key, get_setting(settings, key))
+            path = get_setting(settings, 'FileName', 'Log file location')
+            if path != 'N/A' and path not in log_paths:
+                log_paths.append(path)
         
-        # Extract log paths
-        log_paths = re.findall(r"Log file location:\s*(.+?)\s*$", result.stdout, re.MULTILINE)
         if log_paths:
-            logging.info(f"\nFirewall log files can be found at: {', '.join(log_paths)}")
+            logger.info("\nFirewall log files can be found at: %s", ', '.join(log_paths))
+        return log_paths
         
     except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to get logging settings: {e.stderr}")
+        logger.error("Failed to get logging settings: %s", e.stderr)
     except Exception as e:
-        logging.error(f"Unexpected error checking logging: {e}")
+        logger.error("Unexpected error checking logging: %s", e)
+
+# netsh field label -> FirewallRule field
+RULE_FIELDS = {
+    'Enabled': 'enabled',
+    'Direction': 'direction',
+    'Profiles': 'profiles',
+    'Protocol': 'protocol',
+    'LocalPort': 'local_port',
+    'RemotePort': 'remote_port',
+    'LocalIP': 'local_ip',
+    'RemoteIP': 'remote_ip',
+    'Action': 'action',
+    'Grouping': 'grouping',
+    'Program': 'program',
+}
+
+def _make_rule(name: str, fields: Dict[str, str]) -> FirewallRule:
+    return FirewallRule(
+        name=name,
+        enabled=fields.get('enabled', '').lower() == 'yes',
+        direction=fields.get('direction', ''),
+        profiles=tuple(p.strip() for p in fields.get('profiles', '').split(',') if p.strip()),
+        protocol=fields.get('protocol', 'Any'),
+        local_port=fields.get('local_port', 'Any'),
+        remote_port=fields.get('remote_port', 'Any'),
+        local_ip=fields.get('local_ip', 'Any'),
+        remote_ip=fields.get('remote_ip', 'Any'),
+        action=fields.get('action', ''),
+        grouping=fields.get('grouping', ''),
+        program=fields.get('program', 'Any'),
+    )
+
+def parse_firewall_rules(lines: Iterable[str]) -> Iterator[FirewallRule]:
+    """Incrementally parse `netsh advfirewall firewall show rule` output.
+
+    Yields one FirewallRule per "Rule Name:" block as soon as the block
+    ends, so only the rule being read is held in memory.
+    """
+    name = None
+    fields: Dict[str, str] = {}
+    for line in lines:
+        if ':' not in line:
+            continue
+        label, value = line.split(':', 1)
+        label = label.strip()
+        if label == 'Rule Name':
+            if name is not None:
+                yield _make_rule(name, fields)
+            name, fields = value.strip(), {}
+        elif name is not None and label in RULE_FIELDS:
+            fields[RULE_FIELDS[label]] = value.strip()
+    if name is not None:
+        yield _make_rule(name, fields)
+
+def _kept(rules: Iterable[FirewallRule], kept: List[FirewallRule]) -> Iterator[FirewallRule]:
+    """Pass rules through, appending each to `kept`"""
+    for rule in rules:
+        kept.append(rule)
+        yield rule
+
+def summarize_rules(rules: Iterable[FirewallRule], sample_size=5) -> Tuple[FirewallRuleSummary, List[FirewallRule]]:
+    """Count rules by direction, action, profile and enabled state in one pass.
+
+    Returns the summary and the first `sample_size` rules.
+    """
+    total = enabled = 0
+    by_direction, by_action, by_profile = Counter(), Counter(), Counter()
+    samples = []
+    for rule in rules:
+        total += 1
+        enabled += rule.enabled
+        by_direction[rule.direction] += 1
+        by_action[rule.action] += 1
+        by_profile.update(rule.profiles)
+        if len(samples) < sample_size:
+            samples.append(rule)
+    summary = FirewallRuleSummary(total, enabled, dict(by_direction), dict(by_action), dict(by_profile))
+    return summary, samples
+
+_rule_records = False
+
+def configure_rule_records(enabled=False):
+    """Also return one FirewallRule record per rule from list_firewall_rules
+    (off by default: servers have thousands of rules)"""
+    global _rule_records
+    _rule_records = enabled
+
+def add_arguments(parser):
+    """Command line options of this audit (see audit_registry)"""
+    parser.add_argument('--firewall-rule-records', action='store_true',
+                        help='Put every firewall rule in the report, not just the summary and findings')
+
+def configure_from_args(args):
+    configure_rule_records(args.firewall_rule_records)
 
 def list_firewall_rules():
-    """List all firewall rules with key details"""
-    logging.info("\n=== FIREWALL RULES AUDIT ===")
+    """Summarize all firewall rules, then index them and report shadowed,
+    duplicate and overly broad rules. Returns the summary record followed
+    by the findings (and the rules themselves with configure_rule_records).
+
+    The rules are summarized as they are parsed, but the index needs all
+    of them at once to compare rules with each other, so they are kept in
+    memory until the analysis is done."""
+    logger.info("\n=== FIREWALL RULES AUDIT ===")
     try:
-        # Get all firewall rules
-        result = subprocess.run(
-            ["netsh", "advfirewall", "firewall", "show", "rule", "name=all"], 
-            capture_output=True, 
-            text=True,
-            check=True
-        )
-        
-        # Count rules by direction and action
-        rules = result.stdout.split('Rule Name:')
-        enabled_rules = [r for r in rules if 'Enabled:             Yes' in r]
+        # Stream all firewall rules; servers can have thousands of them
+        lines = command_runner.iter_lines(["netsh", "advfirewall", "firewall", "show", "rule", "name=all", "verbose"],
+                                          check=True)
+        rules = []
+        summary, samples = summarize_rules(_kept(parse_firewall_rules(lines), rules))
         
-        logging.info(f"Total firewall rules: {len(rules)-1}")
-        logging.info(f"Enabled firewall rules: {len(enabled_rules)}")
+        logger.info("Total firewall rules: %s", summary.total)
+        logger.info("Enabled firewall rules: %s", summary.enabled)
+        for label, counts in (("direction", summary.by_direction), ("action", summary.by_action),
+                              ("profile", summary.by_profile)):
+            logger.info("Rules by %s: %s", label,
+                        ", ".join(f"{key or 'N/A'}={count}" for key, count in sorted(counts.items())))
         
         # Show some example rules
-        logging.info("\nSample of firewall rules (first 5):")
-        for rule in rules[1:6]:
-            logging.info("\n" + rule.strip())
+        logger.info("\nSample of firewall rules (first 5):")
+        for rule in samples:
+            logger.info("\n%s: %s, %s %s, %s local port %s, profiles %s",
+                        rule.name, 'Enabled' if rule.enabled else 'Disabled', rule.direction,
+                        rule.action, rule.protocol, rule.local_port, ','.join(rule.profiles) or 'N/A')
+
+        findings = RuleIndex(rules).analyze()
+        log_rule_findings(findings)
+        return [summary] + (rules if _rule_records else []) + findings
             
     except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to get firewall rules: {e.stderr}")
+        logger.error("Failed to get firewall rules: %s", e.stderr)
     except Exception as e:
-        logging.error(f"Unexpected error checking rules: {e}")
+        logger.error("Unexpected error checking rules: %s", e)
+
+def log_rule_findings(findings, examples=10):
+    """Log a count of each kind of rule finding and the first few of each"""
+    by_kind = {}
+    for finding in findings:
+        by_kind.setdefault(finding.kind, []).append(finding)
+    logger.info("\nRule analysis: %s", ", ".join(f"{kind}={len(items)}" for kind, items in by_kind.items())
+                or "no shadowed, duplicate or overly broad rules")
+    for kind, items in by_kind.items():
+        for finding in items[:examples]:
+            related = f" (by {finding.related_rule})" if finding.related_rule else ""
+            logger.warning("%s rule: %s%s - %s",
+                           kind.replace('_', ' ').title(), finding.rule, related, finding.detail)
+
+def log_connection_summary(snapshot, top=10):
+    """Counts per state and the processes listening on most ports, instead
+    of the full netstat listing (megabytes on busy servers)"""
+    summary = snapshot.summary()
+    logger.info("\nCurrent Network Connections: %s sockets, %s listening ports",
+                summary.total, summary.listening_ports)
+    for state, count in snapshot.state_counts().most_common():
+        logger.info("  %s: %s", state, count)
+    logger.info("Top listeners:")
+    for pid, ports in snapshot.top_listeners(top):
+        shown = ", ".join(map(str, ports[:15])) + (", ..." if len(ports) > 15 else "")
+        logger.info("  PID %s: %s ports (%s)", pid if pid is not None else '?', len(ports), shown)
 
 def check_current_firewall_state():
     """Check current firewall state and active connections"""
-    logging.info("\n=== CURRENT FIREWALL STATE ===")
+    logger.info("\n=== CURRENT FIREWALL STATE ===")
     try:
         # Check active firewall ports
-        result = subprocess.run(
-            ["netsh", "advfirewall", "monitor", "show", "firewall"], 
-            capture_output=True, 
-            text=True,
-            check=True
-        )
-        logging.info("Active Firewall State:\n" + result.stdout)
-        
-        # Check current connections (requires admin)
+        result = command_runner.run(["netsh", "advfirewall", "monitor", "show", "firewall"], check=True)
+        # The raw monitor dump is large; keep it out of the log unless debugging
+        logger.info("Active firewall state: %s lines (shown at DEBUG level)", result.stdout.count("\n"))
+        logger.debug("Active Firewall State:\n%s", result.stdout)
+        
+        # Summarize current connections from the run's shared netstat snapshot
         try:
-            result = subprocess.run(
-                ["netstat", "-ano"], 
-                capture_output=True, 
-                text=True,
-                check=True
-            )
-            logging.info("\nCurrent Network Connections:\n" + result.stdout)
+            log_connection_summary(netstat.get_snapshot())
         except subprocess.CalledProcessError:
-            logging.warning("Could not get network connections (admin rights needed)")
+            logger.warning("Could not get network connections (admin rights needed)")
         
     except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to get firewall state: {e.stderr}")
+        logger.error("Failed to get firewall state: %s", e.stderr)
     except Exception as e:
-        logging.error(f"Unexpected error checking state: {e}")
+        logger.error("Unexpected error checking state: %s", e)
+
+# Compared setting -> the keys netsh uses for it
+COMPARED_SETTINGS = {
+    'Firewall Policy': ('Firewall Policy',),
+    'Inbound User Notification': ('InboundUserNotification', 'Inbound User Notification'),
+    'Unicast Response': ('UnicastResponseToMulticast', 'Unicast Response'),
+}
 
-def compare_profiles():
+def compare_profiles(snapshot=None):
     """Compare settings between different firewall profiles"""
-    logging.info("\n=== PROFILE COMPARISON ===")
+    logger.info("\n=== PROFILE COMPARISON ===")
     try:
-        profiles = ['domain', 'private', 'public']
-        settings = {}
-        
-        for profile in profiles:
-            result = subprocess.run(
-                ["netsh", "advfirewall", "show", profile, "profile"], 
-                capture_output=True, 
-                text=True,
-                check=True
-            )
-            settings[profile] = parse_profile_settings(result.stdout)
+        all_profiles = (snapshot or FirewallSnapshot()).profiles
+        settings = {profile: all_profiles.get(profile, {}) for profile in PROFILE_NAMES}
         
         # Compare key settings
-        logging.info("\nProfile Settings Comparison:")
-        for setting in ['Firewall Policy', 'Inbound User Notification', 'Unicast Response']:
-            logging.info(f"\n{setting}:")
-            for profile in profiles:
-                logging.info(f"  {profile.title()}: {settings[profile].get(setting, 'N/A')}")
+        logger.info("\nProfile Settings Comparison:")
+        comparison = []
+        for setting, keys in COMPARED_SETTINGS.items():
+            logger.info("\n%s:", setting)
+            values = [get_setting(settings[profile], *keys) for profile in PROFILE_NAMES]
+            for profile, value in zip(PROFILE_NAMES, values):
+                logger.info("  %s: %s", profile.title(), value)
+            comparison.append(ProfileComparison(setting, *values))
+        return comparison
                 
     except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to compare profiles: {e.stderr}")
+        logger.error("Failed to compare profiles: %s", e.stderr)
     except Exception as e:
-        logging.error(f"Unexpected error comparing profiles: {e}")
+        logger.error("Unexpected error comparing profiles: %s", e)
 
 def parse_profile_settings(output: str) -> Dict[str, str]:
     """Parse individual profile settings"""
     settings = {}
     for line in output.split('\n'):
-        line = line.strip()
-        if ':' in line:
-            key, value = [part.strip() for part in line.split(':', 1)]
-            settings[key] = value
+        setting = split_setting(line)
+        if setting:
+            settings[setting[0]] = setting[1]
     return settings
 
 if __name__ == "__main__":
-    # Configure logging to audit.log
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('audit.log', mode='a'),  # Always append to audit.log
-            logging.StreamHandler()
-        ]
-    )
-    
-    check_firewall_status()
\ No newline at end of file
+    setup_logging(console=True)
+    check_firewall_status()
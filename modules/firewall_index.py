@@ -0,0 +1,230 @@
+import bisect
+import itertools
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from modules.firewall_check import FirewallRule
+
+ALL_PROFILES = ("Domain", "Private", "Public")
+FULL_RANGE = (0, 65535)
+
+class RuleFinding(NamedTuple):
+    kind: str           # 'shadowed', 'duplicate' or 'overly_broad'
+    rule: str
+    related_rule: str   # the shadowing rule or the rule duplicated, '' otherwise
+    detail: str
+
+def parse_ports(spec: str) -> Tuple[Tuple[Tuple[int, int], ...], Tuple[str, ...]]:
+    """Split a netsh port field into numeric ranges and keywords.
+
+    "Any" (or an empty field) is the full 0-65535 range; "80,443,5000-5010"
+    becomes three ranges; names such as RPC or IPHTTPS are returned as keywords.
+    """
+    spec = (spec or "").strip()
+    if not spec or spec.lower() == "any":
+        return (FULL_RANGE,), ()
+    ranges, keywords = [], []
+    for part in spec.split(","):
+        part = part.strip()
+        lo, sep, hi = part.partition("-")
+        if lo.isdigit() and (not sep or hi.isdigit()):
+            ranges.append((int(lo), int(hi) if sep else int(lo)))
+        elif part:
+            keywords.append(part)
+    return tuple(ranges), tuple(keywords)
+
+def rule_profiles(rule: "FirewallRule") -> Tuple[str, ...]:
+    if not rule.profiles or any(p.lower() == "any" for p in rule.profiles):
+        return ALL_PROFILES
+    return rule.profiles
+
+class IntervalTree:
+    """Static centered interval tree answering "which intervals contain x"
+    in O(log n + k)."""
+
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, intervals: Sequence[Tuple[int, int, object]]):
+        endpoints = sorted(itertools.chain.from_iterable((lo, hi) for lo, hi, _ in intervals))
+        self.center = endpoints[len(endpoints) // 2] if endpoints else 0
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda i: i[0])
+        self.by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, point: int) -> List[object]:
+        found = []
+        node = self
+        while node is not None:
+            if point < node.center:
+                for lo, _, item in node.by_start:
+                    if lo > point:
+                        break
+                    found.append(item)
+                node = node.left
+            elif point > node.center:
+                for _, hi, item in node.by_end:
+                    if hi < point:
+                        break
+                    found.append(item)
+                node = node.right
+            else:
+                found.extend(item for _, _, item in node.by_start)
+                break
+        return found
+
+class _CoverIndex:
+    """Sorted interval starts with a running maximum of the ends, so
+    "does one interval contain [lo, hi]" is a single bisect."""
+
+    __slots__ = ("starts", "best_end", "best_rule")
+
+    def __init__(self, intervals: List[Tuple[int, int, "FirewallRule"]]):
+        intervals.sort(key=lambda i: i[0])
+        self.starts = [lo for lo, _, _ in intervals]
+        self.best_end, self.best_rule = [], []
+        best = (-1, None)
+        for _, hi, rule in intervals:
+            if hi > best[0]:
+                best = (hi, rule)
+            self.best_end.append(best[0])
+            self.best_rule.append(best[1])
+
+    def covering(self, lo: int, hi: int) -> Optional["FirewallRule"]:
+        i = bisect.bisect_right(self.starts, lo) - 1
+        if i >= 0 and self.best_end[i] >= hi:
+            return self.best_rule[i]
+        return None
+
+# Rule fields that must match exactly, or be "Any" on the covering rule
+_SCOPE_FIELDS = ("protocol", "program", "local_ip", "remote_ip", "remote_port")
+
+class RuleIndex:
+    """In-memory index over parsed firewall rules.
+
+    Enabled rules are indexed by (direction, action, protocol, profile)
+    in interval trees over their local port ranges, for exposure queries,
+    and by program name. The analysis methods run in O(n log n).
+    """
+
+    def __init__(self, rules: Iterable["FirewallRule"]):
+        self.rules = list(rules)
+        self._ports = {}
+        self._programs: Dict[str, List["FirewallRule"]] = defaultdict(list)
+        intervals = defaultdict(list)
+        for rule in self.rules:
+            self._programs[rule.program.lower()].append(rule)
+            if not rule.enabled:
+                continue
+            ranges, _ = self.ports(rule)
+            for profile in rule_profiles(rule):
+                key = (rule.direction, rule.action, rule.protocol.upper(), profile)
+                intervals[key].extend((lo, hi, rule) for lo, hi in ranges)
+        self._trees = {key: IntervalTree(items) for key, items in intervals.items()}
+
+    def ports(self, rule: "FirewallRule"):
+        ports = self._ports.get(rule.local_port)
+        if ports is None:
+            ports = self._ports[rule.local_port] = parse_ports(rule.local_port)
+        return ports
+
+    def exposing(self, port: int, protocol="TCP", profile="Public", direction="In", action="Allow") -> List["FirewallRule"]:
+        """Enabled rules with the given action that match port/protocol on a profile,
+        e.g. which allow rules expose TCP 3389 on Public"""
+        found = []
+        for proto in {protocol.upper(), "ANY"}:
+            tree = self._trees.get((direction, action, proto, profile))
+            if tree is not None:
+                found.extend(tree.stab(port))
+        return found
+
+    def by_program(self, program: str) -> List["FirewallRule"]:
+        return list(self._programs.get(program.lower(), ()))
+
+    def duplicates(self) -> List[RuleFinding]:
+        """Rules whose match criteria and action are identical to an earlier rule"""
+        seen = {}
+        findings = []
+        for rule in self.rules:
+            key = (rule.enabled, rule.direction, rule.action, rule.protocol.upper(),
+                   frozenset(rule_profiles(rule)), rule.local_port, rule.remote_port,
+                   rule.local_ip, rule.remote_ip, rule.program.lower())
+            first = seen.setdefault(key, rule)
+            if first is not rule:
+                findings.append(RuleFinding("duplicate", rule.name, first.name, "same match criteria and action"))
+        return findings
+
+    def overly_broad(self) -> List[RuleFinding]:
+        """Enabled inbound allow rules for any port, from any address, for any program"""
+        findings = []
+        for rule in self.rules:
+            if not (rule.enabled and rule.direction == "In" and rule.action == "Allow"):
+                continue
+            if rule.protocol.upper().startswith("ICMP"):
+                continue
+            ranges, _ = self.ports(rule)
+            if (FULL_RANGE in ranges and rule.remote_ip.lower() == "any"
+                    and rule.program.lower() == "any"):
+                findings.append(RuleFinding("overly_broad", rule.name, "",
+                                            f"{rule.protocol} any port from any address on "
+                                            f"{','.join(rule_profiles(rule))}"))
+        return findings
+
+    def shadowed(self) -> List[RuleFinding]:
+        """Enabled allow rules that never take effect because an enabled block
+        rule (block always wins in Windows Firewall) covers all their traffic.
+
+        Block rules are grouped by direction, profile and scope; each group is
+        a _CoverIndex, and an allow rule is checked against the groups whose
+        scope equals its own or is "Any" - a fixed number of O(log n) lookups.
+        """
+        groups = defaultdict(list)
+        for rule in self.rules:
+            if rule.enabled and rule.action == "Block":
+                ranges, keywords = self.ports(rule)
+                scope = tuple(getattr(rule, f).lower() for f in _SCOPE_FIELDS)
+                for profile in rule_profiles(rule):
+                    groups[(rule.direction, profile, scope)].extend((lo, hi, rule) for lo, hi in ranges)
+        covers = {key: _CoverIndex(items) for key, items in groups.items()}
+
+        findings = []
+        for rule in self.rules:
+            if not (rule.enabled and rule.action == "Allow"):
+                continue
+            ranges, keywords = self.ports(rule)
+            # A keyword port (RPC, IPHTTPS, ...) is only covered by an any-port block
+            needed = list(ranges) + ([FULL_RANGE] if keywords else [])
+            scope = tuple(getattr(rule, f).lower() for f in _SCOPE_FIELDS)
+            candidate_scopes = set(itertools.product(*((value, "any") for value in scope)))
+            blocker = None
+            for profile in rule_profiles(rule):
+                blocker = None
+                for lo, hi in needed:
+                    covering = None
+                    for candidate in candidate_scopes:
+                        index = covers.get((rule.direction, profile, candidate))
+                        covering = index.covering(lo, hi) if index else None
+                        if covering is not None:
+                            break
+                    if covering is None:
+                        blocker = None
+                        break
+                    blocker = covering
+                if blocker is None:
+                    break
+            if blocker is not None:
+                findings.append(RuleFinding("shadowed", rule.name, blocker.name,
+                                            "all matching traffic is blocked by another rule"))
+        return findings
+
+    def analyze(self) -> List[RuleFinding]:
+        return self.shadowed() + self.duplicates() + self.overly_broad()
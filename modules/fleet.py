@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, NamedTuple, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT, "main.py")
+
+DEFAULT_PARALLEL = 8
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 2.0       # seconds before the first retry, doubled for each one after
+MAX_BACKOFF = 60.0
+DEFAULT_HOST_TIMEOUT = 1800
+
+class Host(NamedTuple):
+    name: str
+    address: str
+    transport: str
+    options: Dict[str, str]     # remaining key=value settings from the inventory
+
+class FleetHostResult(NamedTuple):
+    target: str                 # inventory name
+    status: str                 # "ok" or "failed"
+    attempts: int
+    seconds: float
+    records: int
+    errors: int                 # AuditError lines reported by the host
+    error: Optional[str]
+
+class TransportError(Exception):
+    """The audit could not be run on the host, or failed without a report; retried"""
+
+def parse_inventory(lines, default_transport="local", source="<inventory>") -> List[Host]:
+    """Hosts from an inventory: one per line as `name [key=value ...]`, with
+    `#` comments, or a JSON array of objects with a "name" key. Known keys
+    are address (defaults to the name), transport and jobs; the others are
+    passed to the transport."""
+    text = "".join(lines)
+    if text.lstrip().startswith("["):
+        entries = [dict(item) for item in json.loads(text)]
+    else:
+        entries = []
+        for number, line in enumerate(text.splitlines(), 1):
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            entry = {"name": fields[0]}
+            for field in fields[1:]:
+                key, sep, value = field.partition("=")
+                if not sep or not key:
+                    raise ValueError(f"{source}:{number}: expected key=value after the host name, got {field!r}")
+                entry[key] = value
+            entries.append(entry)
+    hosts, seen = [], set()
+    for entry in entries:
+        name = str(entry.pop("name"))
+        if name in seen:
+            logger.warning("Host %s is listed more than once; auditing it once", name)
+            continue
+        seen.add(name)
+        address = str(entry.pop("address", name))
+        transport = str(entry.pop("transport", default_transport))
+        hosts.append(Host(name, address, transport, {key: str(value) for key, value in entry.items()}))
+    return hosts
+
+def load_inventory(path, default_transport="local") -> List[Host]:
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return parse_inventory(f, default_transport, path)
+
+def _run_child(command, timeout) -> List[str]:
+    """Run a transport command and return its report lines"""
+    try:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 text=True, encoding="utf-8", errors="replace", timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise TransportError(f"timed out after {timeout}s")
+    except OSError as e:
+        raise TransportError(str(e))
+    lines = [line for line in process.stdout.splitlines() if line.strip()]
+    # A clean exit with no lines is an empty report (no audit had records);
+    # a failed one without report lines is a transport failure, even if the
+    # host printed something else
+    if process.returncode != 0 and not any(line.lstrip().startswith("{") for line in lines):
+        tail = process.stderr.strip().splitlines()[-1:] or [f"exit status {process.returncode}"]
+        raise TransportError(tail[0])
+    return lines
+
+class LocalTransport:
+    """Runs main.py on this machine for every host (loopback).
+
+    Useful to test inventories and the runner itself, e.g. with --replay so
+    each "host" serves its own recorded fixtures (`replay=DIR` per host).
+    """
+
+    def __init__(self, log_dir=None):
+        self.log_dir = log_dir
+
+    def command(self, host: Host, audit_args: List[str]) -> List[str]:
+        command = [sys.executable, MAIN_SCRIPT, *audit_args]
+        if "replay" in host.options:
+            command += ["--replay", host.options["replay"]]
+        # Concurrent local runs must not share one audit.log
+        log_dir = host.options.get("log_dir", self.log_dir)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            command += ["--log-file", os.path.join(log_dir, f"{host.name}.log")]
+        return command
+
+    def run(self, host: Host, audit_args: List[str], timeout) -> List[str]:
+        return _run_child(self.command(host, audit_args), timeout)
+
+class SshTransport:
+    """Runs the audit on the host over OpenSSH (`ssh address command`).
+
+    The remote command defaults to `python main.py` in the login directory;
+    set `command=...` per host (or --fleet-remote-command) for other layouts.
+    """
+
+    def __init__(self, remote_command="python main.py", ssh_command="ssh"):
+        self.remote_command = remote_command
+        self.ssh_command = shlex.split(ssh_command)
+
+    def command(self, host: Host, audit_args: List[str]) -> List[str]:
+        remote = host.options.get("command", self.remote_command)
+        target = f"{host.options['user']}@{host.address}" if "user" in host.options else host.address
+        args = ["-o", "BatchMode=yes"]
+        if "port" in host.options:
+            args += ["-p", host.options["port"]]
+        # Windows OpenSSH hands the command to cmd.exe, which understands double quotes only
+        return [*self.ssh_command, *args, target, f"{remote} {subprocess.list2cmdline(audit_args)}"]
+
+    def run(self, host: Host, audit_args: List[str], timeout) -> List[str]:
+        return _run_child(self.command(host, audit_args), timeout)
+
+# transport name -> factory taking the FleetRunner's transport options
+TRANSPORTS: Dict[str, Callable[..., object]] = {
+    "local": lambda options: LocalTransport(options.get("log_dir")),
+    "ssh": lambda options: SshTransport(options.get("remote_command") or "python main.py",
+                                        options.get("ssh_command") or "ssh"),
+}
+
+def register_transport(name: str, factory: Callable[..., object]):
+    """Make a transport available to inventories as `transport=name`.
+    factory(options) returns an object with run(host, audit_args, timeout)
+    returning the host's NDJSON report lines, raising TransportError."""
+    TRANSPORTS[name] = factory
+
+def backoff_delay(attempt, base=DEFAULT_BACKOFF, cap=MAX_BACKOFF) -> float:
+    """Exponential backoff with jitter before retry number `attempt` (1-based),
+    so hosts that failed together do not all retry at the same moment"""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+class FleetRunner:
+    """Audit many hosts, at most `parallel` at a time.
+
+    Each host runs the audit with `--report - --report-format ndjson` on
+    its transport; `jobs` (or `jobs=N` in the inventory) bounds the audits
+    running concurrently on that host. Failed attempts are retried with
+    backoff. A host's records are written to `out` as one block once it
+    finishes, each line tagged with the inventory name as "target", so
+    retries never leave partial output and the report grows as hosts
+    complete. A FleetHost line per host records how it went.
+    """
+
+    def __init__(self, audit_args: List[str], parallel=DEFAULT_PARALLEL, jobs=1, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, timeout=DEFAULT_HOST_TIMEOUT, transport_options=None):
+        if parallel < 1:
+            raise ValueError("parallel must be at least 1")
+        self.audit_args = list(audit_args)
+        self.parallel = parallel
+        self.jobs = jobs
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.transport_options = dict(transport_options or {})
+        self._transports = {}
+        self._lock = threading.Lock()
+
+    def transport(self, name):
+        with self._lock:
+            if name not in self._transports:
+                self._transports[name] = TRANSPORTS[name](self.transport_options)
+            return self._transports[name]
+
+    def host_args(self, host: Host) -> List[str]:
+        jobs = int(host.options.get("jobs", self.jobs))
+        return [*self.audit_args, "--jobs", str(jobs), "--report", "-", "--report-format", "ndjson"]
+
+    def audit_host(self, host: Host):
+        """Run one host with retries; returns (result, tagged report lines)"""
+        start = time.perf_counter()
+        if host.transport not in TRANSPORTS:
+            return FleetHostResult(host.name, "failed", 0, 0.0, 0, 0, f"Unknown transport: {host.transport}"), []
+        error = None
+        for attempt in range(1, self.retries + 2):
+            if attempt > 1:
+                delay = backoff_delay(attempt - 1, self.backoff)
+                logger.warning("%s: attempt %s failed (%s), retrying in %.1fs", host.name, attempt - 1, error, delay)
+                time.sleep(delay)
+            try:
+                lines = self.transport(host.transport).run(host, self.host_args(host), self.timeout)
+                # Tag the lines without decoding them; anything that is not a
+                # JSON object (stray console output) is left out of the report
+                tag = '{"target": %s, ' % json.dumps(host.name)
+                records, errors = [], 0
+                for line in lines:
+                    line = line.strip()
+                    if not (line.startswith("{") and line.endswith("}")):
+                        logger.debug("%s: skipped non-report line %r", host.name, line[:200])
+                        continue
+                    errors += '"type": "AuditError"' in line
+                    records.append(tag + line[1:])
+                result = FleetHostResult(host.name, "ok", attempt, time.perf_counter() - start,
+                                         len(records) - errors, errors, None)
+                return result, records
+            except TransportError as e:
+                error = str(e)
+        return FleetHostResult(host.name, "failed", attempt, time.perf_counter() - start, 0, 0, error), []
+
+    def run(self, hosts: List[Host], out: TextIO) -> List[FleetHostResult]:
+        """Audit every host, streaming the results to out as hosts finish"""
+        results = []
+        with ThreadPoolExecutor(max_workers=min(self.parallel, len(hosts)) or 1,
+                                thread_name_prefix="fleet") as pool:
+            futures = {pool.submit(self.audit_host, host): host for host in hosts}
+            for future in as_completed(futures):
+                result, lines = future.result()
+                for line in lines:
+                    out.write(line + "\n")
+                out.write(json.dumps({"type": "FleetHost", **result._asdict()}) + "\n")
+                out.flush()
+                results.append(result)
+                if result.status == "ok":
+                    logger.info("%s: %s records, %s audit errors in %.1fs (attempt %s)",
+                                result.target, result.records, result.errors, result.seconds, result.attempts)
+                else:
+                    logger.error("%s: failed after %s attempts: %s", result.target, result.attempts, result.error)
+        return results
+
+def log_fleet_summary(results: List[FleetHostResult], seconds):
+    failed = [result for result in results if result.status != "ok"]
+    logger.info("Fleet audit: %s hosts, %s failed, %.1fs", len(results), len(failed), seconds)
+    for result in failed:
+        logger.info("  %s: %s", result.target, result.error)
@@ -0,0 +1,212 @@
+import json
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+from modules import command_runner, wmic
+
+logger = logging.getLogger(__name__)
+
+# Win32_Product runs an MSI consistency check per package and can take minutes
+WMIC_PRODUCT_TIMEOUT = 900
+
+UNINSTALL_KEYS = [
+    ("HKEY_LOCAL_MACHINE", r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
+    ("HKEY_LOCAL_MACHINE", r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
+    ("HKEY_CURRENT_USER", r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
+]
+
+class InstalledApp(NamedTuple):
+    name: str
+    version: str
+    publisher: str
+    install_date: str
+    source: str
+
+def app_from_values(values: Dict[str, object], source: str) -> Optional[InstalledApp]:
+    """Build a record from the values of one Uninstall subkey.
+
+    Entries without a DisplayName, system components and updates that
+    belong to a parent product are not shown in Programs and Features,
+    so they are skipped here too.
+    """
+    name = str(values.get("DisplayName") or "").strip()
+    if not name or values.get("SystemComponent") in (1, "1") or values.get("ParentKeyName"):
+        return None
+    return InstalledApp(
+        name,
+        str(values.get("DisplayVersion") or ""),
+        str(values.get("Publisher") or ""),
+        str(values.get("InstallDate") or ""),
+        source,
+    )
+
+def reg_query_args(hive: str, path: str) -> List[str]:
+    return ["reg", "query", f"{hive}\\{path}", "/s"]
+
+# "    Name    REG_TYPE    data" under each key printed by `reg query`
+_REG_QUERY_VALUE = re.compile(r"^ {4}(.*?) {4}(REG_\w+)(?: {4}(.*))?$")
+
+def parse_reg_query(lines: Iterable[str]) -> Iterator[Dict[str, object]]:
+    """Values of each direct subkey of an Uninstall key, from `reg query
+    <Uninstall key> /s` output. DWORDs are returned as ints, everything
+    else as the text reg prints."""
+    values = None
+    for line in lines:
+        if line.startswith("HKEY_"):
+            if values:
+                yield values
+            # Only direct subkeys of an Uninstall key describe an application
+            parent = line.rstrip().rsplit("\\", 1)[0]
+            values = {} if parent.lower().endswith("\\uninstall") else None
+            continue
+        match = _REG_QUERY_VALUE.match(line)
+        if match and values is not None:
+            name, kind, data = match.group(1), match.group(2), match.group(3) or ""
+            if kind in ("REG_DWORD", "REG_QWORD"):
+                try:
+                    values[name] = int(data, 16)
+                except ValueError:
+                    continue
+            else:
+                values[name] = data
+    if values:
+        yield values
+
+class RegistrySource:
+    """Reads the Uninstall keys of the local registry with `reg query`, one
+    streamed command per key, so the inventory is recorded and replayed
+    like every other command"""
+    name = "registry"
+
+    def iter_apps(self) -> Iterator[InstalledApp]:
+        for hive, path in UNINSTALL_KEYS:
+            args = reg_query_args(hive, path)
+            # reg exits with 1 when the key does not exist (no WOW6432Node on 32-bit Windows)
+            for values in parse_reg_query(command_runner.iter_lines(args)):
+                app = app_from_values(values, self.name)
+                if app:
+                    yield app
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return value.replace('\\"', '"').replace('\\\\', '\\')
+
+def _parse_reg_value(line: str):
+    """Parse a `"Name"="string"` or `"Name"=dword:0000001` line of a .reg
+    export; other value types (hex, multi-line) are not needed and ignored"""
+    name, sep, data = line.partition('"=')
+    if not sep or not name.startswith('"'):
+        return None
+    if len(data) >= 2 and data[0] == '"' and data[-1] == '"':
+        return _unescape(name[1:]), _unescape(data[1:-1])
+    if data.startswith("dword:"):
+        return _unescape(name[1:]), int(data[6:], 16)
+    return None
+
+class RegistryExportSource:
+    """Reads Uninstall entries from a file instead of the live registry.
+
+    Accepts a regedit export (.reg, UTF-16 or UTF-8) of the Uninstall keys,
+    or a JSON list of objects keyed by registry value name. Useful for
+    testing and benchmarking on machines without a Windows registry.
+    """
+    name = "registry"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def iter_apps(self) -> Iterator[InstalledApp]:
+        with open(self.path, "rb") as f:
+            head = f.read(2)
+        encoding = "utf-16" if head in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+
+        with open(self.path, "r", encoding=encoding) as f:
+            if self.path.lower().endswith(".json"):
+                for values in json.load(f):
+                    app = app_from_values(values, self.name)
+                    if app:
+                        yield app
+                return
+
+            values = None
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    if values is not None:
+                        app = app_from_values(values, self.name)
+                        if app:
+                            yield app
+                    # Only direct subkeys of an Uninstall key describe an application
+                    parent = line[1:-1].rsplit("\\", 1)[0]
+                    values = {} if parent.lower().endswith("\\uninstall") else None
+                elif values is not None and line.startswith('"'):
+                    value = _parse_reg_value(line)
+                    if value:
+                        values[value[0]] = value[1]
+            if values is not None:
+                app = app_from_values(values, self.name)
+                if app:
+                    yield app
+
+class WmicProductSource:
+    """The original Win32_Product query. Slow: Windows runs an MSI
+    consistency check on every package, so only use it when asked."""
+    name = "wmic"
+
+    def iter_apps(self) -> Iterator[InstalledApp]:
+        lines = command_runner.iter_lines(["wmic", "product", "get", "Name,Version,Vendor,InstallDate"],
+                                          check=True, timeout=WMIC_PRODUCT_TIMEOUT)
+        for row in wmic.iter_table(lines):
+            if row.get("Name"):
+                yield InstalledApp(row["Name"], row.get("Version", ""), row.get("Vendor", ""),
+                                   row.get("InstallDate", ""), self.name)
+
+APP_SOURCES = ("registry", "wmic")
+
+_source = None
+
+def configure_source(name="registry", fixture=None):
+    """Select the inventory backend: the registry (default, fast) or wmic.
+    With a fixture path the registry backend reads that file instead."""
+    global _source
+    if name not in APP_SOURCES:
+        raise ValueError(f"Unknown application source: {name}")
+    if name == "wmic":
+        _source = WmicProductSource()
+    elif fixture:
+        _source = RegistryExportSource(fixture)
+    else:
+        _source = RegistrySource()
+
+def add_arguments(parser):
+    """Command line options of this audit (see audit_registry)"""
+    parser.add_argument('--apps-source', choices=APP_SOURCES, default='registry',
+                        help='Installed application inventory backend (wmic is slow, opt-in only)')
+    parser.add_argument('--apps-fixture', metavar='FILE',
+                        help='Read the registry inventory from a .reg export or JSON file')
+
+def configure_from_args(args):
+    configure_source(args.apps_source, args.apps_fixture)
+
+def collect_installed_apps(source=None) -> List[InstalledApp]:
+    """Inventory from the given source, sorted by name, with the entries
+    that appear under both the 64-bit and 32-bit Uninstall keys merged"""
+    source = source or _source or RegistrySource()
+    apps = {}
+    for app in source.iter_apps():
+        apps.setdefault((app.name.lower(), app.version), app)
+    return sorted(apps.values(), key=lambda app: app.name.lower())
+
+def list_installed_apps():
+    logger.info("Listing installed applications...")
+    try:
+        apps = collect_installed_apps()
+        for app in apps:
+            logger.info("%s %s (%s, installed %s)",
+                        app.name, app.version, app.publisher or 'unknown publisher', app.install_date or 'unknown')
+        logger.info("Installed applications: %s", len(apps))
+        return apps
+    except Exception as e:
+        logger.error("Failed to list installed applications: %s", e)
+        return []
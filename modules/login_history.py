@@ -0,0 +1,257 @@
+import json
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+from xml.etree.ElementTree import fromstring
+from modules import command_runner
+
+logger = logging.getLogger(__name__)
+
+LOGON_EVENT_IDS = (4624, 4625, 4634)
+DEFAULT_WINDOW_HOURS = 24
+
+# Failed logons from one source at or above this count are logged as warnings
+FAILURE_THRESHOLD = 10
+
+LOGON_TYPES = {
+    2: "Interactive",
+    3: "Network",
+    4: "Batch",
+    5: "Service",
+    7: "Unlock",
+    8: "NetworkCleartext",
+    9: "NewCredentials",
+    10: "RemoteInteractive",
+    11: "CachedInteractive",
+}
+
+OUTCOMES = {4624: "success", 4625: "failure", 4634: "logoff"}
+
+class LoginEvent(NamedTuple):
+    time: str
+    event_id: int
+    user: str               # DOMAIN\name
+    logon_type: Optional[int]
+    source_ip: str
+    workstation: str
+    logon_id: str
+    status: str             # failure status code of 4625 events, '' otherwise
+
+class LoginSummary(NamedTuple):
+    user: str
+    logon_type: Optional[int]
+    source_ip: str
+    successes: int
+    failures: int
+    logoffs: int
+    first_seen: str
+    last_seen: str
+
+def event_query(window_hours=DEFAULT_WINDOW_HOURS, event_ids=LOGON_EVENT_IDS) -> str:
+    """XPath filter evaluated by the event log service itself, so only the
+    matching events in the window are rendered and sent back"""
+    ids = " or ".join(f"EventID={event_id}" for event_id in event_ids)
+    return f"*[System[({ids}) and TimeCreated[timediff(@SystemTime) <= {int(window_hours * 3600 * 1000)}]]]"
+
+def wevtutil_args(window_hours=DEFAULT_WINDOW_HOURS, max_events=None) -> List[str]:
+    args = ["wevtutil", "qe", "Security", f"/q:{event_query(window_hours)}", "/f:xml", "/rd:true"]
+    if max_events:
+        args.append(f"/c:{max_events}")
+    return args
+
+def _event_from_fields(event_id: int, time: str, data: Dict[str, str]) -> LoginEvent:
+    domain, name = data.get("TargetDomainName") or "", data.get("TargetUserName") or ""
+    logon_type = data.get("LogonType")
+    ip = data.get("IpAddress") or ""
+    return LoginEvent(
+        time,
+        event_id,
+        f"{domain}\\{name}" if domain else name,
+        int(logon_type) if logon_type and str(logon_type).isdigit() else None,
+        "" if ip == "-" else ip,
+        "" if data.get("WorkstationName") == "-" else data.get("WorkstationName") or "",
+        data.get("TargetLogonId") or "",
+        (data.get("Status") or "") if event_id == 4625 else "",
+    )
+
+_EVENT_START = re.compile(r"<Event[\s>]")
+
+# Events are parsed in batches of about this many characters
+XML_BATCH_CHARS = 1 << 18
+
+def _event_from_element(elem) -> Optional[LoginEvent]:
+    ns = elem.tag[:elem.tag.index("}") + 1] if elem.tag.startswith("{") else ""
+    system = elem.find(f"{ns}System")
+    event_id = system.findtext(f"{ns}EventID") if system is not None else None
+    if not event_id:
+        return None
+    created = system.find(f"{ns}TimeCreated")
+    data = {item.get("Name"): item.text or "" for item in elem.iter(f"{ns}Data")}
+    return _event_from_fields(int(event_id), created.get("SystemTime", "") if created is not None else "", data)
+
+def _parse_batch(pieces: List[str]) -> Iterator[LoginEvent]:
+    """Parse complete events (each missing its closing tag) in one go"""
+    for i, text in enumerate(pieces):
+        # The first piece of an export also carries the XML declaration and <Events>
+        if not text.lstrip().startswith(("<Event ", "<Event>")):
+            match = _EVENT_START.search(text)
+            pieces[i] = text[match.start():] if match else ""
+    batch = fromstring("<Batch>" + "</Event>".join(p for p in pieces if p) + "</Event></Batch>")
+    for elem in batch:
+        event = _event_from_element(elem)
+        if event is not None:
+            yield event
+
+def parse_event_xml(chunks: Iterable[str]) -> Iterator[LoginEvent]:
+    """Parse wevtutil /f:xml output (a sequence of <Event> documents, or an
+    export wrapped in <Events>) incrementally, one record per event.
+
+    The text is cut at </Event> boundaries and parsed a batch of events at a
+    time, so memory use stays bounded and the per-element work happens in
+    the C parser rather than in Python callbacks.
+    """
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        if len(pending) < XML_BATCH_CHARS or "</Event>" not in pending:
+            continue
+        *complete, pending = pending.split("</Event>")
+        yield from _parse_batch(complete)
+    if "</Event>" in pending:
+        yield from _parse_batch(pending.split("</Event>")[:-1])
+
+def parse_event_json(lines: Iterable[str]) -> Iterator[LoginEvent]:
+    """Parse events saved as JSON: one array of objects or one object per
+    line, each with EventID, TimeCreated and the EventData fields by name
+    (at the top level or under "EventData")"""
+    text = None
+    for line in lines:
+        if text is not None:
+            text.append(line)
+            continue
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("["):
+            text = [line]
+            continue
+        event = _event_from_json(json.loads(stripped))
+        if event is not None:
+            yield event
+    if text is not None:
+        for item in json.loads("".join(text)):
+            event = _event_from_json(item)
+            if event is not None:
+                yield event
+
+def _event_from_json(item: Dict) -> Optional[LoginEvent]:
+    """The event of one JSON object; None, with a warning, when it has no
+    numeric EventID or Id"""
+    event_id = item.get("EventID")
+    if event_id is None:
+        event_id = item.get("Id")
+    try:
+        event_id = int(event_id)
+    except (TypeError, ValueError):
+        logger.warning("Skipping event without a numeric EventID: %s", json.dumps(item)[:200])
+        return None
+    data = dict(item.get("EventData") or {})
+    data.update((key, value) for key, value in item.items() if key != "EventData")
+    return _event_from_fields(event_id, str(item.get("TimeCreated") or ""), {k: str(v) for k, v in data.items() if v is not None})
+
+def read_events_file(path: str) -> Iterator[LoginEvent]:
+    """Events from an offline file: wevtutil XML (.xml) or JSON (.json/.ndjson)"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        if path.lower().endswith(".xml"):
+            yield from parse_event_xml(iter(lambda: f.read(1 << 20), ""))
+        else:
+            yield from parse_event_json(f)
+
+def aggregate(events: Iterable[LoginEvent]) -> List[LoginSummary]:
+    """One summary per (user, logon type, source IP), most active first.
+
+    Logoff events carry no source address; they are matched to their logon
+    by logon ID (in either order, as queries return newest first) and
+    counted under the logon's key, or under an empty source if unmatched.
+    """
+    counts: Dict[tuple, List] = {}
+    sessions: Dict[str, tuple] = {}         # logon ID -> key of its 4624 event
+    unmatched: Dict[str, LoginEvent] = {}   # logon ID -> logoff seen before its logon
+
+    def add(key, event_id, time):
+        entry = counts.get(key)
+        if entry is None:
+            entry = counts[key] = [Counter(), time, time]
+        entry[0][event_id] += 1
+        if time:
+            if not entry[1] or time < entry[1]:
+                entry[1] = time
+            if time > entry[2]:
+                entry[2] = time
+
+    for event in events:
+        key = (event.user, event.logon_type, event.source_ip)
+        if event.event_id == 4634 and event.logon_id:
+            if event.logon_id in sessions:
+                add(sessions.pop(event.logon_id), 4634, event.time)
+            else:
+                unmatched[event.logon_id] = event
+            continue
+        add(key, event.event_id, event.time)
+        if event.event_id == 4624 and event.logon_id:
+            logoff = unmatched.pop(event.logon_id, None)
+            if logoff is not None:
+                add(key, 4634, logoff.time)
+            else:
+                sessions[event.logon_id] = key
+    for logoff in unmatched.values():
+        add((logoff.user, logoff.logon_type, logoff.source_ip), 4634, logoff.time)
+
+    summaries = [LoginSummary(user, logon_type, ip, c[4624], c[4625], c[4634], first, last)
+                 for (user, logon_type, ip), (c, first, last) in counts.items()]
+    summaries.sort(key=lambda s: s.successes + s.failures + s.logoffs, reverse=True)
+    return summaries
+
+_config = {"window_hours": DEFAULT_WINDOW_HOURS, "max_events": None, "fixture": None}
+
+def configure(window_hours=DEFAULT_WINDOW_HOURS, max_events=None, fixture=None):
+    """Set the query window and event cap, or read events from a fixture file
+    (wevtutil XML or JSON) instead of the Security log. Fixture events are
+    not filtered by the window."""
+    _config.update(window_hours=window_hours, max_events=max_events, fixture=fixture)
+
+def collect_events() -> Iterator[LoginEvent]:
+    """Logon, failed logon and logoff events of the configured window"""
+    if _config["fixture"]:
+        return read_events_file(_config["fixture"])
+    args = wevtutil_args(_config["window_hours"], _config["max_events"])
+    # Keep the line breaks: the parser is fed text, not lines
+    return parse_event_xml(line + "\n" for line in command_runner.iter_lines(args, check=True))
+
+def review_login_history() -> List[LoginSummary]:
+    """Aggregate the window's events and log the overview"""
+    events = Counter()
+
+    def counted(stream):
+        for event in stream:
+            events[event.event_id] += 1
+            yield event
+
+    summaries = aggregate(counted(collect_events()))
+    source = _config["fixture"] or f"the last {_config['window_hours']}h"
+    logger.info("Logon events in %s: %s", source,
+                ", ".join(f"{OUTCOMES[event_id]} {events[event_id]}" for event_id in LOGON_EVENT_IDS))
+    for summary in summaries[:10]:
+        logger.info("%s %s from %s: %s ok, %s failed, %s logoffs (%s .. %s)",
+                    summary.user or '-', LOGON_TYPES.get(summary.logon_type, summary.logon_type),
+                    summary.source_ip or 'local', summary.successes, summary.failures, summary.logoffs,
+                    summary.first_seen, summary.last_seen)
+    failures = Counter()
+    for summary in summaries:
+        failures[summary.source_ip] += summary.failures
+    for ip, count in failures.most_common():
+        if count < FAILURE_THRESHOLD:
+            break
+        logger.warning("%s failed logons from %s", count, ip or 'local')
+    return summaries
@@ -0,0 +1,156 @@
+import threading
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from modules import command_runner
+
+NETSTAT_ARGS = ["netstat", "-ano"]
+
+class Socket(NamedTuple):
+    protocol: str
+    local_address: str
+    local_port: Optional[int]
+    remote_address: str
+    remote_port: Optional[int]
+    state: str
+    pid: Optional[int]
+
+def split_endpoint(endpoint: str) -> Tuple[str, Optional[int]]:
+    """Split "10.0.0.5:443", "[::]:3389" or "*:*" into address and port"""
+    address, _, port = endpoint.rpartition(":")
+    if address.startswith("[") and address.endswith("]"):
+        address = address[1:-1]
+    return address, int(port) if port.isdigit() else None
+
+def parse_netstat(lines: Iterable[str]) -> Iterator[Socket]:
+    """Parse `netstat -an` / `netstat -ano` output into Socket records.
+
+    TCP lines carry a state column, UDP lines do not; the PID column is
+    present only with -o. Headers and anything else are skipped.
+    """
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 3 or parts[0] not in ("TCP", "UDP", "TCPv6", "UDPv6"):
+            continue
+        protocol = parts[0]
+        local_address, local_port = split_endpoint(parts[1])
+        remote_address, remote_port = split_endpoint(parts[2])
+        rest = parts[3:]
+        state = ""
+        if protocol.startswith("TCP") and rest and not rest[0].isdigit():
+            state = rest.pop(0)
+        pid = int(rest[0]) if rest and rest[0].isdigit() else None
+        yield Socket(protocol, local_address, local_port, remote_address, remote_port, state, pid)
+
+class ConnectionSummary(NamedTuple):
+    total: int
+    by_state: Dict[str, int]
+    listening_ports: int
+
+def is_listening(sock: Socket) -> bool:
+    """TCP sockets in LISTENING state, and UDP sockets (which have no state)"""
+    return sock.state == "LISTENING" or sock.protocol.startswith("UDP")
+
+def build_port_index(sockets: Iterable[Socket]) -> Dict[int, List[Socket]]:
+    """Local port -> sockets bound to it"""
+    index = defaultdict(list)
+    for sock in sockets:
+        if sock.local_port is not None:
+            index[sock.local_port].append(sock)
+    return dict(index)
+
+class PortWatchlist:
+    """Set of ports and port ranges to report on, each with a label.
+
+    Membership is a lookup in a 65536-entry table, so checking a socket
+    costs the same whether the list holds five ports or thousands.
+    """
+
+    def __init__(self, entries: Dict[str, str] = None):
+        # Slot 0 of the table means "not watched"; other slots index _labels
+        self._labels = [None]
+        self._slots: Dict[str, int] = {}
+        self._table = array("H", bytes(2 * 65536))
+        for spec, label in (entries or {}).items():
+            self.add(spec, label)
+
+    def add(self, spec: str, label: str = ""):
+        """Add "3389", "5900-5910" or a comma-separated list of those"""
+        slot = self._slots.get(label)
+        if slot is None:
+            if len(self._labels) > 0xFFFF:
+                raise ValueError("Too many distinct port labels")
+            slot = self._slots[label] = len(self._labels)
+            self._labels.append(label)
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            lo, sep, hi = part.partition("-")
+            lo, hi = lo.strip(), (hi if sep else lo).strip()
+            if not (lo.isdigit() and hi.isdigit()) or not 0 <= int(lo) <= int(hi) <= 65535:
+                raise ValueError(f"Invalid port range: {part}")
+            lo, hi = int(lo), int(hi)
+            self._table[lo:hi + 1] = array("H", [slot]) * (hi - lo + 1)
+
+    def __contains__(self, port) -> bool:
+        return port is not None and self._table[port] != 0
+
+    def label(self, port) -> str:
+        return (self._labels[self._table[port]] or "") if port is not None else ""
+
+    @classmethod
+    def parse(cls, spec: str) -> "PortWatchlist":
+        """Build from "22=SSH,3389=RDP,5900-5910=VNC,8080" style text"""
+        watchlist = cls()
+        for part in spec.split(","):
+            ports, _, label = part.partition("=")
+            if ports.strip():
+                watchlist.add(ports, label.strip())
+        return watchlist
+
+class ConnectionSnapshot:
+    """The sockets from one `netstat -ano` run, indexed by local port"""
+
+    def __init__(self, sockets: List[Socket]):
+        self.sockets = sockets
+        self.by_port = build_port_index(sockets)
+
+    def state_counts(self) -> Counter:
+        """Sockets per TCP state; UDP sockets are counted under their protocol"""
+        return Counter(sock.state or sock.protocol for sock in self.sockets)
+
+    def summary(self) -> ConnectionSummary:
+        listening = {sock.local_port for sock in self.sockets if is_listening(sock)}
+        return ConnectionSummary(len(self.sockets), dict(self.state_counts()), len(listening))
+
+    def top_listeners(self, count=10) -> List[Tuple[Optional[int], List[int]]]:
+        """(PID, sorted listening ports) for the processes listening on most ports"""
+        ports = defaultdict(set)
+        for sock in self.sockets:
+            if is_listening(sock):
+                ports[sock.pid].add(sock.local_port)
+        ranked = sorted(ports.items(), key=lambda item: len(item[1]), reverse=True)
+        return [(pid, sorted(p for p in found if p is not None)) for pid, found in ranked[:count]]
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_snapshot() -> ConnectionSnapshot:
+    """The connection snapshot of this audit run, taken on first use.
+
+    netstat takes seconds on busy servers, so every module that looks at
+    sockets shares one parsed snapshot; concurrent callers wait for the
+    first one to finish instead of running netstat again.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = ConnectionSnapshot(list(parse_netstat(command_runner.iter_lines(NETSTAT_ARGS, check=True))))
+        return _snapshot
+
+def reset_snapshot():
+    """Drop the shared snapshot so the next get_snapshot() runs netstat again"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
@@ -0,0 +1,258 @@
+import argparse
+import array
+import bisect
+import csv
+import logging
+import mmap
+import re
+import struct
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from modules import command_runner, wmic
+from modules.audit_logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# wmic prints the columns in alphabetical order whatever order they are asked in
+QFE_ARGS = ["wmic", "qfe", "get", "Description,HotFixID,InstalledOn"]
+OS_BUILD_ARGS = ["wmic", "os", "get", "BuildNumber"]
+
+class Hotfix(NamedTuple):
+    hotfix_id: str
+    description: str = ""
+    installed_on: str = ""      # ISO date when wmic gave a parsable one
+
+class PatchFinding(NamedTuple):
+    kb: str
+    status: str                 # 'missing' or 'superseded'
+    superseded_by: str = ""
+
+_KB = re.compile(r"^\s*(?:KB)?(\d+)\s*$", re.I)
+
+def kb_number(hotfix_id: str) -> Optional[int]:
+    """5031356 for "KB5031356"; None for IDs that are not KB articles"""
+    match = _KB.match(hotfix_id)
+    return int(match.group(1)) if match else None
+
+def kb_name(number: int) -> str:
+    return f"KB{number}"
+
+def _installed_on(value: str) -> str:
+    """wmic gives InstalledOn as M/D/YYYY (occasionally a raw FILETIME in
+    hex, which is kept as is)"""
+    try:
+        return datetime.strptime(value, "%m/%d/%Y").date().isoformat()
+    except ValueError:
+        return value
+
+def parse_qfe(lines: Iterable[str]) -> Iterator[Hotfix]:
+    """Hotfix records from the `wmic qfe get Description,HotFixID,InstalledOn` table"""
+    for row in wmic.iter_table(lines):
+        if row.get("HotFixID"):
+            yield Hotfix(row["HotFixID"], row.get("Description", ""), _installed_on(row.get("InstalledOn", "")))
+
+# Compiled catalog: a 16-byte header, then three little-endian uint32 arrays
+# of `count` entries each - OS builds, KB numbers and the KB that supersedes
+# each one (0 if none) - sorted by build, so the entries of one build are a
+# contiguous run found by bisection.
+CATALOG_MAGIC = b"WSMKBC\x00\x01"
+_CATALOG_HEADER = struct.Struct("<8sII")
+
+class KbCatalog:
+    """Index of the KBs each OS build needs.
+
+    A KB without a successor is required on its build; one with a
+    successor has been replaced by it. Compiled catalogs are memory-mapped
+    and read in place, so loading one costs the same whatever its size.
+    """
+
+    def __init__(self, builds, kbs, superseded_by, closer=None):
+        self._builds = builds
+        self._kbs = kbs
+        self._superseded_by = superseded_by
+        self._closer = closer
+
+    def __len__(self):
+        return len(self._builds)
+
+    def _span(self, build: int) -> Tuple[int, int]:
+        return bisect.bisect_left(self._builds, build), bisect.bisect_right(self._builds, build)
+
+    def has_build(self, build: int) -> bool:
+        start, end = self._span(build)
+        return end > start
+
+    def required(self, build: int) -> Set[int]:
+        start, end = self._span(build)
+        return {kb for kb, successor in zip(self._kbs[start:end], self._superseded_by[start:end]) if not successor}
+
+    def superseded(self, build: int) -> Dict[int, int]:
+        """Replaced KB -> the KB replacing it"""
+        start, end = self._span(build)
+        return {kb: successor for kb, successor in zip(self._kbs[start:end], self._superseded_by[start:end])
+                if successor}
+
+    def close(self):
+        self._builds = self._kbs = self._superseded_by = ()
+        if self._closer:
+            self._closer()
+            self._closer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def parse_catalog_text(lines: Iterable[str]) -> Iterator[Tuple[int, int, int]]:
+    """(build, kb, superseded_by) from a text catalog: CSV lines of
+    `build,KB5031356[,KB5032189]`, with `#` comments and an optional header"""
+    for row in csv.reader(line for line in lines if not line.lstrip().startswith("#")):
+        if len(row) < 2 or not row[0].strip().isdigit():
+            continue
+        kb = kb_number(row[1])
+        if kb is None:
+            continue
+        successor = kb_number(row[2]) if len(row) > 2 and row[2].strip() else None
+        yield int(row[0]), kb, successor or 0
+
+def _columns(entries: Iterable[Tuple[int, int, int]]) -> Tuple[array.array, array.array, array.array]:
+    builds, kbs, superseded_by = array.array("I"), array.array("I"), array.array("I")
+    for build, kb, successor in sorted(set(entries)):
+        builds.append(build)
+        kbs.append(kb)
+        superseded_by.append(successor)
+    return builds, kbs, superseded_by
+
+def compile_catalog(source: str, dest: str) -> int:
+    """Write the text catalog `source` in the compiled form; returns the
+    number of entries"""
+    with open(source, encoding="utf-8") as f:
+        columns = _columns(parse_catalog_text(f))
+    with open(dest, "wb") as f:
+        f.write(_CATALOG_HEADER.pack(CATALOG_MAGIC, len(columns[0]), 0))
+        for column in columns:
+            if sys.byteorder == "big":
+                column.byteswap()
+            f.write(column.tobytes())
+    return len(columns[0])
+
+def _map_catalog(f) -> KbCatalog:
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, count, _ = _CATALOG_HEADER.unpack_from(mapped)
+    if magic != CATALOG_MAGIC or len(mapped) != _CATALOG_HEADER.size + 12 * count:
+        mapped.close()
+        raise ValueError(f"Corrupt or unsupported KB catalog: {f.name}")
+    if sys.byteorder == "big" or count == 0:
+        # Copy (and swap) rather than reading the mapping in place
+        columns = []
+        for i in range(3):
+            column = array.array("I")
+            column.frombytes(mapped[_CATALOG_HEADER.size + 4 * count * i:_CATALOG_HEADER.size + 4 * count * (i + 1)])
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+        mapped.close()
+        return KbCatalog(*columns)
+    view = memoryview(mapped)[_CATALOG_HEADER.size:].cast("I")
+    columns = [view[count * i:count * (i + 1)] for i in range(3)]
+
+    def close():
+        for column in columns:
+            column.release()
+        view.release()
+        mapped.close()
+    return KbCatalog(*columns, closer=close)
+
+def load_catalog(path: str) -> KbCatalog:
+    """Load a compiled catalog (memory-mapped) or a text one"""
+    with open(path, "rb") as f:
+        if f.read(len(CATALOG_MAGIC)) == CATALOG_MAGIC:
+            return _map_catalog(f)
+    with open(path, encoding="utf-8") as f:
+        return KbCatalog(*_columns(parse_catalog_text(f)))
+
+def check_catalog(hotfixes: Iterable[Hotfix], catalog: KbCatalog, build: int) -> List[PatchFinding]:
+    """Missing KBs (required on the build, not installed) and installed KBs
+    that have been superseded, by set operations on the KB numbers"""
+    installed = {kb for kb in (kb_number(hotfix.hotfix_id) for hotfix in hotfixes) if kb is not None}
+    replaced = catalog.superseded(build)
+    findings = [PatchFinding(kb_name(kb), "missing") for kb in sorted(catalog.required(build) - installed)]
+    findings += [PatchFinding(kb_name(kb), "superseded", kb_name(replaced[kb]))
+                 for kb in sorted(installed & replaced.keys())]
+    return findings
+
+_catalog_path: Optional[str] = None
+_os_build: Optional[int] = None
+
+def configure_catalog(path: Optional[str] = None, os_build: Optional[int] = None):
+    """Check installed hotfixes against the catalog at `path` (no check by
+    default). The OS build is queried unless given."""
+    global _catalog_path, _os_build
+    _catalog_path = path
+    _os_build = os_build
+
+def add_arguments(parser):
+    """Command line options of this audit (see audit_registry)"""
+    parser.add_argument('--patch-catalog', metavar='FILE',
+                        help='Report missing and superseded KBs against this catalog (text or compiled)')
+    parser.add_argument('--patch-os-build', metavar='BUILD', type=int,
+                        help='OS build to look up in the catalog (default: the local one)')
+
+def configure_from_args(args):
+    configure_catalog(args.patch_catalog, args.patch_os_build)
+
+def collect_hotfixes() -> List[Hotfix]:
+    return list(parse_qfe(command_runner.iter_lines(QFE_ARGS, check=True)))
+
+def os_build() -> int:
+    for row in wmic.iter_table(command_runner.iter_lines(OS_BUILD_ARGS, check=True)):
+        if row.get("BuildNumber", "").isdigit():
+            return int(row["BuildNumber"])
+    raise ValueError("No BuildNumber in wmic os output")
+
+def check_patch_status():
+    logger.info("Checking installed patches...")
+    try:
+        hotfixes = collect_hotfixes()
+        logger.info("Installed hotfixes: %s", len(hotfixes))
+        for hotfix in hotfixes:
+            logger.debug("%s %s installed %s", hotfix.hotfix_id, hotfix.description, hotfix.installed_on or "?")
+        dates = sorted(hotfix.installed_on for hotfix in hotfixes if hotfix.installed_on[:1].isdigit())
+        if dates:
+            logger.info("Most recent hotfix installed on %s", dates[-1])
+        if not _catalog_path:
+            return hotfixes
+
+        build = _os_build if _os_build is not None else os_build()
+        with load_catalog(_catalog_path) as catalog:
+            if not catalog.has_build(build):
+                logger.warning("KB catalog %s has no entries for OS build %s", _catalog_path, build)
+                return hotfixes
+            findings = check_catalog(hotfixes, catalog, build)
+        missing = [finding.kb for finding in findings if finding.status == "missing"]
+        if missing:
+            logger.warning("Missing patches for build %s: %s", build, ", ".join(missing))
+        for finding in findings:
+            if finding.status == "superseded":
+                logger.info("Installed %s is superseded by %s", finding.kb, finding.superseded_by)
+        logger.info("Catalog check (build %s): %s missing, %s superseded", build, len(missing),
+                    len(findings) - len(missing))
+        return hotfixes + findings
+    except Exception as e:
+        logger.error("Failed to check patch status: %s", e)
+        return []
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Patch audit, or compile a KB catalog")
+    parser.add_argument("--compile-catalog", nargs=2, metavar=("SOURCE", "DEST"),
+                        help="Compile a text catalog (build,KB[,superseded by] lines) and exit")
+    add_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(console=True)
+    if args.compile_catalog:
+        logger.info("Compiled %s catalog entries", compile_catalog(*args.compile_catalog))
+    else:
+        configure_from_args(args)
+        check_patch_status()
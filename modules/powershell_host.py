@@ -0,0 +1,193 @@
+import base64
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Runs in a long-lived powershell.exe. Each request is one line of base64
+# encoded UTF-8 script text on stdin; the reply is the script's output,
+# a "<sentinel>:ERR" line, the error stream, and a "<sentinel>:END <status>"
+# line. The sentinel is random per worker and passed in the environment.
+HOST_SCRIPT = r"""
+$sentinel = $env:WINSECMON_SENTINEL
+# UTF-8 without a byte order mark; 5.1 writes one before the first reply otherwise
+[Console]::OutputEncoding = New-Object System.Text.UTF8Encoding $false
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($line -eq $null) { break }
+    $script = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($line))
+    $status = 0
+    $global:LASTEXITCODE = 0
+    try {
+        # A child scope keeps one request's variables out of the next
+        $records = @(& ([scriptblock]::Create($script)) 2>&1)
+        $errs = @($records | Where-Object { $_ -is [System.Management.Automation.ErrorRecord] })
+        $output = $records | Where-Object { $_ -isnot [System.Management.Automation.ErrorRecord] } |
+            Out-String -Width 4096
+        if ($global:LASTEXITCODE) { $status = $global:LASTEXITCODE }
+        elseif ($errs) { $status = 1 }
+    } catch {
+        $output = ''
+        $errs = @($_)
+        $status = 1
+    }
+    if ($output -and -not $output.EndsWith("`n")) { $output += "`n" }
+    [Console]::Out.Write($output)
+    [Console]::Out.WriteLine("${sentinel}:ERR")
+    foreach ($err in @($errs)) { if ($err) { [Console]::Out.WriteLine("$err") } }
+    [Console]::Out.WriteLine("${sentinel}:END $status")
+    [Console]::Out.Flush()
+}
+"""
+
+DEFAULT_WORKER_COMMAND = ["powershell", "-NoProfile", "-NonInteractive", "-Command", HOST_SCRIPT]
+
+class PowerShellWorker:
+    """One persistent PowerShell process that executes scripts sent over stdin"""
+
+    def __init__(self, command: Optional[List[str]] = None):
+        self.sentinel = f"__WINSECMON_{uuid.uuid4().hex}__"
+        env = dict(os.environ, WINSECMON_SENTINEL=self.sentinel)
+        self.process = subprocess.Popen(
+            command or DEFAULT_WORKER_COMMAND,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+        )
+        self._lines = queue.Queue()
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+    def _read_stdout(self):
+        first = True
+        for line in self.process.stdout:
+            if first:
+                # Should the host still write a byte order mark, it precedes the first reply
+                line = line.lstrip("\ufeff")
+                first = False
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def _next_line(self, args, timeout, deadline):
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            line = self._lines.get(timeout=remaining)
+        except queue.Empty:
+            self.close(kill=True)
+            raise subprocess.TimeoutExpired(args, timeout)
+        if line is None:
+            raise RuntimeError(f"PowerShell worker exited with code {self.process.wait()}")
+        return line
+
+    def execute(self, script, timeout=None):
+        """Run one script and return a subprocess.CompletedProcess for it.
+        The timeout covers the whole script, not each line of its output."""
+        args = ["powershell", "-Command", script]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        encoded = base64.b64encode(script.encode("utf-8")).decode("ascii")
+        self.process.stdin.write(encoded + "\n")
+        self.process.stdin.flush()
+
+        err_marker = f"{self.sentinel}:ERR"
+        end_marker = f"{self.sentinel}:END "
+        stdout, stderr = [], []
+        target = stdout
+        while True:
+            line = self._next_line(args, timeout, deadline)
+            if line.rstrip("\r\n") == err_marker:
+                target = stderr
+            elif line.startswith(end_marker):
+                returncode = int(line[len(end_marker):].strip() or 0)
+                return subprocess.CompletedProcess(args, returncode, "".join(stdout), "".join(stderr))
+            else:
+                target.append(line)
+
+    def close(self, kill=False):
+        if self.process.poll() is None:
+            if kill:
+                self.process.kill()
+            else:
+                self.process.stdin.close()
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+        self.process.wait()
+
+class PowerShellPool:
+    """Up to `size` PowerShell workers shared by all audits in a run.
+
+    Workers are started on first use and reused afterwards, so the
+    interpreter start-up cost is paid once per worker instead of once per
+    query. A worker that times out or dies is discarded and replaced.
+    """
+
+    def __init__(self, size=1, command: Optional[List[str]] = None):
+        self.size = max(1, size)
+        self.command = command
+        self._idle = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._started < self.size:
+                self._started += 1
+                try:
+                    return PowerShellWorker(self.command)
+                except Exception:
+                    self._started -= 1
+                    raise
+        return self._idle.get()
+
+    def _discard(self, worker):
+        worker.close(kill=True)
+        with self._lock:
+            self._started -= 1
+        # Wake a thread blocked in _acquire so it can start a replacement
+        self._idle.put(None)
+
+    def _release(self, worker):
+        if worker.alive():
+            self._idle.put(worker)
+        else:
+            self._discard(worker)
+
+    def run(self, script, timeout=None):
+        """Run a script on an idle worker, starting one if the pool is not full"""
+        worker = self._acquire()
+        while worker is None or not worker.alive():
+            if worker is not None:
+                self._discard(worker)
+            worker = self._acquire()
+        try:
+            return worker.execute(script, timeout)
+        finally:
+            self._release(worker)
+
+    def close(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.close()
+        logger.debug("PowerShell worker pool closed")
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+class ModuleTiming(NamedTuple):
+    name: str
+    start: float            # time.perf_counter() at entry
+    seconds: float
+    cpu_seconds: float      # CPU time of the audit's own thread: parsing, logging, ...
+    thread: str
+    error: Optional[str]
+
+class ProfileRow(NamedTuple):
+    name: str
+    calls: int
+    seconds: float          # wall time
+    child_cpu_seconds: Optional[float]
+    output_bytes: int
+    parse_seconds: Optional[float]          # commands: consumer time between streamed lines
+    own_cpu_seconds: Optional[float] = None # audits: CPU time of the audit's own thread
+
+_local = threading.local()
+_lock = threading.Lock()
+_modules: List[ModuleTiming] = []
+_origin = time.perf_counter()
+
+def current_module() -> Optional[str]:
+    """Name of the audit the calling thread is working for, if any"""
+    return getattr(_local, "module", None)
+
+@contextmanager
+def module_span(name):
+    """Time one audit entry point; commands it runs are attributed to it"""
+    previous = getattr(_local, "module", None)
+    _local.module = name
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        _local.module = previous
+        timing = ModuleTiming(name, start, time.perf_counter() - start, time.thread_time() - cpu_start,
+                              threading.current_thread().name, error)
+        with _lock:
+            _modules.append(timing)
+
+def bind(func):
+    """Wrap func so that commands it runs from another thread (e.g. a pool
+    worker started by an audit) are attributed to the calling audit"""
+    module = current_module()
+
+    def run(*args, **kwargs):
+        previous = getattr(_local, "module", None)
+        _local.module = module
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.module = previous
+    return run
+
+def get_module_timings() -> List[ModuleTiming]:
+    with _lock:
+        return list(_modules)
+
+def reset():
+    global _origin
+    with _lock:
+        del _modules[:]
+        _origin = time.perf_counter()
+
+def command_label(args) -> str:
+    """Command line on one line; PowerShell is shown as `powershell <script>`"""
+    if len(args) > 2 and args[-2] == "-Command":
+        args = [args[0], args[-1]]
+    return " ".join(" ".join(args).split())
+
+def _add(total, value):
+    return value if total is None else total + (value or 0)
+
+def module_rows(modules: Sequence[ModuleTiming], commands: Sequence) -> List[ProfileRow]:
+    """One row per audit, slowest first, with the totals of its commands
+    and the CPU time of the audit's own thread"""
+    totals: Dict[str, list] = {}
+    for command in commands:
+        entry = totals.setdefault(command.module, [None, 0])
+        if not command.cached:
+            entry[0] = _add(entry[0], command.cpu_seconds)
+            entry[1] += command.output_bytes
+    rows = [ProfileRow(m.name, 1, m.seconds, *totals.get(m.name, [None, 0]), None, m.cpu_seconds)
+            for m in modules]
+    return sorted(rows, key=lambda row: row.seconds, reverse=True)
+
+def command_rows(commands: Sequence) -> List[ProfileRow]:
+    """One row per distinct command line, slowest first; cache hits count
+    as calls but add no time"""
+    grouped: Dict[tuple, list] = {}
+    for command in commands:
+        entry = grouped.setdefault(tuple(command.args), [0, 0.0, None, 0, None])
+        entry[0] += 1
+        if not command.cached:
+            entry[1] += command.seconds
+            entry[2] = _add(entry[2], command.cpu_seconds)
+            entry[3] += command.output_bytes
+            entry[4] = _add(entry[4], command.parse_seconds)
+    rows = [ProfileRow(command_label(args), *entry) for args, entry in grouped.items()]
+    return sorted(rows, key=lambda row: row.seconds, reverse=True)
+
+def _seconds(value):
+    return "       -" if value is None else f"{value:7.2f}s"
+
+def format_summary(modules: Sequence[ModuleTiming], commands: Sequence, top=15) -> str:
+    """Ranked text tables of the audits and the commands they ran"""
+    lines = [f"{'Audit':<48} {'wall':>8} {'child CPU':>9} {'output':>10} {'own CPU':>8}"]
+    for row in module_rows(modules, commands):
+        lines.append(f"{row.name[:48]:<48} {_seconds(row.seconds)} {_seconds(row.child_cpu_seconds):>9} "
+                     f"{row.output_bytes:>10} {_seconds(row.own_cpu_seconds)}")
+    lines.append("")
+    lines.append(f"{'Command':<48} {'calls':>5} {'wall':>8} {'child CPU':>9} {'output':>10} {'parse':>8}")
+    for row in command_rows(commands)[:top]:
+        lines.append(f"{row.name[:48]:<48} {row.calls:>5} {_seconds(row.seconds)} "
+                     f"{_seconds(row.child_cpu_seconds):>9} {row.output_bytes:>10} {_seconds(row.parse_seconds)}")
+    return "\n".join(lines)
+
+def _us(seconds):
+    return round(seconds * 1e6, 1)
+
+def trace_events(modules: Sequence[ModuleTiming], commands: Sequence) -> List[Dict]:
+    """Chrome trace-event "complete" events: audits and commands on the
+    thread that ran them. A streamed command's event spans its parsing too;
+    its args tell how much of it that was."""
+    pid = os.getpid()
+    threads: Dict[str, int] = {}
+    events = []
+
+    def tid(name):
+        if name not in threads:
+            threads[name] = len(threads) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": threads[name],
+                           "args": {"name": name}})
+        return threads[name]
+
+    for m in modules:
+        events.append({"name": m.name, "cat": "audit", "ph": "X", "pid": pid, "tid": tid(m.thread),
+                       "ts": _us(m.start - _origin), "dur": _us(m.seconds),
+                       "args": {"cpu_seconds": round(m.cpu_seconds, 6), "error": m.error}})
+    for c in commands:
+        name = command_label(c.args)
+        span = c.seconds + (c.parse_seconds or 0)
+        events.append({"name": name[:80], "cat": "command", "ph": "X", "pid": pid, "tid": tid(c.thread),
+                       "ts": _us(c.start - _origin), "dur": _us(span),
+                       "args": {"command": name, "module": c.module, "returncode": c.returncode,
+                                "cached": c.cached, "child_cpu_seconds": c.cpu_seconds,
+                                "output_bytes": c.output_bytes, "parse_seconds": c.parse_seconds}})
+    return events
+
+def write_trace(path, modules: Sequence[ModuleTiming], commands: Sequence):
+    """Write a trace for chrome://tracing or Perfetto"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events(modules, commands), "displayTimeUnit": "ms"}, f)
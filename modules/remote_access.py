@@ -1,44 +1,101 @@
-import subprocess
+import argparse
 import logging
+from typing import Dict, List, NamedTuple
+from modules import netstat
+from modules.netstat import PortWatchlist, Socket, is_listening
+
+logger = logging.getLogger(__name__)
+
+# Remote access ports reported by default (SSH, HTTP, HTTPS, RDP)
+DEFAULT_REMOTE_PORTS = "22=SSH,80=HTTP,443=HTTPS,3389=RDP"
+
+class RemoteAccessSocket(NamedTuple):
+    service: str
+    protocol: str
+    local_address: str
+    local_port: int
+    remote_address: str
+    remote_port: int
+    state: str
+    pid: int
+
+_watchlist = PortWatchlist.parse(DEFAULT_REMOTE_PORTS)
+
+def configure_watchlist(spec=None):
+    """Replace the watched ports, e.g. "22=SSH,3389=RDP,5900-5910=VNC,8080".
+    Labels are optional; ports and ranges may number in the hundreds."""
+    global _watchlist
+    _watchlist = PortWatchlist.parse(spec or DEFAULT_REMOTE_PORTS)
+
+def port_spec(value: str) -> str:
+    """argparse type for --remote-ports: the spec, once it parses"""
+    try:
+        PortWatchlist.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def add_arguments(parser):
+    """Command line options of this audit (see audit_registry)"""
+    parser.add_argument('--remote-ports', metavar='PORTS', type=port_spec, default=DEFAULT_REMOTE_PORTS,
+                        help='Ports and ranges the remote access audit reports on, '
+                             'e.g. "22=SSH,3389=RDP,5900-5910=VNC,8080" (default: %(default)s)')
+
+def configure_from_args(args):
+    configure_watchlist(args.remote_ports)
+
+def remote_access_sockets(index: Dict[int, List[Socket]], watchlist: PortWatchlist) -> List[RemoteAccessSocket]:
+    """Listening sockets and established sessions on watched local ports.
+
+    Walks the distinct local ports in the index, so each check is one
+    table lookup however long the watchlist is.
+    """
+    found = []
+    for port in sorted(index):
+        if port not in watchlist:
+            continue
+        service = watchlist.label(port)
+        for sock in index[port]:
+            if is_listening(sock) or sock.state == "ESTABLISHED":
+                found.append(RemoteAccessSocket(service, *sock))
+    return found
 
 def audit_remote_access():
-    logging.info("Checking remote access settings...")
+    logger.info("Checking remote access settings...")
     try:
-        # Run netstat to get all active connections and listening ports
-        result = subprocess.run(["netstat", "-an"], capture_output=True, text=True)
-        
-        # Check for common remote access ports (SSH, RDP, HTTP/HTTPS)
-        remote_ports = ['22', '3389', '80', '443']
-        logging.info("Checking for open remote access ports (SSH, RDP, HTTP, HTTPS)...")
-        
-        lines = result.stdout.splitlines()
-        listening_ports = []
-        established_connections = []
-
-        # Separate listening ports and established connections
-        for line in lines:
-            if 'LISTEN' in line:
-                listening_ports.append(line)
-            if 'ESTABLISHED' in line:
-                established_connections.append(line)
-        
-        # Log listening ports and established connections
-        if listening_ports:
-            logging.info("Listening Ports:")
-            for port in listening_ports:
-                if any(remote_port in port for remote_port in remote_ports):
-                    logging.info(port)
-                else:
-                    logging.debug(port)
-        
-        if established_connections:
-            logging.info("Established Connections:")
-            for connection in established_connections:
-                logging.info(connection)
+        # All active connections and listening ports, shared with the firewall audit
+        snapshot = netstat.get_snapshot()
+        summary = snapshot.summary()
+
+        logger.info("Checking for open remote access ports...")
+        records = remote_access_sockets(snapshot.by_port, _watchlist)
+        listeners = [r for r in records if r.state != "ESTABLISHED"]
+        sessions = [r for r in records if r.state == "ESTABLISHED"]
+
+        if listeners:
+            logger.info("Listening Ports:")
+            for r in listeners:
+                logger.info("%s: %s %s:%s",
+                            r.service or 'port ' + str(r.local_port), r.protocol, r.local_address, r.local_port)
+        if sessions:
+            logger.info("Established Connections:")
+            for r in sessions:
+                logger.info("%s: %s %s:%s <- %s:%s",
+                            r.service or 'port ' + str(r.local_port), r.protocol, r.local_address, r.local_port,
+                            r.remote_address, r.remote_port)
+        if logger.isEnabledFor(logging.DEBUG):
+            for sock in snapshot.sockets:
+                if is_listening(sock) and sock.local_port not in _watchlist:
+                    logger.debug("%s %s:%s %s", sock.protocol, sock.local_address, sock.local_port, sock.state)
+
+        logger.info("Sockets: %s, %s listening ports", summary.total, summary.listening_ports)
 
         # If no relevant ports found, log a warning
-        if not listening_ports and not established_connections:
-            logging.warning("No remote access connections found.")
-        
+        if not records:
+            logger.warning("No remote access connections found.")
+
+        return records + [summary]
+
     except Exception as e:
-        logging.error(f"Failed to check remote access: {e}")
\ No newline at end of file
+        logger.error("Failed to check remote access: %s", e)
+        return []
@@ -0,0 +1,120 @@
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import Any, Collection, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+REPORT_FORMATS = ("json", "ndjson")
+
+class Section(NamedTuple):
+    module: str
+    records: List[Any]
+    seconds: float
+    error: Optional[str]
+
+def record_to_dict(record) -> Dict[str, Any]:
+    """Serialize one NamedTuple record, tagged with its type name"""
+    return {"type": type(record).__name__, **record._asdict()}
+
+def to_jsonable(record) -> Dict[str, Any]:
+    """record_to_dict reduced to plain JSON types (tuples become lists, ...)"""
+    return json.loads(json.dumps(record_to_dict(record), default=_default))
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if hasattr(value, "_asdict"):
+        return record_to_dict(value)
+    return str(value)
+
+class AuditReport:
+    """Typed records returned by the audits in one run, grouped by module.
+
+    Every audit entry point returns a list of NamedTuple records; the report
+    keeps them in module order and serializes them to a single JSON document
+    or to NDJSON, one record per line, for collectors to ingest directly.
+    """
+
+    def __init__(self, host: Optional[str] = None):
+        self.host = host or platform.node()
+        self.started = datetime.now(timezone.utc)
+        self.sections: Dict[str, Section] = {}
+
+    def add(self, module, records, seconds=0.0, error=None):
+        self.sections[module] = Section(module, list(records or []), seconds, error)
+
+    def records(self) -> Iterator[Tuple[str, Any]]:
+        for section in self.sections.values():
+            for record in section.records:
+                yield section.module, record
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "started": self.started.isoformat(),
+            "sections": [{
+                "module": section.module,
+                "seconds": round(section.seconds, 3),
+                "error": section.error,
+                "records": [record_to_dict(record) for record in section.records],
+            } for section in self.sections.values()],
+        }
+
+    def to_json(self, indent=None) -> str:
+        return json.dumps(self.to_dict(), indent=indent, default=_default)
+
+    def iter_ndjson(self) -> Iterator[str]:
+        """One JSON object per record, each carrying its host and module"""
+        for module, record in self.records():
+            yield json.dumps({"host": self.host, "module": module, **record_to_dict(record)}, default=_default)
+        for section in self.sections.values():
+            if section.error:
+                yield json.dumps({"host": self.host, "module": section.module,
+                                  "type": "AuditError", "error": section.error})
+
+    def write(self, path, fmt="json"):
+        """Write the report to path ('-' for stdout) as json or ndjson"""
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {fmt}")
+        out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+        try:
+            if fmt == "json":
+                out.write(self.to_json(indent=2) + "\n")
+            else:
+                for line in self.iter_ndjson():
+                    out.write(line + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+def iter_saved_records(path, types: Optional[Collection[str]] = None) -> Iterator[Dict[str, Any]]:
+    """The records of a saved report as dicts carrying their "type": a JSON
+    report (each record gets the report's host and module) or NDJSON,
+    including fleet output. NDJSON is streamed line by line, so large fleet
+    files are never held in memory at once. With `types`, only records of
+    those types are returned, and NDJSON lines not mentioning one of them
+    are skipped without being parsed."""
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+        try:
+            document = json.loads(first) if first.strip() else None
+        except ValueError:
+            # An indented JSON report: its first line is just "{"
+            document = json.loads(first + f.read())
+        if isinstance(document, dict) and "sections" in document:
+            for section in document["sections"]:
+                for record in section["records"]:
+                    if types is None or record.get("type") in types:
+                        yield {"host": document.get("host"), "module": section["module"], **record}
+            return
+        if document is not None and (types is None or document.get("type") in types):
+            yield document
+        for line in f:
+            if types is not None and not any(name in line for name in types):
+                continue
+            if line.strip():
+                record = json.loads(line)
+                if types is None or record.get("type") in types:
+                    yield record
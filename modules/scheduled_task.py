@@ -0,0 +1,176 @@
+import csv
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from modules import command_runner
+
+logger = logging.getLogger(__name__)
+
+SCHTASKS_CSV_ARGS = ["schtasks", "/query", "/fo", "CSV", "/v"]
+
+class ScheduledTask(NamedTuple):
+    folder: str
+    name: str
+    next_run: str
+    status: str
+    # Filled in from the verbose CSV listing only
+    run_as: str = ""
+    action: str = ""
+    state: str = ""
+    author: str = ""
+    last_result: str = ""
+    risk: int = 0
+    indicators: Tuple[str, ...] = ()
+
+def _prefixes(word: str, shortest: int = 1) -> str:
+    """Regex alternation of the abbreviations PowerShell accepts for a
+    parameter: every prefix of `word` at least `shortest` letters long"""
+    return "|".join(word[:n] for n in range(len(word), shortest - 1, -1))
+
+# powershell.exe/pwsh options up to -File or -Command; anything after those
+# belongs to the script or command, not to PowerShell
+_POWERSHELL_OPTIONS = (r"\b(powershell|pwsh)(\.exe)?\b\"?"
+                       r"(\s+(?![-/](" + _prefixes("file") + "|" + _prefixes("command") + r")\b)\S+)*?")
+
+# (indicator, weight, task field, pattern) - a task's risk is the sum of the
+# weights of the indicators that match it
+RISK_INDICATORS = [
+    ("encoded_powershell", 4, "action",
+     re.compile(_POWERSHELL_OPTIONS + r"\s+[-/](ec|" + _prefixes("encodedcommand") + r")(\s|$)"
+                r"|frombase64string", re.I)),
+    ("user_writable_path", 3, "action",
+     re.compile(r"\\(appdata|temp|tmp|downloads|users\\public|programdata|windows\\temp)\\|%(temp|tmp|appdata|localappdata|public)%", re.I)),
+    ("script_host", 2, "action",
+     re.compile(r"\b(mshta|wscript|cscript|certutil|bitsadmin)(\.exe)?\b", re.I)),
+    # Common in built-in tasks too, so only a weak signal on its own
+    ("proxy_execution", 1, "action",
+     re.compile(r"\b(rundll32|regsvr32)(\.exe)?\b", re.I)),
+    ("hidden_window", 1, "action",
+     re.compile(_POWERSHELL_OPTIONS + r"\s+[-/](" + _prefixes("windowstyle") + r")\s+hidden\b", re.I)),
+    ("system_principal", 1, "run_as",
+     re.compile(r"^(nt authority\\)?system$|^localsystem$", re.I)),
+]
+
+# Tasks scoring at least this much are logged as warnings
+RISK_THRESHOLD = 3
+
+def parse_schtasks_table(output: str) -> List[ScheduledTask]:
+    """Parse the default `schtasks` listing: per-folder tables whose column
+    widths are given by the ===== underline row"""
+    tasks = []
+    folder = ""
+    spans = None
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        if line.startswith("Folder:"):
+            folder = line[len("Folder:"):].strip()
+            spans = None
+        elif line.startswith("="):
+            spans = [match.span() for match in re.finditer(r"=+", line)]
+            spans[-1] = (spans[-1][0], None)
+        elif spans and not line.startswith("INFO:"):
+            values = [line[start:end].strip() for start, end in spans]
+            values += [""] * (3 - len(values))
+            tasks.append(ScheduledTask(folder, values[0], values[1], values[2]))
+    return tasks
+
+def task_path(task: ScheduledTask) -> str:
+    return task.folder.rstrip("\\") + "\\" + task.name
+
+def score_task(task: ScheduledTask) -> ScheduledTask:
+    """The task with its risk score and matching indicators filled in"""
+    indicators = tuple(name for name, _, field, pattern in RISK_INDICATORS
+                       if pattern.search(getattr(task, field)))
+    risk = sum(weight for name, weight, _, _ in RISK_INDICATORS if name in indicators)
+    return task._replace(risk=risk, indicators=indicators)
+
+# Verbose CSV column -> ScheduledTask field
+CSV_COLUMNS = {
+    "Next Run Time": "next_run",
+    "Status": "status",
+    "Run As User": "run_as",
+    "Task To Run": "action",
+    "Scheduled Task State": "state",
+    "Author": "author",
+    "Last Result": "last_result",
+}
+
+def parse_schtasks_csv(lines: Iterable[str]) -> Iterator[ScheduledTask]:
+    """Parse `schtasks /query /fo CSV /v` in one pass, one record per task.
+
+    schtasks repeats the header row for every folder and prints one row per
+    trigger, so a task path seen before is skipped. Tasks are scored as
+    they are parsed.
+    """
+    columns: Dict[str, int] = {}
+    name_column = 1
+    seen = set()
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        if row[0] == "HostName":
+            columns = {CSV_COLUMNS[name]: i for i, name in enumerate(row) if name in CSV_COLUMNS}
+            name_column = row.index("TaskName") if "TaskName" in row else 1
+            continue
+        if len(row) <= name_column:
+            continue
+        path = row[name_column]
+        if path in seen:
+            continue
+        seen.add(path)
+        folder, _, name = path.rpartition("\\")
+        values = {field: row[i] if i < len(row) else "" for field, i in columns.items()}
+        yield score_task(ScheduledTask(folder or "\\", name, **values))
+
+TASK_SOURCES = ("csv", "table")
+
+_source = "csv"
+
+def configure_source(name="csv"):
+    """Select the schtasks listing: verbose CSV (default, with actions,
+    principals and risk scores) or the plain table"""
+    global _source
+    if name not in TASK_SOURCES:
+        raise ValueError(f"Unknown scheduled task source: {name}")
+    _source = name
+
+def add_arguments(parser):
+    """Command line options of this audit (see audit_registry)"""
+    parser.add_argument('--tasks-source', choices=TASK_SOURCES, default='csv',
+                        help='Scheduled task listing: verbose CSV with risk scoring (default) or the plain table')
+
+def configure_from_args(args):
+    configure_source(args.tasks_source)
+
+def collect_tasks() -> List[ScheduledTask]:
+    """Tasks from the verbose CSV listing, streamed and scored in one pass"""
+    return list(parse_schtasks_csv(command_runner.iter_lines(SCHTASKS_CSV_ARGS, check=True)))
+
+def check_scheduled_tasks():
+    logger.info("Checking scheduled tasks...")
+    try:
+        if _source == "table":
+            result = command_runner.run(["schtasks"])
+            logger.debug("%s", result.stdout)
+            tasks = parse_schtasks_table(result.stdout)
+            logger.info("Scheduled tasks: %s", len(tasks))
+            return tasks
+
+        tasks = collect_tasks()
+        for task in sorted(tasks, key=lambda t: t.risk, reverse=True):
+            if task.risk >= RISK_THRESHOLD:
+                logger.warning("Risky task %s (risk %s: %s) runs as %s: %s",
+                               task_path(task), task.risk, ', '.join(task.indicators), task.run_as or 'unknown',
+                               task.action)
+            elif task.risk:
+                logger.info("Task %s (risk %s: %s): %s",
+                            task_path(task), task.risk, ', '.join(task.indicators), task.action)
+            else:
+                logger.debug("Task %s: %s", task_path(task), task.action)
+        risky = sum(1 for task in tasks if task.risk >= RISK_THRESHOLD)
+        logger.info("Scheduled tasks: %s, %s at or above risk %s", len(tasks), risky, RISK_THRESHOLD)
+        return tasks
+    except Exception as e:
+        logger.error("Failed to check scheduled tasks: %s", e)
+        return []
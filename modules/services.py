@@ -1,11 +1,152 @@
-import subprocess
+import csv
 import logging
+import re
+import subprocess
+import sys
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from modules import command_runner
+
+logger = logging.getLogger(__name__)
+
+SERVICE_FIELDS = ["Name", "DisplayName", "State", "StartMode", "StartName", "PathName", "DelayedAutoStart",
+                  "ExitCode"]
+
+# All services with the fields the analysis needs, as CSV, in one query
+SERVICE_SCRIPT = ("Get-CimInstance -ClassName Win32_Service | Select-Object " + ", ".join(SERVICE_FIELDS)
+                  + " | ConvertTo-Csv -NoTypeInformation")
+
+# Fallback without PowerShell; /format:csv adds a leading Node column
+WMIC_SERVICE_ARGS = ["wmic", "service", "get", ",".join(f for f in SERVICE_FIELDS if f != "DelayedAutoStart"),
+                     "/format:csv"]
+
+class ServiceRecord(NamedTuple):
+    name: str
+    state: str
+    # Filled in from the CSV listing
+    start_mode: str = ""
+    account: str = ""
+    path: str = ""
+    display_name: str = ""
+    delayed_start: bool = False
+    exit_code: str = ""
+    findings: Tuple[str, ...] = ()
+
+# CSV column -> ServiceRecord field
+CSV_COLUMNS = {
+    "Name": "name",
+    "State": "state",
+    "StartMode": "start_mode",
+    "StartName": "account",
+    "PathName": "path",
+    "DisplayName": "display_name",
+    "DelayedAutoStart": "delayed_start",
+    "ExitCode": "exit_code",
+}
+
+# Executable at the start of an unquoted command line: up to the first
+# .exe (or similar) followed by a space or the end
+_UNQUOTED_BINARY = re.compile(r"^(.+?\.(?:exe|com|bat|cmd|sys))(?=\s|$)", re.I)
+
+# Directories only administrators can write to by default; a LocalSystem
+# service anywhere else (ProgramData, user profiles, folders created at the
+# root of a drive, ...) may be replaceable by an unprivileged user
+PROTECTED_DIRS = re.compile(r"^(?:[a-z]:\\windows\\(?!temp\\)|[a-z]:\\program files(?: \(x86\))?\\)", re.I)
+
+_SYSTEM_ROOT = re.compile(r"^(?:%systemroot%|%windir%|\\systemroot)(?=\\)", re.I)
+
+SYSTEM_ACCOUNTS = {"localsystem", "nt authority\\system", ".\\localsystem"}
+
+FINDINGS = {
+    "unquoted_path": "unquoted path with spaces",
+    "system_writable_path": "runs as LocalSystem from a directory outside Windows and Program Files",
+    "auto_start_stopped": "set to start automatically but stopped",
+}
+
+def service_binary(path: str) -> Tuple[str, bool]:
+    """(executable, quoted) from a service's PathName"""
+    path = path.strip()
+    if path.startswith('"'):
+        return path[1:].partition('"')[0], True
+    match = _UNQUOTED_BINARY.match(path)
+    return (match.group(1) if match else path.split(" ", 1)[0]), False
+
+def normalize_binary(binary: str) -> str:
+    """Absolute form of the paths services use for the system directory"""
+    if binary.startswith("\\??\\"):
+        binary = binary[4:]
+    binary = _SYSTEM_ROOT.sub(r"C:\\Windows", binary)
+    if binary.lower().startswith("system32\\"):
+        binary = "C:\\Windows\\" + binary
+    return binary
+
+def analyze_service(service: ServiceRecord) -> ServiceRecord:
+    """The service with its findings filled in"""
+    findings = []
+    if service.path:
+        binary, quoted = service_binary(service.path)
+        if not quoted and " " in binary:
+            findings.append("unquoted_path")
+        if service.account.lower() in SYSTEM_ACCOUNTS and not PROTECTED_DIRS.match(normalize_binary(binary)):
+            findings.append("system_writable_path")
+    if service.start_mode == "Auto" and service.state == "Stopped":
+        findings.append("auto_start_stopped")
+    return service._replace(findings=tuple(findings)) if findings else service
+
+def parse_service_csv(lines: Iterable[str]) -> Iterator[ServiceRecord]:
+    """Parse the ConvertTo-Csv (or `wmic ... /format:csv`) listing in one
+    pass, analyzing each service as it is read. The header row picks the
+    columns, so their order and any extra ones do not matter. Values that
+    repeat across services (states, start modes, accounts) are interned."""
+    columns: Dict[str, int] = {}
+    intern = sys.intern
+    for row in csv.reader(lines):
+        if not row or not any(row):
+            continue
+        if not columns:
+            if "Name" in row:
+                columns = {CSV_COLUMNS[name]: i for i, name in enumerate(row) if name in CSV_COLUMNS}
+            continue
+        values = {field: row[i] if i < len(row) else "" for field, i in columns.items()}
+        if not values.get("name"):
+            continue
+        yield analyze_service(ServiceRecord(
+            values["name"],
+            intern(values.get("state", "")),
+            intern(values.get("start_mode", "")),
+            intern(values.get("account", "")),
+            values.get("path", ""),
+            values.get("display_name", ""),
+            values.get("delayed_start", "").lower() == "true",
+            intern(values.get("exit_code", "")),
+        ))
+
+def collect_services() -> List[ServiceRecord]:
+    """Services from Win32_Service via PowerShell, or wmic if that fails"""
+    try:
+        return list(parse_service_csv(command_runner.iter_lines(command_runner.powershell_args(SERVICE_SCRIPT),
+                                                                check=True)))
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        logger.warning("PowerShell service query failed (%s), falling back to wmic", e)
+        return list(parse_service_csv(command_runner.iter_lines(WMIC_SERVICE_ARGS, check=True)))
 
 def audit_services():
-    logging.info("Auditing running services...")
+    logger.info("Auditing running services...")
     try:
-        result = subprocess.run(["wmic", "service", "get", "Name,State"], capture_output=True, text=True)
-        logging.info(result.stdout)
+        services = collect_services()
+        counts: Dict[str, int] = {}
+        for service in services:
+            for finding in service.findings:
+                counts[finding] = counts.get(finding, 0) + 1
+                if finding != "auto_start_stopped":
+                    logger.warning("Service %s %s: %s", service.name, FINDINGS[finding], service.path)
+        stopped = [s.name + (" (delayed)" if s.delayed_start else "") for s in services
+                   if "auto_start_stopped" in s.findings]
+        logger.info("Services: %s (%s running)", len(services), sum(s.state == "Running" for s in services))
+        logger.info("Findings: %s", ", ".join(f"{FINDINGS[kind]}: {count}" for kind, count in counts.items())
+                    or "none")
+        if stopped:
+            logger.info("Automatic services that are stopped: %s", ", ".join(stopped))
+        return services
     except Exception as e:
-        logging.error(f"Failed to audit services: {e}")
-
+        logger.error("Failed to audit services: %s", e)
+        return []
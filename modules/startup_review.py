@@ -0,0 +1,33 @@
+import logging
+from typing import List, NamedTuple
+from modules import command_runner, wmic
+
+logger = logging.getLogger(__name__)
+
+class StartupEntry(NamedTuple):
+    caption: str
+    command: str
+
+STARTUP_ARGS = ["wmic", "startup", "get", "Caption,Command"]
+
+def collect_startup_entries() -> List[StartupEntry]:
+    """Startup entries from `wmic startup`. The command result is cached for
+    the run, so system_info can use the same data to de-duplicate autoruns"""
+    result = command_runner.run(STARTUP_ARGS)
+    return [StartupEntry(row.get("Caption", ""), row.get("Command", "")) for row in wmic.parse_table(result.stdout)]
+
+def normalize_command(command: str) -> str:
+    """Command line compared case- and quote-insensitively"""
+    return " ".join(command.replace('"', "").lower().split())
+
+def check_startup_apps():
+    logger.info("Checking startup applications...")
+    try:
+        entries = collect_startup_entries()
+        logger.info("Startup entries: %s", len(entries))
+        for entry in entries:
+            logger.info("  %s: %s", entry.caption, entry.command)
+        return entries
+    except Exception as e:
+        logger.error("Failed to check startup applications: %s", e)
+        return []
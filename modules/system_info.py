@@ -1,74 +1,203 @@
-import subprocess
+import csv
 import logging
-import shutil
-import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, NamedTuple
+from modules import command_runner, profiler
+from modules.audit_logging import bind_section, setup_logging
+from modules.startup_review import collect_startup_entries, normalize_command
 
-def get_system_info():
-    logging.basicConfig(level=logging.INFO)
-    logging.info("Starting system information audit...")
+logger = logging.getLogger(__name__)
 
-    # Check for psinfo or systeminfo for basic system info
-    psinfo_path = shutil.which("psinfo")  # Check if psinfo is in PATH
+class SystemInfoEntry(NamedTuple):
+    key: str
+    value: str
 
-    try:
-        if psinfo_path:
-            logging.info(f"Found PsInfo at {psinfo_path}. Fetching system information using PsInfo...")
-            result = subprocess.run(["psinfo"], capture_output=True, text=True)
-        else:
-            logging.warning("PsInfo not found. Falling back to systeminfo...")
-            result = subprocess.run(["systeminfo"], capture_output=True, text=True)
-
-        if result.returncode == 0:
-            logging.info("System Information Retrieved Successfully:\n")
-            logging.info(result.stdout)
-        else:
-            logging.error(f"Failed to retrieve system info. Exit code: {result.returncode}")
-            logging.error(result.stderr)
+class PendingMove(NamedTuple):
+    source: str
+    target: str     # '' when the file is deleted at reboot
 
-    except FileNotFoundError as fnf_error:
-        logging.error(f"Command not found. Make sure 'systeminfo' or 'psinfo' is available. Error: {fnf_error}")
-    except Exception as e:
-        logging.error(f"An unexpected error occurred while fetching system info: {e}")
+class AutorunEntry(NamedTuple):
+    location: str
+    entry: str
+    enabled: str
+    category: str
+    profile: str
+    description: str
+    company: str
+    image_path: str
+    launch_string: str
+    in_startup: bool = False    # also reported by `wmic startup`
 
-    # Now check for pending file moves
+def parse_key_values(output: str) -> List[SystemInfoEntry]:
+    """Parse `Key:   value` lines from systeminfo/psinfo. Indented lines
+    continue the previous value (e.g. the hotfix list) and are joined with '; '"""
+    entries = []
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        if line[0].isspace() and entries:
+            key, value = entries[-1]
+            extra = line.strip()
+            entries[-1] = SystemInfoEntry(key, f"{value}; {extra}" if value else extra)
+        elif ':' in line:
+            key, value = line.split(':', 1)
+            entries.append(SystemInfoEntry(key.strip(), value.strip()))
+    return entries
+
+def parse_pendmoves(output: str) -> List[PendingMove]:
+    """Parse the Source:/Target: pairs printed by pendmoves"""
+    moves = []
+    source = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("Source:"):
+            source = line[len("Source:"):].strip()
+        elif line.startswith("Target:") and source is not None:
+            target = line[len("Target:"):].strip()
+            moves.append(PendingMove(source, "" if target.upper() == "DELETE" else target))
+            source = None
+    return moves
+
+# autoruns -c column -> AutorunEntry field
+AUTORUNS_COLUMNS = {
+    "Entry Location": "location",
+    "Entry": "entry",
+    "Enabled": "enabled",
+    "Category": "category",
+    "Profile": "profile",
+    "Description": "description",
+    "Company": "company",
+    "Image Path": "image_path",
+    "Launch String": "launch_string",
+}
+
+def parse_autoruns_csv(lines: Iterable[str]) -> Iterator[AutorunEntry]:
+    """Parse `autoruns -c` output row by row. Anything before the header
+    row (the banner) is skipped, as are repeated rows."""
+    columns = None
+    seen = set()
+    for row in csv.reader(lines):
+        if columns is None:
+            if "Entry Location" in row:
+                columns = [(AUTORUNS_COLUMNS[name], i) for i, name in enumerate(row) if name in AUTORUNS_COLUMNS]
+            continue
+        if not any(row):
+            continue
+        values = {field: row[i] if i < len(row) else "" for field, i in columns}
+        values.update((field, "") for field in AUTORUNS_COLUMNS.values() if field not in values)
+        entry = AutorunEntry(**values)
+        key = (entry.location, entry.entry, entry.launch_string)
+        if key not in seen:
+            seen.add(key)
+            yield entry
+
+def collect_system_details():
+    """psinfo when available, systeminfo otherwise, as (tool, entries)"""
+    tool = "psinfo" if command_runner.which("psinfo") else "systeminfo"
+    result = command_runner.run([tool], check=True)
+    return tool, parse_key_values(result.stdout)
+
+def collect_pending_moves() -> List[PendingMove]:
+    result = command_runner.run(["pendmoves"], check=True)
+    return parse_pendmoves(result.stdout)
+
+_dedupe_startup = False
+
+def configure_startup_dedupe(enabled=False):
+    """Drop autoruns entries that `wmic startup` also reports. Only right
+    when startup_review runs too, so each persistence entry is listed once;
+    otherwise they are kept and marked in_startup."""
+    global _dedupe_startup
+    _dedupe_startup = enabled
+
+def configure_from_args(args):
+    configure_startup_dedupe(bool(getattr(args, "all", False) or getattr(args, "startup", False)))
+
+def collect_autoruns(dedupe=None):
+    """Autoruns entries, with those `wmic startup` also reports dropped
+    (dedupe) or marked in_startup. Returns (entries, number of those)."""
+    dedupe = _dedupe_startup if dedupe is None else dedupe
     try:
-        pendmoves_path = shutil.which("pendmoves")  # Check if pendmoves is in PATH
-        if pendmoves_path:
-            logging.info(f"Found PendMoves at {pendmoves_path}. Checking for pending file moves on next reboot...")
-            result = subprocess.run(["pendmoves"], capture_output=True, text=True)
-            if result.returncode == 0:
-                logging.info("Pending file moves retrieved successfully:\n")
-                logging.info(result.stdout)
-            else:
-                logging.error(f"Failed to retrieve pending moves. Exit code: {result.returncode}")
-                logging.error(result.stderr)
-        else:
-            logging.warning("PendMoves not found. Unable to check for pending file moves.")
+        startup = {normalize_command(entry.command) for entry in collect_startup_entries()}
+    except Exception:
+        startup = set()
+    entries, duplicates = [], 0
+    # Run with CSV output; autoruns may write UTF-16, which iter_lines detects
+    for entry in parse_autoruns_csv(command_runner.iter_lines(["autoruns", "-c"], check=True)):
+        if entry.launch_string and normalize_command(entry.launch_string) in startup:
+            duplicates += 1
+            if dedupe:
+                continue
+            entry = entry._replace(in_startup=True)
+        entries.append(entry)
+    return entries, duplicates
+
+def get_system_info():
+    logger.info("Starting system information audit...")
+    records = []
+
+    # The tools are independent, so run them side by side and log in order
+    tools = {"pendmoves": command_runner.which("pendmoves"), "autoruns": command_runner.which("autoruns")}
+
+    def task(func):
+        # Keep the workers' log records and commands with this audit
+        return bind_section(profiler.bind(func))
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        details = pool.submit(task(collect_system_details))
+        moves = pool.submit(task(collect_pending_moves)) if tools["pendmoves"] else None
+        autoruns = pool.submit(task(collect_autoruns)) if tools["autoruns"] else None
 
+    # Check for psinfo or systeminfo for basic system info
+    try:
+        tool, entries = details.result()
+        if tool == "systeminfo":
+            logger.warning("PsInfo not found. Fell back to systeminfo.")
+        logger.info("System Information Retrieved Successfully via %s:", tool)
+        for entry in entries:
+            logger.info("%s: %s", entry.key, entry.value)
+        records.extend(entries)
     except FileNotFoundError as fnf_error:
-        logging.error(f"Command not found. Make sure 'pendmoves' is available. Error: {fnf_error}")
+        logger.error("Command not found. Make sure 'systeminfo' or 'psinfo' is available. Error: %s", fnf_error)
     except Exception as e:
-        logging.error(f"An unexpected error occurred while checking for pending file moves: {e}")
+        logger.error("An unexpected error occurred while fetching system info: %s", e)
+
+    # Now check for pending file moves
+    if moves is None:
+        logger.warning("PendMoves not found. Unable to check for pending file moves.")
+    else:
+        try:
+            pending = moves.result()
+            logger.info("Pending file moves on next reboot: %s", len(pending))
+            for move in pending:
+                logger.info("  %s -> %s", move.source, move.target or 'DELETE')
+            records.extend(pending)
+        except Exception as e:
+            logger.error("An unexpected error occurred while checking for pending file moves: %s", e)
 
     # Check autoruns for suspicious startup programs
-    try:
-        autoruns_path = shutil.which("autoruns")  # Check if autoruns is in PATH
-        if autoruns_path:
-            logging.info(f"Found Autoruns at {autoruns_path}. Checking for startup processes...")
-            result = subprocess.run([autoruns_path, "-c"], capture_output=True, text=True)  # Run autoruns with CSV output
-            if result.returncode == 0:
-                logging.info("Autoruns information retrieved successfully:\n")
-                logging.info(result.stdout)
+    if autoruns is None:
+        logger.warning("Autoruns not found. Unable to check for autorun programs.")
+    else:
+        try:
+            entries, duplicates = autoruns.result()
+            by_category = Counter(entry.category or "Other" for entry in entries)
+            if _dedupe_startup:
+                logger.info("Autorun entries: %s (%s already listed by startup_review)", len(entries), duplicates)
             else:
-                logging.error(f"Failed to retrieve autoruns information. Exit code: {result.returncode}")
-                logging.error(result.stderr)
-        else:
-            logging.warning("Autoruns not found. Unable to check for autorun programs.")
+                logger.info("Autorun entries: %s (%s also reported by wmic startup)", len(entries), duplicates)
+            for category, count in by_category.most_common():
+                logger.info("  %s: %s", category, count)
+            if logger.isEnabledFor(logging.DEBUG):
+                for entry in entries:
+                    logger.debug("%s | %s | %s", entry.location, entry.entry, entry.launch_string)
+            records.extend(entries)
+        except Exception as e:
+            logger.error("An unexpected error occurred while checking autoruns: %s", e)
 
-    except FileNotFoundError as fnf_error:
-        logging.error(f"Command not found. Make sure 'autoruns' is available. Error: {fnf_error}")
-    except Exception as e:
-        logging.error(f"An unexpected error occurred while checking autoruns: {e}")
+    return records
 
 if __name__ == "__main__":
-    get_system_info()
\ No newline at end of file
+    setup_logging(console=True)
+    get_system_info()
@@ -1,124 +1,177 @@
 import subprocess
-import re
+import json
 import logging
+from typing import List, NamedTuple, Optional
+from xml.etree.ElementTree import ParseError
+from modules import command_runner, login_history
+from modules.audit_logging import setup_logging
 
-# Set up logging
-#logging.basicConfig(filename='audit.log', level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
 
-def list_user_accounts():
+# One PowerShell session collects everything the account audit needs and
+# returns it as a single JSON document. A failing section is reported under
+# Errors instead of aborting the others.
+ACCOUNT_SNAPSHOT_SCRIPT = r"""
+$ErrorActionPreference = 'Stop'
+$errors = @{}
+function Format-Date($value) { if ($value) { $value.ToString('o') } }
+
+$users = try {
+    Get-LocalUser | ForEach-Object {
+        [ordered]@{
+            Name = $_.Name
+            Enabled = $_.Enabled
+            LastLogon = Format-Date $_.LastLogon
+            PasswordExpires = Format-Date $_.PasswordExpires
+            PasswordLastSet = Format-Date $_.PasswordLastSet
+            PasswordRequired = $_.PasswordRequired
+            Sid = $_.SID.Value
+        }
+    }
+} catch { $errors.Users = "$_" }
+
+$admins = try {
+    Get-LocalGroupMember -Group 'Administrators' | ForEach-Object {
+        [ordered]@{ Name = $_.Name; Source = "$($_.PrincipalSource)"; ObjectClass = $_.ObjectClass }
+    }
+} catch { $errors.Admins = "$_" }
+
+$policy = try { net accounts | Out-String } catch { $errors.Policy = "$_" }
+
+[ordered]@{
+    Users = @($users)
+    Admins = @($admins)
+    Policy = $policy
+    Errors = $errors
+} | ConvertTo-Json -Depth 4 -Compress
+"""
+
+class UserAccount(NamedTuple):
+    name: str
+    enabled: Optional[bool]
+    last_logon: str
+    password_expires: Optional[str]
+    password_last_set: Optional[str]
+    password_required: Optional[bool]
+    sid: Optional[str]
+
+class AdminMember(NamedTuple):
+    name: str
+    source: Optional[str]
+    object_class: Optional[str]
+
+class PasswordStatus(NamedTuple):
+    policy: str
+    never_expires: List[str]
+    disabled_accounts: List[str]
+
+def _as_list(value):
+    """ConvertTo-Json collapses one-element arrays into a bare object"""
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [value]
+    return value
+
+def collect_account_snapshot():
+    """Fetch users, administrators and password policy in one PowerShell call"""
+    output = command_runner.run_powershell(ACCOUNT_SNAPSHOT_SCRIPT, check=True).stdout
+    data = json.loads(output)
+    snapshot = {
+        'users': _as_list(data.get('Users')),
+        'admins': _as_list(data.get('Admins')),
+        'policy': data.get('Policy') or '',
+        'errors': data.get('Errors') or {},
+    }
+    for section, error in snapshot['errors'].items():
+        logger.warning("Account snapshot section %s failed: %s", section, error)
+    return snapshot
+
+def list_user_accounts(snapshot):
     """List all local user accounts on the system"""
-    try:
-        output = subprocess.check_output(
-            ['powershell', '-command', 'Get-LocalUser | Select-Object Name,Enabled,LastLogon | Format-Table -HideTableHeaders'],
-            text=True
-        )
-        users = []
-        for line in output.splitlines():
-            if line.strip():
-                parts = re.split(r'\s{2,}', line.strip())
-                if len(parts) >= 2:
-                    users.append({
-                        'name': parts[0],
-                        'enabled': parts[1],
-                        'last_logon': parts[2] if len(parts) > 2 else 'Never'
-                    })
-        return users
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error listing user accounts: {e}")
-        return f"Error listing user accounts: {e}"
-
-def check_password_policies():
+    return [UserAccount(
+        user.get('Name'),
+        user.get('Enabled'),
+        user.get('LastLogon') or 'Never',
+        user.get('PasswordExpires'),
+        user.get('PasswordLastSet'),
+        user.get('PasswordRequired'),
+        user.get('Sid'),
+    ) for user in snapshot['users']]
+
+def check_password_policies(snapshot):
     """Check password policies and account status"""
-    try:
-        # Get password policy
-        policy = subprocess.check_output(
-            ['powershell', '-command', 'net accounts'],
-            text=True
-        )
-        
-        # Get users with password never expires
-        never_expires = subprocess.check_output(
-            ['powershell', '-command', 'Get-LocalUser | Where-Object {$_.PasswordNeverExpires -eq $true} | Select-Object Name'],
-            text=True
-        )
-        
-        # Get disabled accounts
-        disabled_accounts = subprocess.check_output(
-            ['powershell', '-command', 'Get-LocalUser | Where-Object {$_.Enabled -eq $false} | Select-Object Name'],
-            text=True
-        )
-        
-        return policy, never_expires, disabled_accounts
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error checking password policies: {e}")
-        return f"Error checking password policies: {e}"
-
-def list_admin_users():
+    users = list_user_accounts(snapshot)
+    # Get-LocalUser reports no PasswordExpires date when the password never expires
+    never_expires = [user.name for user in users if not user.password_expires]
+    disabled_accounts = [user.name for user in users if user.enabled is False]
+    return PasswordStatus(snapshot['policy'], never_expires, disabled_accounts)
+
+def list_admin_users(snapshot):
     """List users with administrative privileges"""
-    try:
-        admins = subprocess.check_output(
-            ['powershell', '-command', 'Get-LocalGroupMember -Group "Administrators" | Select-Object Name,PrincipalSource | Format-Table -HideTableHeaders'],
-            text=True
-        )
-        admin_list = []
-        for line in admins.splitlines():
-            if line.strip():
-                parts = re.split(r'\s{2,}', line.strip())
-                if len(parts) >= 2:
-                    admin_list.append({
-                        'name': parts[0],
-                        'source': parts[1]
-                    })
-        return admin_list
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error listing admin users: {e}")
-        return f"Error listing admin users: {e}"
+    return [AdminMember(admin.get('Name'), admin.get('Source'), admin.get('ObjectClass'))
+            for admin in snapshot['admins']]
 
 def review_account_history():
-    """Review recent account login history"""
-    try:
-        # Get last login times (limited to 10 for brevity)
-        history = subprocess.check_output(
-            ['powershell', '-command', 'Get-EventLog -LogName Security -InstanceId 4624 -Newest 10 | Select-Object TimeGenerated,Message | Format-Table -Wrap -AutoSize'],
-            text=True
-        )
-        return history
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error reviewing account history: {e}")
-        return f"Error reviewing account history: {e}"
+    """Logons, failed logons and logoffs of the configured window, per user,
+    logon type and source address (see login_history)"""
+    return login_history.review_login_history()
+
+def add_arguments(parser):
+    """Command line options of this audit (see audit_registry)"""
+    parser.add_argument('--logon-window', type=float, default=login_history.DEFAULT_WINDOW_HOURS, metavar='HOURS',
+                        help='How far back the account audit reads logon events (default: %(default)s)')
+    parser.add_argument('--logon-max-events', type=int, metavar='N',
+                        help='Read at most N logon events, newest first')
+    parser.add_argument('--logon-fixture', metavar='FILE',
+                        help='Read logon events from a wevtutil XML or JSON export instead of the Security log')
+
+def configure_from_args(args):
+    login_history.configure(args.logon_window, args.logon_max_events, args.logon_fixture)
 
 def audit_user_accounts():
-    """Run all audit functions and display results"""
-    logging.info("=== Windows User Account Audit ===")
-    
-    logging.info("\n[1] User Accounts:")
-    users = list_user_accounts()
-    if isinstance(users, list):
-        for user in users:
-            logging.info(f"User: {user['name']}, Enabled: {user['enabled']}, Last Logon: {user['last_logon']}")
-    else:
-        logging.error(users)
-    
-    logging.info("\n[2] Password Policies and Account Status:")
-    policy, never_expires, disabled_accounts = check_password_policies()
-    logging.info("Password Policies:")
-    logging.info(policy)
-    logging.info("\nUsers with Password Never Expires:")
-    logging.info(never_expires)
-    logging.info("\nDisabled Accounts:")
-    logging.info(disabled_accounts)
-    
-    logging.info("\n[3] Users with Administrative Privileges:")
-    admins = list_admin_users()
-    if isinstance(admins, list):
-        for admin in admins:
-            logging.info(f"Admin: {admin['name']} (Source: {admin['source']})")
-    else:
-        logging.error(admins)
-    
-    logging.info("\n[4] Recent Account Login History (last 10 events):")
-    history = review_account_history()
-    logging.info(history)
+    """Run all audit functions, log the results and return them as records"""
+    logger.info("=== Windows User Account Audit ===")
+
+    try:
+        snapshot = collect_account_snapshot()
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError) as e:
+        logger.error("Error collecting user account data: %s", e)
+        return []
+
+    records = []
+
+    logger.info("\n[1] User Accounts:")
+    users = list_user_accounts(snapshot)
+    for user in users:
+        logger.info("User: %s, Enabled: %s, Last Logon: %s", user.name, user.enabled, user.last_logon)
+    records.extend(users)
+
+    logger.info("\n[2] Password Policies and Account Status:")
+    status = check_password_policies(snapshot)
+    policy, never_expires, disabled_accounts = status
+    records.append(status)
+    logger.info("Password Policies:")
+    logger.info("%s", policy)
+    logger.info("\nUsers with Password Never Expires:")
+    logger.info("%s", ", ".join(never_expires) or "None")
+    logger.info("\nDisabled Accounts:")
+    logger.info("%s", ", ".join(disabled_accounts) or "None")
+
+    logger.info("\n[3] Users with Administrative Privileges:")
+    admins = list_admin_users(snapshot)
+    for admin in admins:
+        logger.info("Admin: %s (Source: %s)", admin.name, admin.source)
+    records.extend(admins)
+
+    logger.info("\n[4] Recent Account Login History:")
+    try:
+        records.extend(review_account_history())
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError, ParseError) as e:
+        logger.error("Error reviewing login history: %s", e)
+
+    return records
 
 if __name__ == "__main__":
-    audit_user_accounts()
\ No newline at end of file
+    setup_logging(console=True)
+    audit_user_accounts()
@@ -0,0 +1,38 @@
+import re
+from typing import Dict, Iterable, Iterator, List
+
+def iter_table(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """Parse the fixed-width table printed by `wmic <alias> get <columns>`
+    one row at a time, e.g. straight from command_runner.iter_lines.
+
+    Column boundaries come from the positions of the names in the header
+    line; values are sliced at those offsets so embedded spaces survive.
+    """
+    columns = None
+    for line in lines:
+        if not line.strip():
+            continue
+        if columns is None:
+            names = [(match.group(), match.start()) for match in re.finditer(r"\S+", line)]
+            columns = [(name, start, names[i + 1][1] if i + 1 < len(names) else None)
+                       for i, (name, start) in enumerate(names)]
+            continue
+        yield {name: line[start:end].strip() for name, start, end in columns}
+
+def parse_table(output: str) -> List[Dict[str, str]]:
+    """iter_table over a captured output string"""
+    return list(iter_table(output.splitlines()))
+
+def iter_list(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Group list-format output (`wmic ... /format:list`, PowerShell
+    Format-List) into blocks of non-empty lines, one block per object"""
+    block = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+sys.path.insert(0, ROOT)
+
+from modules import command_runner
+
+def fixture_text(name):
+    """A recorded command output from tests/fixtures"""
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+def fixture_lines(name):
+    return fixture_text(name).splitlines()
+
+@pytest.fixture
+def replay(tmp_path):
+    """Put the command runner in replay mode over an empty fixture directory.
+
+    Returns record(args, name, returncode=0, stderr=""), which saves the
+    recorded output `name` as the result of `args`, as a record run would.
+    """
+    command_runner.configure(command_runner.MODE_REPLAY, str(tmp_path))
+
+    def record(args, name, returncode=0, stderr=""):
+        with open(command_runner._fixture_path(args), "w", encoding="utf-8") as f:
+            json.dump({"args": list(args), "returncode": returncode,
+                       "stdout": fixture_text(name) if name else "", "stderr": stderr}, f)
+
+    yield record
+    command_runner.configure()
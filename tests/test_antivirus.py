@@ -0,0 +1,95 @@
+from collections import Counter
+
+from conftest import fixture_text
+from modules import antivirus_check, command_runner
+from modules.antivirus_check import ProductState, decode_product_state, decode_product_states
+
+def test_decode_product_state():
+    # Defender: real-time protection on, signatures up to date
+    assert decode_product_state(397568) == ProductState(397568, ("autoupdate_settings", "antivirus"), "on",
+                                                        "up_to_date")
+    assert decode_product_state(0x062110) == ProductState(0x062110, ("autoupdate_settings", "antivirus"),
+                                                          "snoozed", "out_of_date")
+    assert decode_product_state(262144) == ProductState(262144, ("antivirus",), "off", "up_to_date")
+    assert decode_product_state(69632).providers == ("firewall",)
+
+def test_product_state_tables():
+    assert len(antivirus_check.PROVIDER_TABLE) == 256
+    assert antivirus_check.PROVIDER_TABLE[0] == ()
+    assert antivirus_check.PROVIDER_TABLE[0x7F] == tuple(name for _, name in antivirus_check.PROVIDER_FLAGS)
+    assert antivirus_check.REALTIME_TABLE[:4] == ["off", "on", "snoozed", "expired"]
+    assert antivirus_check.REALTIME_TABLE[0xF] == "unknown (0xf)"
+    assert len(antivirus_check.SIGNATURE_TABLE) == 16 and antivirus_check.SIGNATURE_TABLE[2] == "unknown (0x2)"
+
+def test_decode_product_states_matches_single_decode():
+    values = [397568, None, 393488, 397568, 266240, None]
+    assert decode_product_states(values) == [None if value is None else decode_product_state(value)
+                                             for value in values]
+
+def test_parse_security_center_products():
+    products = antivirus_check.parse_antivirus_output(fixture_text("security_center_products.txt"))
+    assert [(product.category, product.display_name) for product in products] == [
+        ("antivirus", "Windows Defender"), ("antispyware", "Windows Defender"),
+        ("firewall", "Vendor Firewall"), ("antivirus", "Stale Vendor AV")]
+    defender, antispyware, firewall, stale = products
+    assert (defender.product_state, defender.realtime, defender.signatures) == (397568, "on", "up_to_date")
+    assert defender.timestamp == "Mon, 16 Oct 2026 10:00:00 GMT"
+    # Format-List wraps long values onto indented lines
+    assert antispyware.path == ("C:\\Program Files\\Some Very Long Vendor Name\\And An Even Longer Product "
+                                "Folder\\agent.exe")
+    assert antispyware.signatures == "out_of_date"
+    assert (antispyware.realtime, antispyware.timestamp) == ("off", "")
+    # Firewalls have no signatures
+    assert (firewall.providers, firewall.realtime, firewall.signatures) == (("firewall",), "on", "")
+    # An empty productState is left undecoded, not read as the next field
+    assert (stale.product_state, stale.providers, stale.realtime, stale.timestamp) == (None, (), "", "")
+    assert stale.path == "C:\\Program Files\\Stale\\av.exe"
+
+def test_parse_wmic_list_output():
+    output = "\r\n\r\ndisplayName=Other AV\r\nproductState=266256\r\n\r\n"
+    [product] = antivirus_check.parse_antivirus_output(output, "antispyware")
+    assert (product.category, product.display_name, product.signatures) == ("antispyware", "Other AV", "out_of_date")
+
+def test_aggregate_product_states():
+    records = [
+        {"type": "SecurityProduct", "category": "antivirus", "display_name": "Windows Defender",
+         "product_state": 397568},
+        {"type": "SecurityProduct", "category": "antivirus", "display_name": "Windows Defender",
+         "product_state": 397568},
+        {"type": "SecurityProduct", "category": "firewall", "display_name": "Vendor Firewall",
+         "product_state": 266256},
+        {"type": "SecurityProduct", "category": "antivirus", "display_name": "Stale Vendor AV",
+         "product_state": None},
+        {"type": "AntivirusProduct", "display_name": "Old Report AV", "fields": {"productState": "393488"}},
+        {"type": "ServiceRecord", "name": "WinDefend"},
+    ]
+    assert antivirus_check.aggregate_product_states(records) == Counter({
+        ("antivirus", "Windows Defender", "on", "up_to_date"): 2,
+        ("firewall", "Vendor Firewall", "on", ""): 1,
+        ("antivirus", "Stale Vendor AV", "undecoded", ""): 1,
+        ("antivirus", "Old Report AV", "off", "out_of_date"): 1,
+    })
+
+def test_parse_defender_health():
+    health = antivirus_check.parse_defender_health(fixture_text("defender_status.json"))
+    assert health.running_mode == "Normal"
+    assert (health.realtime_protection, health.tamper_protected) == (False, False)
+    assert (health.signature_age_days, health.signature_version) == (12, "1.399.1")
+    assert health.exclusions == 3 and health.security_center == "Running"
+    assert health.findings == ("realtime_disabled", "tamper_protection_off", "signatures_stale", "broad_exclusion")
+
+def test_parse_defender_health_without_defender_or_admin():
+    assert antivirus_check.parse_defender_health('{"Status": null, "Preference": null, "SecurityCenter": ""}') is None
+    health = antivirus_check.parse_defender_health(
+        '{"Status": {"AMRunningMode": "Normal", "RealTimeProtectionEnabled": true,'
+        ' "AntivirusSignatureAge": 4294967295},'
+        ' "Preference": {"ExclusionPath": ["N/A: Must be an administrator to view exclusions"], "MAPSReporting": 0},'
+        ' "SecurityCenter": "Stopped"}')
+    assert health.exclusions is None and health.signature_age_days is None
+    assert health.findings == ("signatures_stale", "cloud_protection_off", "security_center_stopped")
+
+def test_security_center_checks_replay_recorded_outputs(replay):
+    replay(command_runner.powershell_args(antivirus_check.PRODUCTS_SCRIPT), "security_center_products.txt")
+    replay(command_runner.powershell_args(antivirus_check.DEFENDER_SCRIPT), "defender_status.json")
+    assert len(antivirus_check.get_antivirus_details()) == 4
+    assert antivirus_check.check_windows_defender().signature_age_days == 12
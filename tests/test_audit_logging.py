@@ -0,0 +1,151 @@
+import gzip
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from conftest import ROOT
+from modules import audit_logging
+from modules.audit_logging import BatchingFileHandler
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    audit_logging.shutdown_logging()
+    root.handlers, root.level = handlers, level
+
+def handler(path, **options):
+    file_handler = BatchingFileHandler(str(path), **options)
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    return file_handler
+
+def log(file_handler, *messages):
+    for message in messages:
+        file_handler.handle(logging.makeLogRecord({"msg": message, "levelno": logging.INFO}))
+    file_handler.flush()
+
+def read(path):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+def test_pipeline_writes_every_thread_in_jsonl(tmp_path, root_logger):
+    path = tmp_path / "audit.jsonl"
+    audit_logging.setup_logging(str(path), "jsonl")
+
+    def audit(n):
+        for i in range(200):
+            logging.getLogger("modules.netstat").info("audit %d line %d", n, i)
+
+    threads = [threading.Thread(target=audit, args=(n,), name=f"audit-{n}") for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        raise OSError("access denied")
+    except OSError:
+        logging.getLogger("main").error("Audit failed", exc_info=True)
+    logging.getLogger("main").debug("below the level")
+    audit_logging.shutdown_logging()
+
+    entries = [json.loads(line) for line in read(path)]
+    assert len(entries) == 801
+    for n in range(4):
+        mine = [entry["message"] for entry in entries if entry["thread"] == f"audit-{n}"]
+        # Each thread's records keep their order
+        assert mine == [f"audit {n} line {i}" for i in range(200)]
+    assert entries[0]["logger"] == "modules.netstat" and entries[0]["level"] == "INFO"
+    assert entries[-1]["level"] == "ERROR" and "OSError: access denied" in entries[-1]["exception"]
+
+def test_pipeline_text_format(tmp_path, root_logger):
+    path = tmp_path / "audit.log"
+    audit_logging.setup_logging(str(path))
+    logging.getLogger("modules.services").warning("Service %s is unquoted", "VendorAgent")
+    try:
+        raise OSError("access denied")
+    except OSError:
+        logging.getLogger("main").error("Audit failed", exc_info=True)
+    audit_logging.shutdown_logging()
+    # Safe to call twice
+    audit_logging.shutdown_logging()
+    lines = read(path)
+    assert lines[0].endswith(" - WARNING - Service VendorAgent is unquoted")
+    assert lines[1].endswith(" - ERROR - Audit failed")
+    assert lines[2] == "Traceback (most recent call last):" and lines[-1] == "OSError: access denied"
+    with pytest.raises(ValueError):
+        audit_logging.setup_logging(str(path), "xml")
+
+def test_handler_writes_on_flush(tmp_path):
+    path = tmp_path / "audit.log"
+    file_handler = handler(path)
+    file_handler.handle(logging.makeLogRecord({"msg": "pending", "levelno": logging.INFO}))
+    assert path.read_text(encoding="utf-8") == ""
+    file_handler.flush()
+    assert read(path) == ["pending"]
+    file_handler.close()
+
+def test_rotation_counts_bytes_not_characters(tmp_path):
+    path = tmp_path / "audit.log"
+    file_handler = handler(path, max_bytes=100, backup_count=2)
+    # 61 bytes per line but 31 characters
+    log(file_handler, "é" * 30)
+    log(file_handler, "ü" * 30)
+    assert read(rotated(path, 1)) == ["é" * 30, "ü" * 30]
+    log(file_handler, "first")
+    file_handler.close()
+    assert read(path) == ["first"]
+
+def rotated(path, index):
+    return audit_logging.rotated_path(str(path), index)
+
+def test_rotation_keeps_backup_count_files(tmp_path):
+    path = tmp_path / "audit.log"
+    file_handler = handler(path, max_bytes=5, backup_count=2)
+    for batch in range(4):
+        log(file_handler, f"batch {batch}")
+    file_handler.close()
+    assert read(path) == []
+    assert (read(rotated(path, 1)), read(rotated(path, 2))) == (["batch 3"], ["batch 2"])
+    assert not os.path.exists(rotated(path, 3))
+
+def test_gzip_rotation_uses_the_compressed_size(tmp_path):
+    path = tmp_path / "audit.log"
+    file_handler = handler(path, compress=True, max_bytes=2000)
+    assert file_handler.path == str(path) + ".gz"
+    # 50 kB of repetitive text compresses far below the limit
+    for batch in range(50):
+        log(file_handler, "a" * 1000)
+    assert not os.path.exists(rotated(file_handler.path, 1))
+    log(file_handler, os.urandom(2000).hex())
+    assert rotated(file_handler.path, 1) == str(tmp_path / "audit.log.1.gz")
+    assert len(read(rotated(file_handler.path, 1))) == 51
+    file_handler.close()
+
+def test_clear_logs_removes_the_log_and_its_backups(tmp_path):
+    path = tmp_path / "audit.log"
+    for name in ("audit.log.gz", "audit.log.1.gz", "audit.log.2.gz", "audit.log.5.gz", "audit.log"):
+        (tmp_path / name).write_text("", encoding="utf-8")
+    removed = audit_logging.clear_logs(str(path), compress=True, backup_count=3)
+    assert removed == [str(tmp_path / "audit.log.gz"), str(tmp_path / "audit.log.1.gz"),
+                       str(tmp_path / "audit.log.2.gz")]
+    # Beyond the backups kept, and the uncompressed log, are left alone
+    assert sorted(os.listdir(tmp_path)) == ["audit.log", "audit.log.5.gz"]
+    assert audit_logging.clear_logs(str(tmp_path / "missing.log")) == []
+
+def test_clear_logs_option_uses_the_configured_log(tmp_path):
+    (tmp_path / "run.log").write_text("old run\n", encoding="utf-8")
+    (tmp_path / "run.log.1").write_text("older run\n", encoding="utf-8")
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--clear-logs",
+                             "--log-file", "run.log", "--log-backups", "1"],
+                            cwd=str(tmp_path), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith("Removed ")
+    # Nothing audited, so no new log either
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,84 @@
+import logging
+from typing import NamedTuple
+
+import main
+from modules.baseline import BaselineStore, diff_records
+from modules.report import AuditReport
+
+logger = logging.getLogger("tests.baseline")
+
+class ServiceRecord(NamedTuple):
+    name: str
+    state: str
+
+def audit_returning(records):
+    def audit():
+        return list(records)
+    return audit
+
+def failing_audit():
+    # What every audit does on a WMI/PowerShell failure: log and return nothing
+    logger.error("Failed to audit services: timed out")
+    return []
+
+def run(store, audit):
+    return main.run_audits([("services", audit)], baseline=store).sections["services"]
+
+def test_diff_records_reports_added_removed_and_changed():
+    previous = [{"type": "ServiceRecord", "name": "a", "state": "Running"},
+                {"type": "ServiceRecord", "name": "b", "state": "Running"}]
+    current = [{"type": "ServiceRecord", "name": "a", "state": "Stopped"},
+               {"type": "ServiceRecord", "name": "c", "state": "Running"}]
+    changes = {(change.change, tuple(change.key)) for change in diff_records(previous, current)}
+    assert changes == {("changed", ("a",)), ("added", ("c",)), ("removed", ("b",))}
+
+def test_unchanged_section_reports_no_changes(tmp_path):
+    store = BaselineStore(str(tmp_path / "baseline.db"))
+    records = [ServiceRecord("a", "Running"), ServiceRecord("b", "Running")]
+    run(store, audit_returning(records))
+    assert run(store, audit_returning(records)).records == []
+    changed = run(store, audit_returning([ServiceRecord("a", "Stopped"), ServiceRecord("b", "Running")]))
+    assert [(change.change, change.key) for change in changed.records] == [("changed", ["a"])]
+    store.close()
+
+def test_failed_section_leaves_baseline_untouched(tmp_path):
+    store = BaselineStore(str(tmp_path / "baseline.db"))
+    records = [ServiceRecord("a", "Running"), ServiceRecord("b", "Running")]
+    run(store, audit_returning(records))
+    stored = store.load(AuditReport().host, "services")
+
+    failed = run(store, failing_audit)
+    # Reported as returned, not as every record removed
+    assert failed.records == []
+    assert store.load(AuditReport().host, "services") == stored
+
+    # The next good run compares against the untouched baseline
+    assert run(store, audit_returning(records)).records == []
+    store.close()
+
+def firewall_rule(**fields):
+    rule = {"type": "FirewallRule", "name": "Core Networking - Teredo (UDP-In)", "enabled": True,
+            "direction": "In", "profiles": ["Domain", "Private", "Public"], "protocol": "UDP",
+            "local_port": "Teredo", "remote_port": "Any", "local_ip": "Any", "remote_ip": "Any",
+            "action": "Allow", "grouping": "Core Networking", "program": "%SystemRoot%\\system32\\svchost.exe"}
+    rule.update(fields)
+    return rule
+
+def test_diff_records_with_colliding_keys():
+    # Built-in rules share names and differ in profile, scope or action
+    private = firewall_rule(profiles=["Private"], remote_ip="LocalSubnet")
+    public = firewall_rule(profiles=["Public"])
+    by_port = [firewall_rule(remote_port="67"), firewall_rule(remote_port="68")]
+    previous = [private, public] + by_port
+    assert diff_records(previous, list(previous)) == []
+
+    public_blocked = firewall_rule(profiles=["Public"], action="Block")
+    changes = diff_records(previous, [private, public_blocked] + by_port)
+    assert [(change.change, change.record, change.previous) for change in changes] == [
+        ("added", public_blocked, None), ("removed", None, public)]
+
+    # Same key even so: compared as a multiset, so one change is still seen
+    disabled = dict(by_port[1], enabled=False)
+    changes = diff_records(previous, [private, public, by_port[0], disabled])
+    assert [(change.change, change.record, change.previous) for change in changes] == [
+        ("changed", disabled, by_port[1])]
@@ -0,0 +1,60 @@
+import subprocess
+
+import pytest
+
+from conftest import fixture_lines, fixture_text
+from modules import command_runner
+
+NETSTAT_ARGS = ["netstat", "-ano"]
+
+def test_replay_serves_recorded_output(replay):
+    replay(NETSTAT_ARGS, "netstat_ano.txt")
+    result = command_runner.run(NETSTAT_ARGS)
+    assert result.returncode == 0
+    assert result.stdout == fixture_text("netstat_ano.txt")
+
+def test_replay_streams_recorded_lines(replay):
+    replay(NETSTAT_ARGS, "netstat_ano.txt")
+    assert list(command_runner.iter_lines(NETSTAT_ARGS)) == fixture_lines("netstat_ano.txt")
+
+def test_replay_caches_results_within_a_run(replay):
+    replay(NETSTAT_ARGS, "netstat_ano.txt")
+    command_runner.run(NETSTAT_ARGS)
+    command_runner.run(NETSTAT_ARGS)
+    assert [timing.cached for timing in command_runner.get_timings()] == [False, True]
+
+def test_replay_without_recording_raises(replay):
+    with pytest.raises(FileNotFoundError):
+        command_runner.run(NETSTAT_ARGS)
+    with pytest.raises(FileNotFoundError):
+        list(command_runner.iter_lines(NETSTAT_ARGS))
+
+def test_replay_is_keyed_by_the_full_command_line(replay):
+    replay(NETSTAT_ARGS, "netstat_ano.txt")
+    with pytest.raises(FileNotFoundError):
+        command_runner.run(["netstat", "-an"])
+
+def test_replay_recorded_failure(replay):
+    replay(NETSTAT_ARGS, None, returncode=1, stderr="The requested operation requires elevation.")
+    assert command_runner.run(NETSTAT_ARGS).returncode == 1
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        command_runner.run(NETSTAT_ARGS, check=True)
+    assert excinfo.value.stderr == "The requested operation requires elevation."
+    with pytest.raises(subprocess.CalledProcessError):
+        list(command_runner.iter_lines(NETSTAT_ARGS, check=True))
+
+def test_replay_output_limit(replay):
+    replay(NETSTAT_ARGS, "netstat_ano.txt")
+    with pytest.raises(command_runner.OutputLimitExceeded):
+        list(command_runner.iter_lines(NETSTAT_ARGS, max_bytes=100))
+
+def test_which_finds_recorded_programs(replay):
+    replay(["autoruns", "-c"], "autoruns_c.csv")
+    assert command_runner.which("autoruns") == "autoruns"
+    assert command_runner.which("psinfo") is None
+
+def test_powershell_scripts_replay_by_script(replay):
+    replay(command_runner.powershell_args("Get-Date"), None)
+    assert command_runner.run_powershell("Get-Date").returncode == 0
+    with pytest.raises(FileNotFoundError):
+        command_runner.run_powershell("Get-Date -Format o")
@@ -0,0 +1,83 @@
+import random
+
+from modules import firewall_check
+from modules.firewall_check import FirewallRule, FirewallRuleSummary
+from modules.firewall_index import IntervalTree, RuleFinding, RuleIndex
+
+RULES_ARGS = ["netsh", "advfirewall", "firewall", "show", "rule", "name=all", "verbose"]
+
+def test_rule_section_reports_summary_and_findings_only(replay):
+    replay(RULES_ARGS, "netsh_rules.txt")
+    firewall_check.configure_rule_records()
+    records = firewall_check.list_firewall_rules()
+    assert records[0] == FirewallRuleSummary(3, 2, {"In": 2, "Out": 1}, {"Allow": 2, "Block": 1},
+                                             {"Domain": 2, "Private": 2, "Public": 2})
+    assert not any(isinstance(record, FirewallRule) for record in records)
+
+def test_rule_records_are_opt_in(replay):
+    replay(RULES_ARGS, "netsh_rules.txt")
+    firewall_check.configure_rule_records(True)
+    try:
+        records = firewall_check.list_firewall_rules()
+    finally:
+        firewall_check.configure_rule_records()
+    assert [record.name for record in records if isinstance(record, FirewallRule)] == [
+        "Remote Desktop - User Mode (TCP-In)", "File and Printer Sharing (SMB-In)", "Block Telnet"]
+
+def rule(name, **fields):
+    values = dict(name=name, enabled=True, direction="In", profiles=("Domain", "Private", "Public"),
+                  protocol="TCP", local_port="Any", remote_port="Any", local_ip="Any", remote_ip="Any",
+                  action="Allow", grouping="", program="Any")
+    values.update(fields)
+    return FirewallRule(**values)
+
+RULES = [
+    rule("SMB In", local_port="445", profiles=("Public",), remote_ip="LocalSubnet"),
+    rule("Block SMB range", local_port="400-500", profiles=("Public",), action="Block"),
+    rule("App ports", local_port="3000-3100", program="C:\\App\\app.exe"),
+    rule("Block some app ports", local_port="3050-3200", action="Block"),
+    rule("Web", local_port="80,443", profiles=("Domain",)),
+    rule("Web copy", local_port="80,443", profiles=("Domain",)),
+    rule("Wide open", protocol="Any"),
+    rule("Old wide open", protocol="Any", enabled=False),
+    rule("Dynamic", local_port="1000-2000", profiles=("Private",)),
+    rule("Dynamic overlap", local_port="1500-2500", profiles=("Private",)),
+    rule("Single", local_port="1800", profiles=("Private",)),
+    rule("Ping", protocol="ICMPv4"),
+]
+
+def test_shadowed_rules():
+    index = RuleIndex(RULES)
+    # 445 lies inside the blocked 400-500 (the block's remote address Any covers LocalSubnet);
+    # 3000-3100 is only partly blocked
+    assert index.shadowed() == [RuleFinding("shadowed", "SMB In", "Block SMB range",
+                                            "all matching traffic is blocked by another rule")]
+
+def test_duplicate_rules():
+    assert RuleIndex(RULES).duplicates() == [RuleFinding("duplicate", "Web copy", "Web",
+                                                         "same match criteria and action")]
+
+def test_overly_broad_rules():
+    # Disabled rules and ICMP are left out
+    assert [finding.rule for finding in RuleIndex(RULES).overly_broad()] == ["Wide open"]
+
+def test_exposing_queries_overlapping_ranges():
+    index = RuleIndex(RULES)
+    names = lambda port, **query: sorted(found.name for found in index.exposing(port, **query))
+    assert names(1800, profile="Private") == ["Dynamic", "Dynamic overlap", "Single", "Wide open"]
+    assert names(2200, profile="Private") == ["Dynamic overlap", "Wide open"]
+    assert names(2501, profile="Private") == ["Wide open"]
+    assert names(1800, profile="Public") == ["Wide open"]
+    assert names(443, profile="Domain") == ["Web", "Web copy", "Wide open"]
+    assert names(445, profile="Public", action="Block") == ["Block SMB range"]
+    assert names(53, protocol="UDP", profile="Domain") == ["Wide open"]
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    intervals = []
+    for i in range(300):
+        lo = rng.randrange(0, 1000)
+        intervals.append((lo, lo + rng.randrange(0, 80), i))
+    tree = IntervalTree(intervals)
+    for point in range(-5, 1100, 3):
+        assert sorted(tree.stab(point)) == [i for lo, hi, i in intervals if lo <= point <= hi]
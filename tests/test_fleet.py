@@ -0,0 +1,132 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+from modules import fleet, patch_management
+from modules.fleet import FleetRunner, Host, TransportError
+
+class ScriptedTransport:
+    """Fails each host the given number of times, then returns its lines"""
+
+    def __init__(self, failures, lines):
+        self.failures = dict(failures)
+        self.lines = lines
+        self.calls = []
+
+    def run(self, host, audit_args, timeout):
+        self.calls.append((host.name, audit_args))
+        if self.failures.get(host.name, 0) > 0:
+            self.failures[host.name] -= 1
+            raise TransportError("connection refused")
+        return self.lines[host.name]
+
+@pytest.fixture
+def scripted(monkeypatch):
+    def install(failures, lines):
+        transport = ScriptedTransport(failures, lines)
+        monkeypatch.setitem(fleet.TRANSPORTS, "scripted", lambda options: transport)
+        return transport
+    return install
+
+def host(name, **options):
+    return Host(name, name, options.pop("transport", "scripted"), options)
+
+def test_parse_inventory():
+    hosts = fleet.parse_inventory([
+        "# lab machines\n",
+        "ws01\n",
+        "ws02 address=10.0.0.2 transport=ssh user=audit jobs=4  # second floor\n",
+        "ws01 address=10.0.0.9\n",
+    ])
+    # A host listed twice is audited once
+    assert hosts == [Host("ws01", "ws01", "local", {}),
+                     Host("ws02", "10.0.0.2", "ssh", {"user": "audit", "jobs": "4"})]
+    assert fleet.parse_inventory(['[{"name": "db1", "port": 2222}]'], "ssh") == [
+        Host("db1", "db1", "ssh", {"port": "2222"})]
+    with pytest.raises(ValueError, match=r"hosts\.txt:2: expected key=value .* got 'ssh'"):
+        fleet.parse_inventory(["ws01\n", "ws02 ssh\n"], source="hosts.txt")
+
+def test_runner_tags_records_and_counts_errors(scripted):
+    transport = scripted({}, {"ws01": [
+        '{"module": "services", "type": "ServiceRecord", "name": "Spooler"}',
+        "WARNING: stray console output",
+        '{"module": "patch_management", "type": "AuditError", "message": "timed out"}',
+    ]})
+    out = io.StringIO()
+    [result] = FleetRunner(["--service"], jobs=2, backoff=0).run([host("ws01", jobs="3")], out)
+    assert (result.target, result.status, result.attempts, result.records, result.errors) == ("ws01", "ok", 1, 1, 1)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(line["target"], line["type"]) for line in lines] == [
+        ("ws01", "ServiceRecord"), ("ws01", "AuditError"), ("ws01", "FleetHost")]
+    # jobs= in the inventory overrides the runner's
+    assert transport.calls == [("ws01", ["--service", "--jobs", "3", "--report", "-", "--report-format", "ndjson"])]
+
+def test_runner_retries_with_backoff(scripted, monkeypatch):
+    delays = []
+    monkeypatch.setattr(fleet.time, "sleep", delays.append)
+    monkeypatch.setattr(fleet.random, "uniform", lambda lo, hi: hi)
+    scripted({"flaky": 2, "down": 5}, {"flaky": ['{"type": "Hotfix", "hotfix_id": "KB1"}'], "down": []})
+    out = io.StringIO()
+    results = {result.target: result for result in
+               FleetRunner([], retries=2, backoff=1.0).run([host("flaky"), host("down")], out)}
+    assert (results["flaky"].status, results["flaky"].attempts, results["flaky"].records) == ("ok", 3, 1)
+    assert (results["down"].status, results["down"].attempts, results["down"].error) == \
+        ("failed", 3, "connection refused")
+    # Two retries per host, the second waiting twice as long
+    assert sorted(delays) == [1.0, 1.0, 2.0, 2.0]
+    # A failed host leaves only its FleetHost line
+    failed = [json.loads(line) for line in out.getvalue().splitlines() if '"down"' in line]
+    assert [line["type"] for line in failed] == ["FleetHost"]
+
+def test_backoff_delay_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(fleet.random, "uniform", lambda lo, hi: hi)
+    assert [fleet.backoff_delay(attempt, 2.0, 10.0) for attempt in (1, 2, 3, 4)] == [2.0, 4.0, 8.0, 10.0]
+
+def test_unknown_transport_fails_without_attempts():
+    [result] = FleetRunner([]).run([host("ws01", transport="winrm")], io.StringIO())
+    assert (result.status, result.attempts, result.error) == ("failed", 0, "Unknown transport: winrm")
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+def test_run_child_exit_status_and_report_lines():
+    # An empty report is not a failure
+    assert fleet._run_child(python("pass"), 30) == []
+    # Audit errors make main.py exit non-zero but the report is still there
+    assert fleet._run_child(python("import sys; print('{\"type\": \"Hotfix\"}'); sys.exit(1)"), 30) == [
+        '{"type": "Hotfix"}']
+    with pytest.raises(TransportError, match="Permission denied"):
+        fleet._run_child(python("import sys; print('banner'); sys.exit('Permission denied')"), 30)
+    with pytest.raises(TransportError, match="timed out"):
+        fleet._run_child(python("import time; time.sleep(5)"), 0.5)
+
+def test_local_transport_audits_replayed_hosts(replay, tmp_path):
+    replay(patch_management.QFE_ARGS, "wmic_qfe.txt")
+    hosts = [host("ws01", transport="local", replay=str(tmp_path)),
+             host("ws02", transport="local", replay=str(tmp_path / "missing"))]
+    out = io.StringIO()
+    runner = FleetRunner(["--patch"], retries=0, transport_options={"log_dir": str(tmp_path / "logs")})
+    results = {result.target: result for result in runner.run(hosts, out)}
+    assert (results["ws01"].status, results["ws01"].records, results["ws01"].errors) == ("ok", 3, 0)
+    # No recordings: the audit logs its error and the host reports no records
+    assert (results["ws02"].status, results["ws02"].records) == ("ok", 0)
+    hotfixes = [json.loads(line) for line in out.getvalue().splitlines() if '"Hotfix"' in line]
+    assert {(line["target"], line["hotfix_id"]) for line in hotfixes} == {
+        ("ws01", "KB5030211"), ("ws01", "KB5031356"), ("ws01", "KB890830")}
+    assert (tmp_path / "logs" / "ws01.log").exists()
+
+@pytest.mark.parametrize("option", ["--baseline", "--record"])
+def test_fleet_rejects_host_local_options(tmp_path, option):
+    inventory = tmp_path / "hosts.txt"
+    inventory.write_text("ws01\n", encoding="utf-8")
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--patch", "--fleet", str(inventory),
+                             option, str(tmp_path / "state")],
+                            cwd=str(tmp_path), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 2
+    assert f"error: --fleet cannot be combined with {option}" in result.stderr
+    assert sorted(os.listdir(tmp_path)) == ["hosts.txt"]
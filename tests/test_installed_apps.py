@@ -0,0 +1,57 @@
+import json
+import os
+
+from conftest import FIXTURES, fixture_lines
+from modules import installed_applications
+from modules.installed_applications import InstalledApp, RegistryExportSource, RegistrySource, UNINSTALL_KEYS
+
+def test_parse_reg_query():
+    entries = list(installed_applications.parse_reg_query(fixture_lines("reg_query_uninstall.txt")))
+    assert [values.get("DisplayName") for values in entries] == [
+        "7-Zip 23.01 (x64)", "Java 8 Update 351 (64-bit)", "Office 16 Click-to-Run Extensibility Component",
+        "Security Update for Windows (KB5031356)", None, "Git"]
+    seven_zip = entries[0]
+    assert seven_zip["UninstallString"] == '"C:\\Program Files\\7-Zip\\Uninstall.exe"'
+    assert (seven_zip["NoModify"], seven_zip["EstimatedSize"]) == (1, 0x15EE)
+    assert entries[1]["AuthorizedCDFPrefix"] == ""
+    # Value names may contain spaces
+    assert entries[5]["Inno Setup: App Path"] == "C:\\Program Files\\Git"
+
+def test_registry_source_replays_reg_query(replay):
+    hklm, wow64, hkcu = (installed_applications.reg_query_args(hive, path) for hive, path in UNINSTALL_KEYS)
+    replay(hklm, "reg_query_uninstall.txt")
+    # No WOW6432Node key on 32-bit Windows
+    replay(wow64, None, returncode=1,
+           stderr="ERROR: The system was unable to find the specified registry key or value.")
+    replay(hkcu, "reg_query_uninstall_user.txt")
+    apps = installed_applications.collect_installed_apps(RegistrySource())
+    # System components and child updates are skipped, Git (machine and user) merged
+    assert apps == [
+        InstalledApp("7-Zip 23.01 (x64)", "23.01", "Igor Pavlov", "", "registry"),
+        InstalledApp("Git", "2.42.0.2", "The Git Development Community", "20231002", "registry"),
+        InstalledApp("Java 8 Update 351 (64-bit)", "8.0.3510.10", "Oracle Corporation", "20230412", "registry"),
+        InstalledApp("Microsoft OneDrive", "23.226.1031.0001", "Microsoft Corporation", "", "registry"),
+    ]
+
+def test_registry_export_source_reads_reg_files(tmp_path):
+    expected = [
+        InstalledApp("7-Zip 23.01 (x64)", "23.01", "Igor Pavlov", "", "registry"),
+        InstalledApp('Quote "Tools" 2', "2.0", "", "20240105", "registry"),
+    ]
+    source = os.path.join(FIXTURES, "uninstall_export.reg")
+    assert installed_applications.collect_installed_apps(RegistryExportSource(source)) == expected
+    # regedit writes UTF-16 with a byte order mark
+    utf16 = tmp_path / "uninstall.reg"
+    with open(source, encoding="utf-8") as f:
+        utf16.write_text(f.read(), encoding="utf-16")
+    assert installed_applications.collect_installed_apps(RegistryExportSource(str(utf16))) == expected
+
+def test_registry_export_source_reads_json(tmp_path):
+    path = tmp_path / "apps.json"
+    path.write_text(json.dumps([
+        {"DisplayName": "Git", "DisplayVersion": "2.42.0.2", "InstallDate": 20231002},
+        {"DisplayName": "Hidden", "SystemComponent": 1},
+        {"DisplayVersion": "1.0"},
+    ]), encoding="utf-8")
+    assert installed_applications.collect_installed_apps(RegistryExportSource(str(path))) == [
+        InstalledApp("Git", "2.42.0.2", "", "20231002", "registry")]
@@ -0,0 +1,195 @@
+import subprocess
+
+import pytest
+
+from conftest import fixture_lines, fixture_text
+from modules import (command_runner, firewall_check, login_history, netstat, patch_management, scheduled_task,
+                     services, startup_review, system_info)
+from modules.patch_management import Hotfix, PatchFinding
+
+def test_parse_firewall_rules():
+    rules = list(firewall_check.parse_firewall_rules(fixture_lines("netsh_rules.txt")))
+    assert [rule.name for rule in rules] == ["Remote Desktop - User Mode (TCP-In)",
+                                             "File and Printer Sharing (SMB-In)", "Block Telnet"]
+    rdp, smb, telnet = rules
+    assert rdp.enabled and rdp.direction == "In" and rdp.profiles == ("Domain", "Private")
+    assert (rdp.protocol, rdp.local_port, rdp.action) == ("TCP", "3389", "Allow")
+    assert rdp.program == "%SystemRoot%\\system32\\svchost.exe"
+    assert not smb.enabled and smb.remote_ip == "LocalSubnet"
+    # Fields netsh leaves out fall back to Any
+    assert telnet.program == "Any" and telnet.remote_port == "23" and telnet.grouping == ""
+
+    summary, samples = firewall_check.summarize_rules(rules, sample_size=2)
+    assert (summary.total, summary.enabled) == (3, 2)
+    assert summary.by_direction == {"In": 2, "Out": 1}
+    assert summary.by_profile == {"Domain": 2, "Private": 2, "Public": 2}
+    assert samples == rules[:2]
+
+def test_parse_netstat():
+    sockets = list(netstat.parse_netstat(fixture_lines("netstat_ano.txt")))
+    assert len(sockets) == 9
+    assert sockets[0] == netstat.Socket("TCP", "0.0.0.0", 135, "0.0.0.0", 0, "LISTENING", 1040)
+    assert sockets[7].local_address == "::" and sockets[7].local_port == 22
+    # UDP lines have no state column
+    assert sockets[8] == netstat.Socket("UDP", "0.0.0.0", 443, "*", None, "", 77)
+    listening = sorted(port for port, socks in netstat.build_port_index(sockets).items()
+                       if any(netstat.is_listening(sock) for sock in socks))
+    assert listening == [22, 135, 443, 445, 2222, 3389]
+
+def test_parse_schtasks_csv():
+    tasks = {scheduled_task.task_path(task): task
+             for task in scheduled_task.parse_schtasks_csv(fixture_lines("schtasks_csv.txt"))}
+    # One record per task despite the per-folder headers and per-trigger rows
+    assert len(tasks) == 7
+    defrag = tasks["\\Microsoft\\Windows\\Defrag\\ScheduledDefrag"]
+    assert (defrag.folder, defrag.name, defrag.next_run) == ("\\Microsoft\\Windows\\Defrag", "ScheduledDefrag",
+                                                             "10/20/2026 1:00:00 AM")
+    assert (defrag.run_as, defrag.author, defrag.state) == ("SYSTEM", "Microsoft Corporation", "Enabled")
+    assert tasks["\\Cleanup"].status == "Disabled"
+    assert tasks["\\Backup"].last_result == "1"
+
+def test_schtasks_risk_indicators():
+    tasks = {scheduled_task.task_path(task): task
+             for task in scheduled_task.parse_schtasks_csv(fixture_lines("schtasks_csv.txt"))}
+    updater = tasks["\\Updater"]
+    assert updater.indicators == ("encoded_powershell", "hidden_window", "system_principal")
+    assert updater.risk == 6
+    assert tasks["\\Cleanup"].indicators == ("user_writable_path",)
+    assert tasks["\\Microsoft\\Windows\\Chkdsk\\ProactiveScan"].indicators == ("proxy_execution", "system_principal")
+    # -NoProfile is no abbreviation of -EncodedCommand, and -Environment is part of the command
+    assert tasks["\\Microsoft\\Windows\\Maintenance\\ProfileCleanup"].indicators == ()
+    # Options after -File are the script's, not PowerShell's
+    assert tasks["\\Backup"].indicators == ()
+
+def test_parse_service_csv():
+    records = {service.name: service for service in services.parse_service_csv(fixture_lines("services_csv.txt"))}
+    assert len(records) == 9
+    spooler = records["Spooler"]
+    assert (spooler.state, spooler.start_mode, spooler.account) == ("Running", "Auto", "LocalSystem")
+    assert spooler.display_name == "Print Spooler" and spooler.findings == ()
+    assert records["BITS"].delayed_start and records["BITS"].findings == ("auto_start_stopped",)
+    assert records["VendorAgent"].findings == ("unquoted_path",)
+    assert records["VendorUpdate"].findings == ()
+    assert records["HelperSvc"].findings == ("system_writable_path",)
+    assert records["BackupSvc"].findings == ("unquoted_path",) and records["BackupSvc"].exit_code == "1077"
+    # \SystemRoot and %SystemRoot% paths are inside Windows; drivers have no account
+    assert records["EventLog"].findings == () and records["disk"].findings == ()
+
+def test_parse_qfe():
+    hotfixes = list(patch_management.parse_qfe(fixture_lines("wmic_qfe.txt")))
+    assert hotfixes == [
+        Hotfix("KB5030211", "Update", "2023-09-13"),
+        Hotfix("KB5031356", "Security Update", "2023-10-11"),
+        # A FILETIME wmic could not format is kept as is
+        Hotfix("KB890830", "Hotfix", "01d9f4c2a1b3e000"),
+    ]
+
+def test_check_catalog_text_and_compiled(tmp_path):
+    text = tmp_path / "catalog.csv"
+    text.write_text("build,kb,superseded_by\n"
+                    "# 22631 cumulative updates\n"
+                    "22631,KB5030211,KB5031356\n"
+                    "22631,KB5031356\n"
+                    "22631,KB5032190\n"
+                    "19045,KB5031445\n", encoding="utf-8")
+    compiled = tmp_path / "catalog.kbc"
+    assert patch_management.compile_catalog(str(text), str(compiled)) == 4
+    hotfixes = list(patch_management.parse_qfe(fixture_lines("wmic_qfe.txt")))
+    for path in (text, compiled):
+        with patch_management.load_catalog(str(path)) as catalog:
+            assert catalog.has_build(22631) and not catalog.has_build(22000)
+            assert patch_management.check_catalog(hotfixes, catalog, 22631) == [
+                PatchFinding("KB5032190", "missing"),
+                PatchFinding("KB5030211", "superseded", "KB5031356"),
+            ]
+
+def test_parse_autoruns_csv():
+    entries = list(system_info.parse_autoruns_csv(fixture_lines("autoruns_c.csv")))
+    # The banner is skipped and the repeated task row dropped
+    assert [(entry.location, entry.entry) for entry in entries] == [
+        ("HKLM\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Run", "OneDrive"),
+        ("Task Scheduler", "\\Evil"),
+        ("HKLM\\System\\CurrentControlSet\\Services", "Spooler"),
+    ]
+    assert entries[0].launch_string == '"C:\\Program Files\\Microsoft OneDrive\\OneDrive.exe" /background'
+    assert entries[1].image_path == "c:\\users\\a\\appdata\\x.exe" and entries[1].company == ""
+
+def test_parse_event_xml():
+    events = list(login_history.parse_event_xml([fixture_text("wevtutil_security.xml")]))
+    assert [event.event_id for event in events] == [4634, 4625, 4625, 4624, 4624]
+    failure = events[1]
+    assert failure == login_history.LoginEvent("2026-10-16T17:59:40.1021888Z", 4625, "WS01\\administrator", 3,
+                                               "203.0.113.7", "", "", "0xc000006d")
+    # "-" stands for no address or workstation
+    assert events[4].user == "NT AUTHORITY\\SYSTEM" and events[4].source_ip == ""
+
+def test_parse_event_xml_in_small_chunks(monkeypatch):
+    monkeypatch.setattr(login_history, "XML_BATCH_CHARS", 500)
+    text = fixture_text("wevtutil_security.xml")
+    chunks = [text[i:i + 97] for i in range(0, len(text), 97)]
+    assert list(login_history.parse_event_xml(chunks)) == list(login_history.parse_event_xml([text]))
+
+def test_aggregate_matches_logoffs_to_logons():
+    summaries = login_history.aggregate(login_history.parse_event_xml([fixture_text("wevtutil_security.xml")]))
+    by_user = {summary.user: summary for summary in summaries}
+    alice = by_user["CONTOSO\\alice"]
+    # The logoff comes first (newest first) and is counted under the logon's source
+    assert (alice.source_ip, alice.successes, alice.logoffs) == ("10.20.0.15", 1, 1)
+    assert (alice.first_seen, alice.last_seen) == ("2026-10-16T09:02:03.5510320Z", "2026-10-16T18:05:12.4417350Z")
+    assert by_user["WS01\\administrator"].failures == 2
+
+def test_collectors_replay_recorded_outputs(replay):
+    replay(patch_management.QFE_ARGS, "wmic_qfe.txt")
+    replay(scheduled_task.SCHTASKS_CSV_ARGS, "schtasks_csv.txt")
+    replay(command_runner.powershell_args(services.SERVICE_SCRIPT), "services_csv.txt")
+    replay(login_history.wevtutil_args(), "wevtutil_security.xml")
+    scheduled_task.configure_source("csv")
+    assert len(patch_management.collect_hotfixes()) == 3
+    assert len(scheduled_task.collect_tasks()) == 7
+    assert len(services.collect_services()) == 9
+    login_history.configure()
+    assert len(list(login_history.collect_events())) == 5
+
+def test_collect_autoruns_marks_or_drops_startup_entries(replay):
+    replay(["autoruns", "-c"], "autoruns_c.csv")
+    replay(startup_review.STARTUP_ARGS, "wmic_startup.txt")
+    entries, duplicates = system_info.collect_autoruns(dedupe=False)
+    assert duplicates == 1 and len(entries) == 3
+    assert [entry.entry for entry in entries if entry.in_startup] == ["OneDrive"]
+    entries, duplicates = system_info.collect_autoruns(dedupe=True)
+    assert duplicates == 1 and [entry.entry for entry in entries] == ["\\Evil", "Spooler"]
+
+def test_parse_event_json_skips_events_without_an_id(caplog):
+    lines = [
+        '{"EventID": 4624, "TimeCreated": "2026-10-16T09:02:03Z", "TargetUserName": "alice",'
+        ' "TargetDomainName": "CONTOSO", "LogonType": 10, "IpAddress": "10.20.0.15"}\n',
+        '{"TimeCreated": "2026-10-16T09:03:00Z", "TargetUserName": "bob"}\n',
+        '{"Id": "4625", "EventData": {"TargetUserName": "admin", "IpAddress": "-", "Status": "0xc000006d"}}\n',
+        '{"EventID": null, "Id": "not a number"}\n',
+    ]
+    with caplog.at_level("WARNING", logger="modules.login_history"):
+        events = list(login_history.parse_event_json(lines))
+    assert [(event.event_id, event.user, event.logon_type, event.source_ip) for event in events] == [
+        (4624, "CONTOSO\\alice", 10, "10.20.0.15"), (4625, "admin", None, "")]
+    assert events[1].status == "0xc000006d"
+    assert [record.getMessage()[:40] for record in caplog.records] == [
+        "Skipping event without a numeric EventID"] * 2
+    # The same in one JSON array
+    assert list(login_history.parse_event_json(["[\n", ",\n".join(line.strip() for line in lines), "\n]\n"])) == events
+
+@pytest.mark.parametrize("failure", ["exit", "timeout"])
+def test_collect_services_falls_back_to_wmic(replay, monkeypatch, failure):
+    script_args = command_runner.powershell_args(services.SERVICE_SCRIPT)
+    replay(services.WMIC_SERVICE_ARGS, "services_csv.txt")
+    if failure == "exit":
+        replay(script_args, None, returncode=1, stderr="Get-CimInstance : Access denied")
+    else:
+        # A timeout cannot be recorded; make the PowerShell query time out
+        iter_lines = command_runner.iter_lines
+
+        def timing_out(args, **kwargs):
+            if list(args) == script_args:
+                raise subprocess.TimeoutExpired(args, 30)
+            return iter_lines(args, **kwargs)
+        monkeypatch.setattr(command_runner, "iter_lines", timing_out)
+    assert len(services.collect_services()) == 9
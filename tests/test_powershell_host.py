@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT, fixture_lines, fixture_text
+from modules import command_runner
+from modules.powershell_host import PowerShellPool, PowerShellWorker
+
+FAKE_WORKER = [sys.executable, os.path.join(ROOT, "benchmarks", "fake_powershell_worker.py")]
+
+SCRIPT = "Get-NetTCPConnection -State Listen"
+
+def fake_worker(fixture_dir, *options):
+    return FAKE_WORKER + ["--fixtures", str(fixture_dir), *options]
+
+def test_timeout_covers_the_whole_script(replay, tmp_path):
+    replay(command_runner.powershell_args(SCRIPT), "netstat_ano.txt")
+    # Every line arrives well within the timeout, the whole output does not
+    worker = PowerShellWorker(fake_worker(tmp_path, "--line-delay", "0.2"))
+    try:
+        with pytest.raises(subprocess.TimeoutExpired):
+            worker.execute(SCRIPT, timeout=1)
+        assert not worker.alive()
+    finally:
+        worker.close(kill=True)
+
+def test_worker_returns_recorded_output(replay, tmp_path):
+    replay(command_runner.powershell_args(SCRIPT), "netstat_ano.txt")
+    worker = PowerShellWorker(fake_worker(tmp_path))
+    try:
+        result = worker.execute(SCRIPT, timeout=30)
+        assert (result.returncode, result.stdout, result.stderr) == (0, fixture_text("netstat_ano.txt"), "")
+    finally:
+        worker.close()
+
+def test_byte_order_mark_before_first_reply_is_dropped(replay, tmp_path):
+    replay(command_runner.powershell_args(SCRIPT), "defender_status.json")
+    worker = PowerShellWorker(fake_worker(tmp_path, "--bom"))
+    try:
+        result = worker.execute(SCRIPT, timeout=30)
+        assert json.loads(result.stdout)["SecurityCenter"] == "Running"
+    finally:
+        worker.close()
+
+def test_pool_separates_output_errors_and_status(replay, tmp_path):
+    replay(command_runner.powershell_args(SCRIPT), "netstat_ano.txt")
+    replay(command_runner.powershell_args("Get-MpComputerStatus"), None, returncode=3,
+           stderr="Get-MpComputerStatus : Access denied\n")
+    pool = PowerShellPool(2, fake_worker(tmp_path))
+    try:
+        assert pool.run(SCRIPT, timeout=30).stdout == fixture_text("netstat_ano.txt")
+        failed = pool.run("Get-MpComputerStatus", timeout=30)
+        assert (failed.returncode, failed.stdout, failed.stderr) == (3, "", "Get-MpComputerStatus : Access denied\n")
+        # Scripts without a recording: the fake worker's own error, status 1
+        missing = pool.run("Get-Date", timeout=30)
+        assert missing.returncode == 1 and "No recorded output" in missing.stderr
+    finally:
+        pool.close()
+
+def test_pool_replaces_a_worker_that_timed_out(replay, tmp_path):
+    replay(command_runner.powershell_args(SCRIPT), "netstat_ano.txt")
+    pool = PowerShellPool(1, fake_worker(tmp_path, "--line-delay", "0.05"))
+    try:
+        with pytest.raises(subprocess.TimeoutExpired):
+            pool.run(SCRIPT, timeout=0.2)
+        # The killed worker was discarded; the next script gets a fresh one
+        assert pool.run(SCRIPT, timeout=30).stdout == fixture_text("netstat_ano.txt")
+    finally:
+        pool.close()
+
+def test_command_runner_sends_powershell_scripts_to_the_pool(replay, tmp_path):
+    replay(command_runner.powershell_args(SCRIPT), "netstat_ano.txt")
+    # Live mode, but every PowerShell script is answered by the fake worker
+    command_runner.configure(powershell_workers=1, powershell_worker_command=fake_worker(tmp_path))
+    assert command_runner.run_powershell(SCRIPT).stdout == fixture_text("netstat_ano.txt")
+    assert list(command_runner.iter_lines(command_runner.powershell_args(SCRIPT))) == fixture_lines("netstat_ano.txt")
@@ -0,0 +1,105 @@
+import json
+import sys
+import threading
+
+import pytest
+
+from conftest import fixture_text
+from modules import command_runner, profiler
+from modules.command_runner import CommandTiming
+from modules.profiler import ModuleTiming, ProfileRow
+
+NETSTAT_ARGS = ["netstat", "-ano"]
+
+@pytest.fixture(autouse=True)
+def fresh_profile():
+    profiler.reset()
+    yield
+    profiler.reset()
+    command_runner.configure()
+
+def test_commands_are_attributed_to_the_running_audit(replay):
+    replay(NETSTAT_ARGS, "netstat_ano.txt")
+    replay(command_runner.powershell_args("Get-Date"), None)
+    with profiler.module_span("audit_remote_access"):
+        assert profiler.current_module() == "audit_remote_access"
+        command_runner.run(NETSTAT_ARGS)
+        # A pool thread started by the audit works for it too
+        worker = threading.Thread(target=profiler.bind(lambda: command_runner.run_powershell("Get-Date")))
+        worker.start()
+        worker.join()
+    assert profiler.current_module() is None
+    with profiler.module_span("list_ports"):
+        list(command_runner.iter_lines(NETSTAT_ARGS))
+    with pytest.raises(FileNotFoundError):
+        with profiler.module_span("get_patch_info"):
+            command_runner.run(["wmic", "qfe", "list"])
+
+    assert [(timing.module, timing.args[0]) for timing in command_runner.get_timings()] == [
+        ("audit_remote_access", "netstat"), ("audit_remote_access", "powershell"),
+        ("list_ports", "netstat"), ("get_patch_info", "wmic")]
+    modules = profiler.get_module_timings()
+    assert [(timing.name, timing.error) for timing in modules] == [
+        ("audit_remote_access", None), ("list_ports", None),
+        ("get_patch_info", "[Errno 2] No recorded output for command: 'wmic qfe list'")]
+    # Streamed output counts its consumer's time separately
+    streamed = command_runner.get_timings()[2]
+    assert streamed.output_bytes == len(fixture_text("netstat_ano.txt").encode("utf-8"))
+    assert streamed.parse_seconds is not None
+
+def test_live_commands_report_child_cpu_time():
+    result = command_runner.run([sys.executable, "-c", "sum(range(3000000))"])
+    assert result.returncode == 0
+    [timing] = command_runner.get_timings()
+    assert timing.cpu_seconds > 0 and timing.module is None
+
+def timing(args, seconds, module, cached=False, cpu=None, output=0, parse=None, start=0.0):
+    return CommandTiming(tuple(args), seconds, 0, cached, start, cpu, output, parse, module, "MainThread")
+
+COMMANDS = [
+    timing(NETSTAT_ARGS, 0.5, "audit_remote_access", cpu=0.1, output=4000, parse=0.2),
+    timing(NETSTAT_ARGS, 0.0, "list_ports", cached=True),
+    timing(command_runner.powershell_args("Get-Service |\n  Export-Csv"), 2.0, "list_services", cpu=1.5, output=900),
+    timing(["wmic", "qfe", "list"], 1.0, "audit_remote_access"),
+]
+MODULES = [
+    ModuleTiming("audit_remote_access", 0.0, 1.6, 0.3, "MainThread", None),
+    ModuleTiming("list_ports", 1.6, 0.1, 0.05, "MainThread", None),
+    ModuleTiming("list_services", 0.0, 2.1, 0.2, "worker-1", "boom"),
+]
+
+def test_module_rows_total_each_audits_commands():
+    assert profiler.module_rows(MODULES, COMMANDS) == [
+        ProfileRow("list_services", 1, 2.1, 1.5, 900, None, 0.2),
+        # wmic reported no CPU time; the netstat total stands
+        ProfileRow("audit_remote_access", 1, 1.6, 0.1, 4000, None, 0.3),
+        # Only a cache hit: no child time or output
+        ProfileRow("list_ports", 1, 0.1, None, 0, None, 0.05),
+    ]
+
+def test_command_rows_group_by_command_line():
+    assert profiler.command_rows(COMMANDS) == [
+        ProfileRow("powershell Get-Service | Export-Csv", 1, 2.0, 1.5, 900, None),
+        ProfileRow("wmic qfe list", 1, 1.0, None, 0, None),
+        ProfileRow("netstat -ano", 2, 0.5, 0.1, 4000, 0.2),
+    ]
+    summary = profiler.format_summary(MODULES, COMMANDS, top=2).splitlines()
+    assert summary[0].split() == ["Audit", "wall", "child", "CPU", "output", "own", "CPU"]
+    assert summary[1].split() == ["list_services", "2.10s", "1.50s", "900", "0.20s"]
+    assert summary[3].split() == ["list_ports", "0.10s", "-", "0", "0.05s"]
+    assert [line.split()[0] for line in summary[6:]] == ["powershell", "wmic"]
+
+def test_write_trace(tmp_path):
+    path = tmp_path / "trace.json"
+    profiler.write_trace(str(path), MODULES, COMMANDS[:1])
+    with open(path, encoding="utf-8") as f:
+        trace = json.load(f)
+    events = trace["traceEvents"]
+    assert [(event["ph"], event["name"]) for event in events] == [
+        ("M", "thread_name"), ("X", "audit_remote_access"), ("X", "list_ports"),
+        ("M", "thread_name"), ("X", "list_services"), ("X", "netstat -ano")]
+    assert [event["args"]["name"] for event in events if event["ph"] == "M"] == ["MainThread", "worker-1"]
+    command = events[-1]
+    # The span of a streamed command includes its parsing
+    assert (command["cat"], command["tid"], command["dur"]) == ("command", 1, 700000.0)
+    assert command["args"]["module"] == "audit_remote_access" and events[4]["args"]["error"] == "boom"
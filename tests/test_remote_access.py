@@ -0,0 +1,49 @@
+import argparse
+
+import pytest
+
+from modules import netstat, remote_access
+from modules.netstat import PortWatchlist
+from modules.remote_access import RemoteAccessSocket
+
+def test_port_watchlist_ports_ranges_and_labels():
+    watchlist = PortWatchlist.parse("22=SSH,3389=RDP,5900-5910=VNC,8080")
+    assert 22 in watchlist and 5905 in watchlist and 8080 in watchlist
+    assert 23 not in watchlist and 5911 not in watchlist and None not in watchlist
+    assert (watchlist.label(22), watchlist.label(5910), watchlist.label(8080), watchlist.label(23)) == \
+        ("SSH", "VNC", "", "")
+    # Later entries win on overlap, at both ends of the table
+    watchlist.add("0,5905,65535", "Other")
+    assert (watchlist.label(0), watchlist.label(5905), watchlist.label(5906), watchlist.label(65535)) == \
+        ("Other", "Other", "VNC", "Other")
+
+def test_port_watchlist_holds_more_than_255_labels():
+    watchlist = PortWatchlist({str(10000 + i): f"svc{i}" for i in range(1000)})
+    assert watchlist.label(10000) == "svc0" and watchlist.label(10999) == "svc999"
+
+@pytest.mark.parametrize("spec", ["70000", "90-80", "ssh=SSH", "22-", "-1"])
+def test_port_watchlist_rejects_bad_ports(spec):
+    with pytest.raises(ValueError, match="Invalid port range"):
+        PortWatchlist.parse(spec)
+    with pytest.raises(argparse.ArgumentTypeError):
+        remote_access.port_spec(spec)
+
+def test_remote_access_replays_netstat(replay):
+    replay(netstat.NETSTAT_ARGS, "netstat_ano.txt")
+    netstat.reset_snapshot()
+    remote_access.configure_watchlist("22=SSH,2222=SSH,3389=RDP,50000-50001=High")
+    try:
+        records = remote_access.audit_remote_access()
+    finally:
+        remote_access.configure_watchlist()
+        netstat.reset_snapshot()
+    assert records[:-1] == [
+        RemoteAccessSocket("SSH", "TCP", "::", 22, "::", 0, "LISTENING", 900),
+        RemoteAccessSocket("SSH", "TCP", "0.0.0.0", 2222, "0.0.0.0", 0, "LISTENING", 4),
+        RemoteAccessSocket("RDP", "TCP", "0.0.0.0", 3389, "0.0.0.0", 0, "LISTENING", 1188),
+        RemoteAccessSocket("RDP", "TCP", "10.22.1.5", 3389, "10.1.1.9", 50123, "ESTABLISHED", 1188),
+        # The TIME_WAIT socket on 50001 is neither listening nor a session
+        RemoteAccessSocket("High", "TCP", "10.22.1.5", 50000, "1.2.3.4", 443, "ESTABLISHED", 55),
+    ]
+    assert records[-1] == netstat.ConnectionSummary(9, {"LISTENING": 5, "ESTABLISHED": 2, "TIME_WAIT": 1,
+                                                        "UDP": 1}, 6)